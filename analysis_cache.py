@@ -0,0 +1,100 @@
+"""
+解析結果キャッシュモジュール
+ffmpegでのデコードを伴う重い解析の結果を、ファイルの同一性（パス・サイズ・更新時刻）ごとに保存する
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict
+from typing import Callable, Optional
+
+from video_analyzer import file_identity
+
+
+# キャッシュの保存先
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "diffmovie_cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# プロセス内のキャッシュ（ディスクの読み込みも省略する）
+_memory_cache = {}
+
+
+def _cache_path(kind: str, identity: tuple) -> str:
+    """解析種別とファイル同一性からキャッシュファイルのパスを生成"""
+    digest = hashlib.sha1(repr(identity).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{kind}_{digest}.json")
+
+
+def _load(kind: str, identity: tuple, result_type: type, decode: Optional[Callable]):
+    """メモリ・ディスクのキャッシュから結果を読み込む（なければ None）"""
+    key = (kind, identity)
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    cache_path = _cache_path(kind, identity)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        result = decode(data) if decode else result_type(**data)
+    except (OSError, ValueError, TypeError):
+        # 壊れたキャッシュや形式の古いキャッシュは無視する
+        return None
+
+    _memory_cache[key] = result
+    return result
+
+
+def peek_cached(kind: str, file_path: str, result_type: type,
+                decode: Optional[Callable] = None):
+    """
+    キャッシュ済みの解析結果だけを返す（未解析なら計算せずに None を返す）
+
+    重い解析を起動せずに、過去の結果があれば利用したい場合に使う。
+    """
+    if not file_path or not os.path.exists(file_path):
+        return None
+    return _load(kind, file_identity(file_path), result_type, decode)
+
+
+def cached_analysis(kind: str, file_path: str, compute: Callable, result_type: type,
+                    decode: Optional[Callable] = None):
+    """
+    解析結果をキャッシュから取得し、なければ計算して保存する
+
+    エラーになった結果（error 属性が設定されたもの）は保存しない。
+
+    Args:
+        kind: 解析種別（結果の形式を変えたらバージョンを上げる。例: "loudness-v1"）
+        file_path: 動画ファイルのパス
+        compute: file_path を受け取って結果のデータクラスを返す関数
+        result_type: 結果のデータクラス
+        decode: 保存した辞書からデータクラスを復元する関数（省略時は result_type(**data)）
+
+    Returns:
+        result_type: 解析結果
+    """
+    if not file_path or not os.path.exists(file_path):
+        return compute(file_path)
+
+    identity = file_identity(file_path)
+    cached = _load(kind, identity, result_type, decode)
+    if cached is not None:
+        return cached
+
+    result = compute(file_path)
+    if getattr(result, 'error', None):
+        return result
+
+    _memory_cache[(kind, identity)] = result
+    cache_path = _cache_path(kind, identity)
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(result), f, ensure_ascii=False)
+    except OSError as e:
+        print(f"キャッシュ保存エラー: {e}")
+
+    return result
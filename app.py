@@ -5,20 +5,128 @@ Gradio 6 + ダークテーマ + ネオンイエロー
 """
 
 import gradio as gr
+import numpy as np
 from video_analyzer import (
     analyze_video,
     metadata_to_dict
 )
+from phash_index import (
+    PerceptualHashIndex,
+    build_index,
+    collect_video_files,
+    find_similar,
+    DEFAULT_INDEX_PATH,
+    DEFAULT_MAX_DISTANCE,
+)
+from quality_metrics import measure_quality, format_quality_report
+from loudness import analyze_loudness_batch, loudness_to_dict
+from qc_detect import analyze_qc, qc_to_dict
+from scene_detect import analyze_scenes, scene_to_dict, representative_timestamp
+from frame_diff import compare_frames, format_frame_diff
+from spec_groups import group_by_spec, summarize_group, group_label
+from diff_engine import get_diff_matrix
+from spec_distance import analyze_spec_distance, format_spec_distance_report
+from preset_rules import PRESET_RULES, compile_rules, check_conformance, format_conformance_report
+from render_cache import memoize_render, clear_render_cache
+from color_histogram import analyze_histogram, histogram_to_dict, format_histogram_matrix
+from crop_interlace import analyze_crop_interlace, crop_interlace_to_dict
+from conversion_plan import (
+    ConversionPlan,
+    EncoderTuning,
+    ENCODER_SPEEDS,
+    SPEED_BALANCED,
+    plan_conversion,
+    build_ffmpeg_args,
+    format_ffmpeg_command,
+    output_name_for,
+    PATH_REMUX,
+)
+from conversion_jobs import JobRunner, create_jobs, format_jobs
+from batch_export import export_batch, BATCH_FORMATS, BATCH_MAKEFILE
+from encoder_benchmark import EncoderBenchmark, estimate_conversion, format_estimate, DEFAULT_BENCHMARK_PATH
+from sample_encode import sample_encode, peek_sample_encode, format_sample_estimate
+from audio_sync import detect_sync_offset, format_sync_report
+from report_image import render_report_png, report_content_key
+from report_store import ReportStore
+from result_export import export_results, EXPORT_FORMATS, EXPORT_EXTENSIONS, EXPORT_JSONL
 import os
+import posixpath
 import subprocess
 import tempfile
 import base64
+import hashlib
+import html as html_lib
 import shutil
 from datetime import datetime
+from typing import Optional
+
+
+# 比較テーブル（アプリとHTMLレポートで共通）
+COMPARISON_TABLE_CSS = """
+.cmp-scroll {
+    overflow-x: auto;
+}
+
+.cmp-window {
+    color: #888;
+    font-size: 0.9rem;
+    margin: 0 0 0.5rem 0;
+}
+
+.cmp-table {
+    width: 100%;
+    border-collapse: collapse;
+    font-size: 14px;
+}
+
+.cmp-table th {
+    background: #EEFF00;
+    color: #000;
+    padding: 12px;
+    text-align: left;
+    min-width: 150px;
+}
+
+.cmp-table td {
+    padding: 10px 12px;
+    border-bottom: 1px solid #333;
+    color: #fff;
+}
+
+.cmp-table .cmp-key {
+    min-width: 180px;
+    position: sticky;
+    left: 0;
+}
+
+.cmp-table td.cmp-key {
+    color: #ccc;
+    background: #121212;
+}
+
+.cmp-table tr.cmp-diff {
+    background: rgba(238, 255, 0, 0.1);
+}
+
+.cmp-table tr.cmp-diff td {
+    color: #EEFF00;
+    font-weight: bold;
+}
+
+.cmp-table tr.cmp-diff td.cmp-key {
+    color: #ccc;
+    font-weight: normal;
+    background: #1a1a0a;
+}
+"""
+
+# 比較テーブルの1ページに表示するファイル列数・項目行数
+COMPARISON_PAGE_FILES = 20
+COMPARISON_PAGE_ROWS = 100
 
 
 # カスタムCSS
-CUSTOM_CSS = """
+CUSTOM_CSS = COMPARISON_TABLE_CSS + """
 /* 全体のスタイル */
 .gradio-container {
     max-width: 1600px !important;
@@ -225,6 +333,8 @@ os.makedirs(THUMBNAIL_DIR, exist_ok=True)
 def generate_thumbnail(video_path: str) -> str:
     """
     動画からサムネイルを生成してBase64エンコードされた画像を返す
+
+    シーン解析済みのファイルは代表ショットのフレームを使い、未解析の場合は1秒目のフレームを使う。
     
     Args:
         video_path: 動画ファイルのパス
@@ -239,19 +349,26 @@ def generate_thumbnail(video_path: str) -> str:
     basename = os.path.basename(video_path)
     thumb_path = os.path.join(THUMBNAIL_DIR, f"{basename}.jpg")
     
+    timestamp = representative_timestamp(video_path)
+    if timestamp is None:
+        timestamp = 1.0
+    
     try:
-        # ffmpegでサムネイルを生成（1秒目のフレームを取得）
+        # ffmpegでサムネイルを生成（入力側シークでキーフレームから指定時刻までデコード）
         cmd = [
             'ffmpeg',
             '-y',  # 上書き
+            '-ss', f'{timestamp:.3f}',
             '-i', video_path,
-            '-ss', '00:00:01',  # 1秒目
             '-vframes', '1',
             '-vf', 'scale=320:-1',  # 幅320pxに縮小
             '-q:v', '2',  # JPEG品質
             thumb_path
         ]
         
+        if os.path.exists(thumb_path):
+            os.remove(thumb_path)
+        
         result = subprocess.run(
             cmd,
             capture_output=True,
@@ -259,9 +376,9 @@ def generate_thumbnail(video_path: str) -> str:
             timeout=10
         )
         
-        # 1秒目が取得できない場合は0秒目を試す
+        # 指定時刻が取得できない場合は0秒目を試す
         if not os.path.exists(thumb_path) or os.path.getsize(thumb_path) == 0:
-            cmd[5] = '00:00:00'  # 0秒目
+            cmd[3] = '0'  # 0秒目
             subprocess.run(cmd, capture_output=True, text=True, timeout=10)
         
         if os.path.exists(thumb_path) and os.path.getsize(thumb_path) > 0:
@@ -415,6 +532,7 @@ def generate_report_html(thumbnails_html: str, comparison_html: str, summary_tex
             border-top: 1px solid #333;
             color: #666;
         }}
+        {COMPARISON_TABLE_CSS}
     </style>
 </head>
 <body>
@@ -442,42 +560,42 @@ def generate_report_html(thumbnails_html: str, comparison_html: str, summary_tex
     return html
 
 
-def save_report_as_image(thumbnails_html: str, comparison_html: str, summary_text: str) -> str:
-    """レポートを画像として保存（wkhtmltoimageを使用）"""
-    # HTMLレポートを生成
-    html_content = generate_report_html(thumbnails_html, comparison_html, summary_text)
-    
-    # 一時ファイルに保存
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    # 出力ディレクトリを作成
-    output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports")
-    os.makedirs(output_dir, exist_ok=True)
+# レポート保存先（保存ポリシーは環境変数から読み込む）
+_report_store = {'store': None}
+
+
+def _get_report_store() -> ReportStore:
+    """reports ディレクトリの管理オブジェクトを取得（初回のみ索引を読み込む）"""
+    if _report_store['store'] is None:
+        _report_store['store'] = ReportStore()
+    return _report_store['store']
+
+
+def save_report_as_image(thumbnails_html: str, comparison_html: str, summary_text: str,
+                         all_metadata: list, filenames: list, thumbnails: list) -> str:
+    """
+    レポートをHTMLとPNGで保存（PNGは Pillow で直接描画し、同じ内容なら描画済みの画像を使う）
+
+    ファイル名は解析結果のハッシュから決めるため、同じ結果を何度保存しても1組だけになる。
+
+    Returns:
+        str: PNGのパス（描画に失敗した場合はHTMLのパス）
+    """
+    store = _get_report_store()
+    key = report_content_key(all_metadata, filenames, thumbnails, summary_text)
     
-    html_path = os.path.join(output_dir, f"report_{timestamp}.html")
-    png_path = os.path.join(output_dir, f"report_{timestamp}.png")
+    def write_html(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(generate_report_html(thumbnails_html, comparison_html, summary_text))
     
-    # HTMLを保存
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    def write_png(path):
+        with open(path, 'wb') as f:
+            f.write(render_report_png(all_metadata, filenames, thumbnails, summary_text))
     
-    # wkhtmltoimageで画像に変換を試みる
+    html_path, _ = store.save("report", key, ".html", write_html)
     try:
-        cmd = [
-            'wkhtmltoimage',
-            '--width', '1400',
-            '--quality', '90',
-            '--enable-local-file-access',
-            html_path,
-            png_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if os.path.exists(png_path) and os.path.getsize(png_path) > 0:
-            return png_path
-    except FileNotFoundError:
-        # wkhtmltoimageがない場合はHTMLパスを返す
-        pass
+        png_path, _ = store.save("report", key, ".png", write_png)
+        return png_path
     except Exception as e:
         print(f"画像生成エラー: {e}")
     
@@ -574,9 +692,25 @@ PRESETS = {
 }
 
 
+# 追加解析の選択肢（ffmpegでのデコードを伴うため任意で実行）
+EXTRA_ANALYSIS_LOUDNESS = "ラウドネス（EBU R128）"
+EXTRA_ANALYSIS_QC = "QC（黒フレーム・フリーズ・無音）"
+EXTRA_ANALYSIS_SCENE = "シーン解析（カット・代表フレーム）"
+EXTRA_ANALYSIS_CROP = "クロップ・インターレース検出"
+EXTRA_ANALYSIS_HISTOGRAM = "色ヒストグラム（レンジ・ガンマ）"
+EXTRA_ANALYSES = [
+    EXTRA_ANALYSIS_LOUDNESS,
+    EXTRA_ANALYSIS_QC,
+    EXTRA_ANALYSIS_SCENE,
+    EXTRA_ANALYSIS_CROP,
+    EXTRA_ANALYSIS_HISTOGRAM,
+]
+
+
 # グローバル変数で最新の解析結果を保持
 _latest_results = {
     'thumbnails_html': '',
+    'thumbnails': [],
     'comparison_html': '',
     'summary_text': '',
     'ffmpeg_commands': '',
@@ -585,19 +719,54 @@ _latest_results = {
     'filenames': [],
     'diff_count': 0,
     'total_count': 0,
-    'presets_added': []
+    'presets_added': [],
+    'pictures': None,
+    'histograms': None,
+    'group_specs': False,
+    'encoder_speed': SPEED_BALANCED
 }
 
 
-def generate_ffmpeg_command(source_meta, target_meta, source_path: str, output_path: str = None) -> str:
+# エンコーダーのベンチマーク結果（初回のみディスクから読み込む）
+_encoder_benchmark = {'benchmark': None, 'mtime': None}
+
+
+def _get_encoder_benchmark() -> EncoderBenchmark:
+    """処理時間の見込みに使うベンチマーク結果を取得（python cli.py benchmark で作成・更新すると読み直す）"""
+    try:
+        mtime = os.path.getmtime(DEFAULT_BENCHMARK_PATH)
+    except OSError:
+        mtime = None
+    if _encoder_benchmark['benchmark'] is None or _encoder_benchmark['mtime'] != mtime:
+        _encoder_benchmark['benchmark'] = EncoderBenchmark.load(DEFAULT_BENCHMARK_PATH)
+        _encoder_benchmark['mtime'] = mtime
+    return _encoder_benchmark['benchmark']
+
+
+def _ffmpeg_render_params(base_index: int, encoder_speed: str) -> tuple:
+    """ffmpegコマンドの表示を作り直す条件（試し変換やベンチマークの更新で見込みが変わる）"""
+    _get_encoder_benchmark()
+    return (base_index, encoder_speed, _latest_results.get('sample_runs', 0), _encoder_benchmark['mtime'])
+
+
+def generate_ffmpeg_command(source_meta, target_meta, source_path: str, output_path: str = None,
+                            source_picture=None, target_picture=None, plan: ConversionPlan = None,
+                            tuning: EncoderTuning = None) -> str:
     """
     ソース動画をターゲット動画の仕様に変換するffmpegコマンドを生成
     
+    すでにターゲットの仕様に合っているストリームは再エンコードせずにコピーし、
+    変化のないフィルター・オプション（同じ解像度へのスケールなど）は出力しない。
+    
     Args:
         source_meta: ソース動画のメタデータ
         target_meta: ターゲット動画のメタデータ
         source_path: ソース動画のパス
         output_path: 出力パス（省略時は自動生成）
+        source_picture: ソース動画のクロップ・インターレース検出結果（省略可）
+        target_picture: ターゲット動画のクロップ・インターレース検出結果（省略可）
+        plan: plan_conversion の結果（省略時はここで決める）
+        tuning: エンコーダーの速度・スレッド設定（省略時は標準の速度・このマシンのコア数）
     
     Returns:
         str: ffmpegコマンド
@@ -609,96 +778,17 @@ def generate_ffmpeg_command(source_meta, target_meta, source_path: str, output_p
         base, ext = os.path.splitext(os.path.basename(source_path))
         output_path = f"{base}_converted{ext}"
     
-    cmd_parts = ['ffmpeg', '-i', f'"{source_path}"']
-    
-    # 映像設定
-    if target_meta.video:
-        tv = target_meta.video
-        
-        # コーデック
-        codec_map = {
-            'h264': 'libx264',
-            'hevc': 'libx265',
-            'h265': 'libx265',
-            'vp9': 'libvpx-vp9',
-            'vp8': 'libvpx',
-            'av1': 'libaom-av1',
-            'prores': 'prores_ks',
-        }
-        codec = tv.codec_name.lower() if tv.codec_name != "N/A" else 'h264'
-        encoder = codec_map.get(codec, 'libx264')
-        cmd_parts.append(f'-c:v {encoder}')
-        
-        # 解像度
-        if tv.width > 0 and tv.height > 0:
-            cmd_parts.append(f'-vf "scale={tv.width}:{tv.height}"')
-        
-        # フレームレート
-        if tv.fps != "N/A":
-            try:
-                fps_val = float(tv.fps)
-                cmd_parts.append(f'-r {fps_val:.2f}')
-            except ValueError:
-                pass
-        
-        # ビットレート
-        if tv.bit_rate != "N/A" and 'Mbps' in tv.bit_rate:
-            try:
-                br = float(tv.bit_rate.replace(' Mbps', ''))
-                cmd_parts.append(f'-b:v {br:.1f}M')
-            except ValueError:
-                pass
-        elif tv.bit_rate != "N/A" and 'Kbps' in tv.bit_rate:
-            try:
-                br = float(tv.bit_rate.replace(' Kbps', ''))
-                cmd_parts.append(f'-b:v {br:.0f}K')
-            except ValueError:
-                pass
-        
-        # ピクセルフォーマット
-        if tv.pix_fmt != "N/A":
-            cmd_parts.append(f'-pix_fmt {tv.pix_fmt}')
-    
-    # 音声設定
-    if target_meta.audio:
-        ta = target_meta.audio
-        
-        # コーデック
-        audio_codec_map = {
-            'aac': 'aac',
-            'mp3': 'libmp3lame',
-            'opus': 'libopus',
-            'vorbis': 'libvorbis',
-            'flac': 'flac',
-            'pcm_s16le': 'pcm_s16le',
-            'pcm_s24le': 'pcm_s24le',
-        }
-        acodec = ta.codec_name.lower() if ta.codec_name != "N/A" else 'aac'
-        aencoder = audio_codec_map.get(acodec, 'aac')
-        cmd_parts.append(f'-c:a {aencoder}')
-        
-        # サンプルレート
-        if ta.sample_rate != "N/A":
-            cmd_parts.append(f'-ar {ta.sample_rate}')
-        
-        # チャンネル数
-        if ta.channels > 0:
-            cmd_parts.append(f'-ac {ta.channels}')
-        
-        # ビットレート
-        if ta.bit_rate != "N/A" and 'Kbps' in ta.bit_rate:
-            try:
-                abr = float(ta.bit_rate.replace(' Kbps', ''))
-                cmd_parts.append(f'-b:a {abr:.0f}k')
-            except ValueError:
-                pass
-    
-    cmd_parts.append(f'"{output_path}"')
-    
-    return ' \\\n  '.join(cmd_parts)
-
-
-def generate_all_ffmpeg_commands(all_meta_raw: list, filenames: list, base_index: int = 0) -> str:
+    if plan is None:
+        plan = plan_conversion(source_meta, target_meta, source_picture, target_picture)
+    
+    if tuning is None:
+        tuning = EncoderTuning(SPEED_BALANCED, os.cpu_count() or 1)
+    
+    return format_ffmpeg_command(build_ffmpeg_args(source_meta, target_meta, source_path, output_path, plan, tuning))
+
+
+def generate_all_ffmpeg_commands(all_meta_raw: list, filenames: list, base_index: int = 0,
+                                 pictures: list = None, encoder_speed: str = SPEED_BALANCED) -> str:
     """
     複数ファイルに対するffmpegコマンドを生成
     
@@ -706,6 +796,8 @@ def generate_all_ffmpeg_commands(all_meta_raw: list, filenames: list, base_index
         all_meta_raw: 全ファイルのメタデータリスト
         filenames: ファイル名リスト
         base_index: 基準ファイルのインデックス
+        pictures: 全ファイルのクロップ・インターレース検出結果（未解析なら None。省略可）
+        encoder_speed: エンコード速度の目標（ENCODER_SPEEDS のいずれか）
     
     Returns:
         str: 全ffmpegコマンド
@@ -715,6 +807,8 @@ def generate_all_ffmpeg_commands(all_meta_raw: list, filenames: list, base_index
     
     base_meta = all_meta_raw[base_index]
     base_name = os.path.basename(filenames[base_index])
+    tuning = EncoderTuning(encoder_speed, os.cpu_count() or 1)
+    benchmark = _get_encoder_benchmark()
     
     lines = []
     lines.append("=" * 60)
@@ -727,27 +821,22 @@ def generate_all_ffmpeg_commands(all_meta_raw: list, filenames: list, base_index
             continue
         
         filename = os.path.basename(filepath)
-        base, ext = os.path.splitext(filename)
-        
-        # ターゲットのフォーマットに合わせた拡張子
-        if base_meta.format_name:
-            format_ext_map = {
-                'mp4': '.mp4',
-                'mov': '.mov',
-                'matroska': '.mkv',
-                'webm': '.webm',
-                'avi': '.avi',
-            }
-            for fmt, new_ext in format_ext_map.items():
-                if fmt in base_meta.format_name.lower():
-                    ext = new_ext
-                    break
+        output_name = output_name_for(filepath, base_meta, filenames[base_index])
         
-        output_name = f"{base}_to_{os.path.splitext(base_name)[0]}{ext}"
+        source_picture = pictures[i] if pictures else None
+        target_picture = pictures[base_index] if pictures else None
+        plan = plan_conversion(meta, base_meta, source_picture, target_picture)
         
         lines.append("")
         lines.append(f"# {filename} -> {output_name}")
-        lines.append(generate_ffmpeg_command(meta, base_meta, filepath, output_name))
+        lines.append(f"# 方式: {plan.describe()}")
+        lines.append(f"# 見込み: {format_estimate(estimate_conversion(meta, base_meta, plan, encoder_speed, benchmark))}")
+        # 試し変換の結果があれば併記する（実行は「試し変換で見積もる」ボタンから）
+        sampled = peek_sample_encode(meta, base_meta, filepath, plan, encoder_speed)
+        if sampled is not None:
+            lines.append(f"# 試し変換: {format_sample_estimate(sampled)}")
+        lines.append(generate_ffmpeg_command(meta, base_meta, filepath, output_name,
+                                             source_picture, target_picture, plan, tuning))
     
     lines.append("")
     lines.append("=" * 60)
@@ -755,90 +844,143 @@ def generate_all_ffmpeg_commands(all_meta_raw: list, filenames: list, base_index
     return "\n".join(lines)
 
 
-def create_multi_comparison_html(all_metadata: list, filenames: list, show_diff_only: bool = False) -> tuple:
+def _page_range(total: int, page: Optional[int], per_page: int) -> tuple:
+    """1始まりのページ番号から表示範囲 (開始, 終了) を求める（範囲外のページは端に寄せる。None なら全体）"""
+    if page is None or total <= per_page:
+        return 0, total
+    last_page = (total + per_page - 1) // per_page
+    page = min(max(int(page), 1), last_page)
+    start = (page - 1) * per_page
+    return start, min(start + per_page, total)
+
+
+def _comparison_fragments(all_metadata: list, filenames: list) -> tuple:
     """
-    複数ファイルの比較結果をHTMLテーブルとして生成
+    比較テーブルの見出しとセルのHTML断片を生成（ファイル集合ごとにキャッシュ）
+    
+    差分フィルターやページの切り替えでは、ここで作ったセルから表示範囲を選んで連結するだけにする。
+    スタイルは COMPARISON_TABLE_CSS のクラスで指定し、セルごとのインラインスタイルは持たない。
     
     Returns:
-        tuple: (HTML文字列, 差分数, 全項目数)
+        tuple: (見出しセルのリスト, 項目名 → 値セルのリスト の辞書, 差分行列)
     """
-    if not all_metadata:
-        return "<p>データがありません</p>", 0, 0
-    
-    num_files = len(all_metadata)
-    
-    # 全てのキーを収集
-    all_keys = []
-    for meta_dict in all_metadata:
-        for key in meta_dict.keys():
-            if key not in all_keys:
-                all_keys.append(key)
-    
-    # 差分のある項目を事前にカウント
-    diff_count = 0
-    diff_keys = []
-    for key in all_keys:
-        values = [meta_dict.get(key, "N/A") for meta_dict in all_metadata]
-        unique_values = set(str(v) for v in values)
-        if len(unique_values) > 1:
-            diff_count += 1
-            diff_keys.append(key)
-    
-    total_count = len(all_keys)
-    
-    # フィルタリング対象のキー
-    display_keys = diff_keys if show_diff_only else all_keys
-    
-    if not display_keys:
-        return "<p style='color: #888;'>差分がある項目はありません</p>", diff_count, total_count
+    def compute():
+        # 項目×ファイルの差分行列（同じ入力ならキャッシュを共有）
+        matrix = get_diff_matrix(all_metadata)
+        
+        headers = []
+        for i, filename in enumerate(filenames):
+            short_name = os.path.basename(filename) if filename else f"ファイル{i+1}"
+            if len(short_name) > 20:
+                short_name = short_name[:17] + "..."
+            headers.append(f'<th title="{os.path.basename(filename) if filename else ""}">{short_name}</th>')
+        
+        cells = {key: [f"<td>{val}</td>" for val in matrix.values[matrix.key_index[key]]] for key in matrix.keys}
+        return headers, cells, matrix
     
-    # ヘッダー作成
-    html = f"""
-    <div style="overflow-x: auto;">
-    <table style="width: 100%; border-collapse: collapse; font-size: 14px; min-width: {200 + num_files * 150}px;">
-        <thead>
-            <tr style="background: #EEFF00; color: #000;">
-                <th style="padding: 12px; text-align: left; min-width: 180px; position: sticky; left: 0; background: #EEFF00;">項目</th>
+    return memoize_render("table-cells", (all_metadata, filenames), (), compute)
+
+
+def create_multi_comparison_html(all_metadata: list, filenames: list, show_diff_only: bool = False,
+                                 file_page: Optional[int] = None, row_page: Optional[int] = None) -> tuple:
     """
+    複数ファイルの比較結果をHTMLテーブルとして生成
     
-    for i, filename in enumerate(filenames):
-        short_name = os.path.basename(filename) if filename else f"ファイル{i+1}"
-        if len(short_name) > 20:
-            short_name = short_name[:17] + "..."
-        html += f'<th style="padding: 12px; text-align: left; min-width: 150px;" title="{os.path.basename(filename) if filename else ""}">{short_name}</th>'
+    ページを指定すると、表示範囲のファイル列（COMPARISON_PAGE_FILES 件）と
+    項目行（COMPARISON_PAGE_ROWS 件）だけを出力するため、ファイル数が増えてもHTMLの大きさは一定になる。
     
-    html += """
-            </tr>
-        </thead>
-        <tbody>
+    Args:
+        all_metadata: 全ファイルのメタデータ辞書リスト
+        filenames: ファイル名リスト
+        show_diff_only: 差分がある項目のみ表示するか
+        file_page: 表示するファイル列のページ（1始まり。None なら全ファイル）
+        row_page: 表示する項目行のページ（1始まり。None なら全項目）
+    
+    Returns:
+        tuple: (HTML文字列, 差分数, 全項目数)
     """
+    if not all_metadata:
+        return "<p>データがありません</p>", 0, 0
     
-    # 各行を生成
-    for key in display_keys:
-        values = [meta_dict.get(key, "N/A") for meta_dict in all_metadata]
-        unique_values = set(str(v) for v in values)
-        is_different = len(unique_values) > 1
+    def compute():
+        headers, cells, matrix = _comparison_fragments(all_metadata, filenames)
+        diff_count = matrix.diff_count
+        total_count = matrix.total_count
         
-        row_style = "background: rgba(238, 255, 0, 0.1);" if is_different else ""
+        # フィルタリング対象のキー
+        display_keys = matrix.diff_keys if show_diff_only else matrix.keys
         
-        html += f"""
-            <tr style="{row_style}">
-                <td style="padding: 10px 12px; border-bottom: 1px solid #333; color: #ccc; position: sticky; left: 0; background: {'#1a1a0a' if is_different else '#121212'};">{key}</td>
-        """
+        if not display_keys:
+            return "<p style='color: #888;'>差分がある項目はありません</p>", diff_count, total_count
         
-        for val in values:
-            val_style = "color: #EEFF00; font-weight: bold;" if is_different else "color: #fff;"
-            html += f'<td style="padding: 10px 12px; border-bottom: 1px solid #333; {val_style}">{val}</td>'
+        num_files = len(all_metadata)
+        file_start, file_end = _page_range(num_files, file_page, COMPARISON_PAGE_FILES)
+        row_start, row_end = _page_range(len(display_keys), row_page, COMPARISON_PAGE_ROWS)
         
-        html += "</tr>"
+        parts = []
+        if file_end - file_start < num_files or row_end - row_start < len(display_keys):
+            parts.append(
+                f'<p class="cmp-window">ファイル {file_start + 1}-{file_end} / {num_files}'
+                f'　項目 {row_start + 1}-{row_end} / {len(display_keys)}</p>'
+            )
+        parts.append(
+            f'<div class="cmp-scroll"><table class="cmp-table" style="min-width: {200 + (file_end - file_start) * 150}px;">'
+            f'<thead><tr><th class="cmp-key">項目</th>'
+        )
+        parts.extend(headers[file_start:file_end])
+        parts.append("</tr></thead><tbody>")
+        
+        for key in display_keys[row_start:row_end]:
+            is_different = matrix.distinct_counts[matrix.key_index[key]] > 1
+            parts.append('<tr class="cmp-diff">' if is_different else "<tr>")
+            parts.append(f'<td class="cmp-key">{key}</td>')
+            parts.extend(cells[key][file_start:file_end])
+            parts.append("</tr>")
+        
+        parts.append("</tbody></table></div>")
+        return "".join(parts), diff_count, total_count
     
-    html += """
-        </tbody>
-    </table>
-    </div>
+    return memoize_render("table", (all_metadata, filenames), (show_diff_only, file_page, row_page), compute)
+
+
+def create_grouped_comparison_html(all_metadata: list, filenames: list, show_diff_only: bool = False,
+                                   file_page: Optional[int] = None, row_page: Optional[int] = None) -> tuple:
     """
+    同じ仕様のファイルを1列にまとめた比較テーブルを生成
+    
+    各列の「所属ファイル」行を開くと、グループに含まれるファイル名を確認できる。
     
-    return html, diff_count, total_count
+    Returns:
+        tuple: (HTML文字列, 差分数, 全項目数)
+    """
+    if not all_metadata:
+        return "<p>データがありません</p>", 0, 0
+    
+    def compute():
+        groups = group_by_spec(all_metadata)
+        group_dicts = []
+        labels = []
+        for position, group in enumerate(groups):
+            names = [html_lib.escape(os.path.basename(filenames[i])) for i in group.members]
+            group_dict = {
+                "所属ファイル": f"<details><summary>{len(names)}件</summary>{'<br>'.join(names)}</details>"
+            }
+            group_dict.update(summarize_group(all_metadata, group))
+            group_dicts.append(group_dict)
+            labels.append(group_label(position, group))
+        return group_dicts, labels
+    
+    # グループ列は同じリストを使い回し、テーブルの行キャッシュもそのまま効かせる
+    group_dicts, labels = memoize_render("spec-groups", (all_metadata, filenames), (), compute)
+    return create_multi_comparison_html(group_dicts, labels, show_diff_only, file_page, row_page)
+
+
+def render_comparison_html(all_metadata: list, filenames: list, show_diff_only: bool = False,
+                           file_page: Optional[int] = None, row_page: Optional[int] = None) -> tuple:
+    """現在の表示設定（仕様グループ表示の有無）に合わせて比較テーブルを生成"""
+    if _latest_results.get('group_specs'):
+        return create_grouped_comparison_html(all_metadata, filenames, show_diff_only, file_page, row_page)
+    return create_multi_comparison_html(all_metadata, filenames, show_diff_only, file_page, row_page)
 
 
 def create_single_video_table(metadata_dict: dict, filename: str) -> str:
@@ -878,6 +1020,78 @@ def create_single_video_table(metadata_dict: dict, filename: str) -> str:
     return html
 
 
+# 変換サマリーで比較する主要な項目（解像度は倍率付きで別に表示）
+SUMMARY_COMPARE_KEYS = [
+    "コンテナフォーマット",
+    "映像コーデック",
+    "解像度",
+    "フレームレート（fps）",
+    "映像ビットレート",
+    "音声コーデック",
+    "サンプルレート",
+    "チャンネル数",
+]
+
+
+def _pair_differences(all_metadata: list, all_meta_raw: list, base_index: int, target_index: int,
+                      toward_base: bool = False) -> list:
+    """
+    基準ファイルと比較ファイル1組の差分行を生成（組ごとにキャッシュ）
+    
+    Args:
+        all_metadata: 全ファイルのメタデータ辞書リスト
+        all_meta_raw: 全ファイルのメタデータリスト
+        base_index: 基準ファイルのインデックス
+        target_index: 比較ファイルのインデックス
+        toward_base: True なら「比較 -> 基準」、False なら「基準 -> 比較」の向きで表示
+    
+    Returns:
+        list: 差分行のリスト（差分がなければ空）
+    """
+    def compute():
+        # 主要な項目について、基準との差分を全ファイル分まとめて判定（基準ごとにキャッシュ）
+        matrix = get_diff_matrix(all_metadata)
+        differs = memoize_render("summary-differs", (all_metadata,), (base_index,),
+                                 lambda: matrix.differs_from(base_index, SUMMARY_COMPARE_KEYS))
+        base_raw = all_meta_raw[base_index]
+        target_raw = all_meta_raw[target_index]
+        
+        differences = []
+        
+        for k, display_name in enumerate(SUMMARY_COMPARE_KEYS):
+            if differs[k, target_index]:
+                before = matrix.value(display_name, base_index)
+                after = matrix.value(display_name, target_index)
+                if toward_base:
+                    before, after = after, before
+                differences.append(f"[{display_name}] {before} -> {after}")
+        
+        # 解像度の特別処理
+        if base_raw.video and target_raw.video:
+            if base_raw.video.width != target_raw.video.width or base_raw.video.height != target_raw.video.height:
+                before, after = base_raw.video, target_raw.video
+                if toward_base:
+                    before, after = after, before
+                if before.width > 0 and after.width > 0:
+                    scale_w = after.width / before.width
+                    scale_h = after.height / before.height
+                    differences.append(f"[解像度] {before.width}x{before.height} -> {after.width}x{after.height} "
+                                       f"(幅{scale_w:.2f}倍, 高さ{scale_h:.2f}倍)")
+        
+        # ファイルサイズ比較
+        if base_raw.file_size > 0 and target_raw.file_size > 0:
+            before, after = base_raw, target_raw
+            if toward_base:
+                before, after = after, before
+            ratio = after.file_size / before.file_size
+            differences.append(f"[ファイルサイズ] {before.file_size_human} -> {after.file_size_human} ({ratio:.2f}倍)")
+        
+        return differences
+    
+    return memoize_render("summary-pair", (all_metadata, all_meta_raw),
+                          (base_index, target_index, toward_base), compute)
+
+
 def generate_multi_conversion_summary(all_metadata: list, all_meta_raw: list, filenames: list) -> str:
     """複数ファイルの変換サマリーを生成（最初のファイルを基準）"""
     if len(all_metadata) < 2:
@@ -891,52 +1105,13 @@ def generate_multi_conversion_summary(all_metadata: list, all_meta_raw: list, fi
     lines.append(f"基準: {os.path.basename(filenames[0])}")
     lines.append("=" * 60)
     
-    base_dict = all_metadata[0]
-    base_raw = all_meta_raw[0]
-    
     for i in range(1, len(all_metadata)):
-        target_dict = all_metadata[i]
-        target_raw = all_meta_raw[i]
         target_name = os.path.basename(filenames[i])
         
         lines.append("")
         lines.append(f"--- {target_name} との比較 ---")
         
-        differences = []
-        
-        # 主要な項目を比較
-        compare_items = [
-            ("コンテナフォーマット", "format_name"),
-            ("映像コーデック", "video.codec_name"),
-            ("解像度", None),  # 特別処理
-            ("フレームレート（fps）", "video.fps"),
-            ("映像ビットレート", "video.bit_rate"),
-            ("音声コーデック", "audio.codec_name"),
-            ("サンプルレート", "audio.sample_rate"),
-            ("チャンネル数", "audio.channels"),
-        ]
-        
-        for display_name, attr_path in compare_items:
-            base_val = base_dict.get(display_name, "N/A")
-            target_val = target_dict.get(display_name, "N/A")
-            
-            if base_val != target_val:
-                differences.append(f"[{display_name}] {base_val} -> {target_val}")
-        
-        # 解像度の特別処理
-        if base_raw.video and target_raw.video:
-            if base_raw.video.width != target_raw.video.width or base_raw.video.height != target_raw.video.height:
-                base_res = f"{base_raw.video.width}x{base_raw.video.height}"
-                target_res = f"{target_raw.video.width}x{target_raw.video.height}"
-                if base_raw.video.width > 0 and target_raw.video.width > 0:
-                    scale_w = target_raw.video.width / base_raw.video.width
-                    scale_h = target_raw.video.height / base_raw.video.height
-                    differences.append(f"[解像度] {base_res} -> {target_res} (幅{scale_w:.2f}倍, 高さ{scale_h:.2f}倍)")
-        
-        # ファイルサイズ比較
-        if base_raw.file_size > 0 and target_raw.file_size > 0:
-            ratio = target_raw.file_size / base_raw.file_size
-            differences.append(f"[ファイルサイズ] {base_raw.file_size_human} -> {target_raw.file_size_human} ({ratio:.2f}倍)")
+        differences = _pair_differences(all_metadata, all_meta_raw, 0, i, toward_base=False)
         
         if differences:
             for diff in differences:
@@ -950,12 +1125,36 @@ def generate_multi_conversion_summary(all_metadata: list, all_meta_raw: list, fi
     return "\n".join(lines)
 
 
-def analyze_multiple_videos(files):
+def _histogram_matrix_text(histograms: list, filenames: list) -> str:
+    """色ヒストグラム解析を実行した場合に、変換サマリーへ追加するペアごとの距離表"""
+    if not histograms or any(h is None for h in histograms):
+        return ""
+    names = [os.path.basename(f) for f in filenames[:len(histograms)]]
+    # 基準に依存しないため、基準の切り替えでは全組み合わせの距離を計算し直さない
+    return memoize_render("histogram-matrix", (histograms, filenames), (),
+                          lambda: "\n\n" + format_histogram_matrix(histograms, names))
+
+
+def _spec_distance_text(all_metadata: list, filenames: list, base_index: int) -> str:
+    """変換サマリーへ追加する、最も近い参照ファイルと変換コストが最小の基準の提案"""
+    if len(all_metadata) < 2:
+        return ""
+    # 距離行列は基準に依存しないため、基準の切り替えでは再計算しない
+    result = memoize_render("spec-distance", (all_metadata,), (), lambda: analyze_spec_distance(all_metadata))
+    return "\n\n" + format_spec_distance_report(result, filenames, base_index)
+
+
+def analyze_multiple_videos(files, extra_analyses=None, group_specs: bool = False,
+                            file_page: int = 1, row_page: int = 1):
     """
     複数の動画を解析して比較する
     
     Args:
         files: ファイルパスのリスト
+        extra_analyses: 実行する追加解析（EXTRA_ANALYSES の要素）のリスト
+        group_specs: 同じ仕様のファイルを1列にまとめて表示するか
+        file_page: 比較テーブルに表示するファイル列のページ
+        row_page: 比較テーブルに表示する項目行のページ
     
     Returns:
         tuple: (サムネイルHTML, 比較テーブルHTML, 変換サマリーテキスト, ffmpegコマンド)
@@ -981,10 +1180,15 @@ def analyze_multiple_videos(files):
     filenames = []
     thumbnails = []
     
+    extra_analyses = extra_analyses or []
+    
     for file_path in files:
         if file_path:
             meta = analyze_video(file_path)
             meta_dict = metadata_to_dict(meta)
+            # シーン解析はサムネイルの代表フレーム選択にも使うため先に実行する
+            if EXTRA_ANALYSIS_SCENE in extra_analyses and not meta.error:
+                meta_dict.update(scene_to_dict(analyze_scenes(file_path)))
             all_metadata.append(meta_dict)
             all_meta_raw.append(meta)
             filenames.append(file_path)
@@ -992,10 +1196,42 @@ def analyze_multiple_videos(files):
             thumb = generate_thumbnail(file_path)
             thumbnails.append(thumb)
     
+    # 追加解析（ファイルごとに並列実行し、結果を比較テーブルの行として追加）
+    if EXTRA_ANALYSIS_LOUDNESS in extra_analyses:
+        for meta, meta_dict, result in zip(all_meta_raw, all_metadata, analyze_loudness_batch(filenames)):
+            if not meta.error:
+                meta_dict.update(loudness_to_dict(result))
+    if EXTRA_ANALYSIS_QC in extra_analyses:
+        # QC検出は1ファイル内の区間をCPUコア数ぶん並列に処理するため、ファイルは順に処理する
+        for meta, meta_dict, file_path in zip(all_meta_raw, all_metadata, filenames):
+            if not meta.error:
+                meta_dict.update(qc_to_dict(analyze_qc(file_path)))
+    pictures = None
+    if EXTRA_ANALYSIS_CROP in extra_analyses:
+        # 各ファイル内のサンプリング区間を並列に処理する（結果はffmpegコマンドにも反映）
+        pictures = []
+        for meta, meta_dict, file_path in zip(all_meta_raw, all_metadata, filenames):
+            picture = None
+            if not meta.error:
+                picture = analyze_crop_interlace(file_path)
+                meta_dict.update(crop_interlace_to_dict(picture))
+            pictures.append(picture)
+    histograms = None
+    if EXTRA_ANALYSIS_HISTOGRAM in extra_analyses:
+        # 先頭ファイルを基準に距離とレンジ・ガンマの判定を表示する
+        histograms = [analyze_histogram(f) if not m.error else None for m, f in zip(all_meta_raw, filenames)]
+        base_histogram = histograms[0] if histograms else None
+        for i, (meta_dict, histogram) in enumerate(zip(all_metadata, histograms)):
+            if histogram is not None:
+                meta_dict.update(histogram_to_dict(histogram, base_histogram if i > 0 else None))
+    
     # 結果を生成
     if len(all_metadata) == 0:
         return thumbnails_html, comparison_html, summary_text, ffmpeg_commands, diff_info, gr.update(choices=[], value=None)
     
+    # 以前の解析の描画結果は使わなくなるため破棄する（元データごと保持し続けないようにする）
+    clear_render_cache(len(all_metadata))
+    
     # サムネイルHTML生成
     thumbnails_html = create_thumbnails_html(filenames, thumbnails)
     
@@ -1009,15 +1245,24 @@ def analyze_multiple_videos(files):
         summary_text = "複数の動画を追加すると変換サマリーが表示されます"
     else:
         # 複数ファイル比較
-        comparison_html, diff_count, total_count = create_multi_comparison_html(all_metadata, filenames, False)
+        _latest_results['group_specs'] = group_specs
+        comparison_html, diff_count, total_count = render_comparison_html(all_metadata, filenames, False,
+                                                                          file_page or 1, row_page or 1)
         summary_text = generate_multi_conversion_summary(all_metadata, all_meta_raw, filenames)
+        summary_text += _histogram_matrix_text(histograms, filenames)
+        summary_text += _spec_distance_text(all_metadata, filenames, 0)
         diff_info = f"差分: {diff_count}/{total_count}項目"
     
-    # ffmpegコマンド生成
-    ffmpeg_commands = generate_all_ffmpeg_commands(all_meta_raw, filenames, 0)
+    # ffmpegコマンド生成（エンコード速度は最後に選択したもの）
+    encoder_speed = _latest_results.get('encoder_speed', SPEED_BALANCED)
+    ffmpeg_commands = memoize_render(
+        "ffmpeg", (all_meta_raw, filenames, pictures), _ffmpeg_render_params(0, encoder_speed),
+        lambda: generate_all_ffmpeg_commands(all_meta_raw, filenames, 0, pictures, encoder_speed)
+    )
     
     # グローバル変数に保存
     _latest_results['thumbnails_html'] = thumbnails_html
+    _latest_results['thumbnails'] = thumbnails
     _latest_results['comparison_html'] = comparison_html
     _latest_results['summary_text'] = summary_text
     _latest_results['ffmpeg_commands'] = ffmpeg_commands
@@ -1026,6 +1271,8 @@ def analyze_multiple_videos(files):
     _latest_results['filenames'] = filenames
     _latest_results['diff_count'] = diff_count
     _latest_results['total_count'] = total_count
+    _latest_results['pictures'] = pictures
+    _latest_results['histograms'] = histograms
     
     # 基準ファイル選択肢を更新
     file_choices = [os.path.basename(f) for f in filenames] if filenames else []
@@ -1034,15 +1281,17 @@ def analyze_multiple_videos(files):
     return thumbnails_html, comparison_html, summary_text, ffmpeg_commands, diff_info, gr.update(choices=file_choices, value=default_choice)
 
 
-def apply_diff_filter(show_diff_only: bool):
-    """差分フィルターを適用"""
+def apply_diff_filter(show_diff_only: bool, group_specs: bool = False, file_page: int = 1, row_page: int = 1):
+    """差分フィルター・仕様グループ表示・表示ページを適用"""
     all_metadata = _latest_results.get('all_metadata', [])
     filenames = _latest_results.get('filenames', [])
     
     if len(all_metadata) < 2:
         return _latest_results.get('comparison_html', '')
     
-    comparison_html, _, _ = create_multi_comparison_html(all_metadata, filenames, show_diff_only)
+    _latest_results['group_specs'] = group_specs
+    comparison_html, _, _ = render_comparison_html(all_metadata, filenames, show_diff_only,
+                                                 file_page or 1, row_page or 1)
     return comparison_html
 
 
@@ -1054,8 +1303,12 @@ def get_file_choices():
     return [os.path.basename(f) for f in filenames]
 
 
-def update_base_file(base_file_name: str):
-    """基準ファイルを変更してサマリーとffmpegコマンドを更新"""
+def update_base_file(base_file_name: str, encoder_speed: str = SPEED_BALANCED):
+    """基準ファイル（またはエンコード速度）を変更してサマリーとffmpegコマンドを更新"""
+    # 次の解析でも同じ速度でコマンドを生成する
+    encoder_speed = encoder_speed or SPEED_BALANCED
+    _latest_results['encoder_speed'] = encoder_speed
+    
     all_meta_raw = _latest_results.get('all_meta_raw', [])
     all_metadata = _latest_results.get('all_metadata', [])
     filenames = _latest_results.get('filenames', [])
@@ -1070,14 +1323,63 @@ def update_base_file(base_file_name: str):
             base_index = i
             break
     
-    # サマリーとffmpegコマンドを再生成
-    summary_text = generate_multi_conversion_summary_with_base(all_metadata, all_meta_raw, filenames, base_index)
-    ffmpeg_commands = generate_all_ffmpeg_commands(all_meta_raw, filenames, base_index)
+    # サマリーとffmpegコマンドを再生成（一度表示した基準ならキャッシュから取得）
+    histograms = _latest_results.get('histograms')
+    pictures = _latest_results.get('pictures')
+    summary_text = memoize_render(
+        "summary", (all_metadata, all_meta_raw, filenames, histograms), (base_index,),
+        lambda: (generate_multi_conversion_summary_with_base(all_metadata, all_meta_raw, filenames, base_index)
+                 + _histogram_matrix_text(histograms, filenames)
+                 + _spec_distance_text(all_metadata, filenames, base_index))
+    )
+    ffmpeg_commands = memoize_render(
+        "ffmpeg", (all_meta_raw, filenames, pictures), _ffmpeg_render_params(base_index, encoder_speed),
+        lambda: generate_all_ffmpeg_commands(all_meta_raw, filenames, base_index, pictures, encoder_speed)
+    )
     
     return summary_text, ffmpeg_commands
 
 
-def add_preset_to_comparison(preset_name: str):
+def estimate_by_sample_encode(base_file_name: str, encoder_speed: str = SPEED_BALANCED) -> str:
+    """
+    基準ファイル以外の各ファイルを試し変換して、ffmpegコマンドに出力サイズと処理時間の推定を併記する
+
+    ファイルごとに尺全体から数区間だけを並列にエンコードするため、長尺ファイルでも数秒で終わる。
+    リマックスのみ（再エンコードなし）のファイルは試し変換しない。
+    """
+    all_meta_raw = _latest_results.get('all_meta_raw', [])
+    filenames = _latest_results.get('filenames', [])
+    if len(all_meta_raw) < 2 or not base_file_name:
+        return _latest_results.get('ffmpeg_commands', '')
+
+    base_index = next((i for i, f in enumerate(filenames) if os.path.basename(f) == base_file_name), 0)
+    pictures = _latest_results.get('pictures')
+    encoder_speed = encoder_speed or SPEED_BALANCED
+    for i, (meta, filepath) in enumerate(zip(all_meta_raw, filenames)):
+        if i == base_index:
+            continue
+        plan = plan_conversion(meta, all_meta_raw[base_index],
+                               pictures[i] if pictures else None,
+                               pictures[base_index] if pictures else None)
+        if plan.path != PATH_REMUX:
+            sample_encode(meta, all_meta_raw[base_index], filepath, plan, encoder_speed)
+
+    # 試し変換の結果を含めてコマンドを作り直す
+    _latest_results['sample_runs'] = _latest_results.get('sample_runs', 0) + 1
+    return update_base_file(base_file_name, encoder_speed)[1]
+
+
+def _conformance_text(all_metadata: list, filenames: list, preset_names: list) -> str:
+    """比較中のファイル（プリセット列を除く）を、指定したプリセットのルールで判定したテキスト"""
+    rules = {name: PRESET_RULES[name] for name in preset_names if name in PRESET_RULES}
+    files = [(meta_dict, f) for meta_dict, f in zip(all_metadata, filenames) if not f.startswith("[PRESET]")]
+    if not rules or not files:
+        return ""
+    result = check_conformance([meta_dict for meta_dict, _ in files], compile_rules(rules))
+    return format_conformance_report(result, [f for _, f in files])
+
+
+def add_preset_to_comparison(preset_name: str, file_page: int = 1, row_page: int = 1):
     """プリセットを比較対象に追加"""
     if preset_name not in PRESETS:
         return None, None, None, None, None, None
@@ -1107,7 +1409,8 @@ def add_preset_to_comparison(preset_name: str):
     
     # 比較結果を再生成
     if len(all_metadata) >= 2:
-        comparison_html, diff_count, total_count = create_multi_comparison_html(all_metadata, filenames, False)
+        comparison_html, diff_count, total_count = render_comparison_html(all_metadata, filenames, False,
+                                                                          file_page or 1, row_page or 1)
         diff_info = f"差分: {diff_count}/{total_count}項目"
         _latest_results['comparison_html'] = comparison_html
         _latest_results['diff_count'] = diff_count
@@ -1120,7 +1423,8 @@ def add_preset_to_comparison(preset_name: str):
     file_choices = [os.path.basename(f) if not f.startswith("[PRESET]") else f for f in filenames]
     default_choice = file_choices[0] if file_choices else None
     
-    summary_text = ""
+    # 追加したプリセットのルールで、アップロードしたファイルの適合を判定
+    summary_text = _conformance_text(all_metadata, filenames, presets_added)
     ffmpeg_commands = ""
     
     return (
@@ -1146,52 +1450,16 @@ def generate_multi_conversion_summary_with_base(all_metadata: list, all_meta_raw
     lines.append(f"基準: {os.path.basename(filenames[base_index])}")
     lines.append("=" * 60)
     
-    base_dict = all_metadata[base_index]
-    base_raw = all_meta_raw[base_index]
-    
     for i in range(len(all_metadata)):
         if i == base_index:
             continue
         
-        target_dict = all_metadata[i]
-        target_raw = all_meta_raw[i]
         target_name = os.path.basename(filenames[i])
         
         lines.append("")
         lines.append(f"--- {target_name} との比較 ---")
         
-        differences = []
-        
-        compare_items = [
-            ("コンテナフォーマット", "format_name"),
-            ("映像コーデック", "video.codec_name"),
-            ("解像度", None),
-            ("フレームレート（fps）", "video.fps"),
-            ("映像ビットレート", "video.bit_rate"),
-            ("音声コーデック", "audio.codec_name"),
-            ("サンプルレート", "audio.sample_rate"),
-            ("チャンネル数", "audio.channels"),
-        ]
-        
-        for display_name, attr_path in compare_items:
-            base_val = base_dict.get(display_name, "N/A")
-            target_val = target_dict.get(display_name, "N/A")
-            
-            if base_val != target_val:
-                differences.append(f"[{display_name}] {target_val} -> {base_val}")
-        
-        if base_raw.video and target_raw.video:
-            if base_raw.video.width != target_raw.video.width or base_raw.video.height != target_raw.video.height:
-                base_res = f"{base_raw.video.width}x{base_raw.video.height}"
-                target_res = f"{target_raw.video.width}x{target_raw.video.height}"
-                if base_raw.video.width > 0 and target_raw.video.width > 0:
-                    scale_w = base_raw.video.width / target_raw.video.width
-                    scale_h = base_raw.video.height / target_raw.video.height
-                    differences.append(f"[解像度] {target_res} -> {base_res} (幅{scale_w:.2f}倍, 高さ{scale_h:.2f}倍)")
-        
-        if base_raw.file_size > 0 and target_raw.file_size > 0:
-            ratio = base_raw.file_size / target_raw.file_size
-            differences.append(f"[ファイルサイズ] {target_raw.file_size_human} -> {base_raw.file_size_human} ({ratio:.2f}倍)")
+        differences = _pair_differences(all_metadata, all_meta_raw, base_index, i, toward_base=True)
         
         if differences:
             for diff in differences:
@@ -1214,8 +1482,15 @@ def save_report():
     if not comparison_html or '動画ファイルをドロップ' in comparison_html:
         return None, "解析結果がありません。まず動画をアップロードしてください。"
     
+    # 画面では表示中のページだけを出力しているため、レポートには全ファイル・全項目を出力する
+    all_metadata = _latest_results.get('all_metadata', [])
+    if len(all_metadata) >= 2:
+        comparison_html, _, _ = render_comparison_html(all_metadata, _latest_results.get('filenames', []))
+    
     # レポートを保存
-    saved_path = save_report_as_image(thumbnails_html, comparison_html, summary_text)
+    saved_path = save_report_as_image(thumbnails_html, comparison_html, summary_text,
+                                      all_metadata, _latest_results.get('filenames', []),
+                                      _latest_results.get('thumbnails', []))
     
     if saved_path:
         filename = os.path.basename(saved_path)
@@ -1224,6 +1499,289 @@ def save_report():
         return None, "レポートの保存に失敗しました"
 
 
+def export_result_files(base_file_name: str, export_format: str):
+    """解析結果を型付きメタデータと基準ファイルとの比較の2ファイル（JSON Lines / CSV / Parquet / Arrow）に書き出す"""
+    all_meta_raw = _latest_results.get('all_meta_raw', [])
+    filenames = _latest_results.get('filenames', [])
+    if not all_meta_raw:
+        return None, "解析結果がありません。まず動画をアップロードしてください。"
+    
+    # プリセット列は filenames の末尾に追加されるため、解析したファイルの分だけを書き出す
+    base_index = next((i for i, f in enumerate(filenames[:len(all_meta_raw)])
+                       if os.path.basename(f) == base_file_name), 0)
+    export_format = export_format or EXPORT_JSONL
+    extension = EXPORT_EXTENSIONS[export_format]
+    count = len(all_meta_raw)
+    
+    # 同じ解析結果・基準・形式なら書き出し済みのファイルを再利用する
+    store = _get_report_store()
+    key = hashlib.sha1(repr((all_meta_raw, filenames[:count], base_index, export_format)).encode('utf-8')).hexdigest()
+    try:
+        paths, _ = store.save_all(
+            ["results_metadata", "results_comparison"], key, extension,
+            lambda prefix: export_results(all_meta_raw[base_index], zip(all_meta_raw, filenames),
+                                          prefix, export_format)[:2])
+    except RuntimeError as e:
+        return None, str(e)
+    
+    return paths, f"解析結果を書き出しました: {os.path.basename(paths[0])} / {os.path.basename(paths[1])}（{count}ファイル）"
+
+
+def run_quality_comparison(base_file_name: str, sampled: bool) -> str:
+    """基準ファイルに対する各ファイルのPSNR/SSIMを計測"""
+    filenames = [f for f in _latest_results.get('filenames', []) if not f.startswith("[PRESET]")]
+    if len(filenames) < 2:
+        return "2つ以上の動画をアップロードすると画質比較ができます"
+    
+    # 基準ファイルを特定（未選択なら先頭）
+    reference_path = filenames[0]
+    for f in filenames:
+        if os.path.basename(f) == base_file_name:
+            reference_path = f
+            break
+    
+    reports = []
+    for file_path in filenames:
+        if file_path == reference_path:
+            continue
+        result = measure_quality(reference_path, file_path, sampled=sampled)
+        reports.append(format_quality_report(result, os.path.basename(reference_path), os.path.basename(file_path)))
+    
+    return "\n\n".join(reports)
+
+
+def run_frame_diff(base_file_name: str, position: float):
+    """
+    基準ファイルと各ファイルの同じ時刻のフレームを並べ、差分ヒートマップを生成
+    
+    Args:
+        base_file_name: 基準ファイル名
+        position: 基準ファイルの尺に対する位置（%）
+    
+    Returns:
+        tuple: ([基準 | 比較 | 差分] を縦に並べた画像, 統計テキスト)
+    """
+    filenames = [f for f in _latest_results.get('filenames', []) if not f.startswith("[PRESET]")]
+    if len(filenames) < 2:
+        return None, "2つ以上の動画をアップロードするとフレーム差分を表示できます"
+    
+    # 基準ファイルを特定（未選択なら先頭）
+    reference_path = filenames[0]
+    reference_meta = None
+    for f, meta in zip(filenames, _latest_results.get('all_meta_raw', [])):
+        if os.path.basename(f) == base_file_name:
+            reference_path = f
+            reference_meta = meta
+            break
+    if reference_meta is None:
+        reference_meta = _latest_results['all_meta_raw'][0]
+    
+    timestamp = reference_meta.duration * (position or 0) / 100
+    # 末尾ちょうどはフレームが取得できないため少し手前にする
+    timestamp = max(0.0, min(timestamp, reference_meta.duration - 0.1))
+    
+    rows = []
+    reports = []
+    for file_path in filenames:
+        if file_path == reference_path:
+            continue
+        result = compare_frames(reference_path, file_path, timestamp)
+        reports.append(format_frame_diff(result, os.path.basename(reference_path), os.path.basename(file_path)))
+        if result.image is not None:
+            rows.append(result.image)
+    
+    if not rows:
+        return None, "\n\n".join(reports)
+    
+    # 比較ファイルごとに幅が異なる場合があるため右側を黒で埋めて縦に並べる
+    width = max(row.shape[1] for row in rows)
+    image = np.concatenate([
+        np.pad(row, ((0, 0), (0, width - row.shape[1]), (0, 0))) for row in rows
+    ], axis=0)
+    return image, "\n\n".join(reports)
+
+
+def run_sync_detection(base_file_name: str) -> str:
+    """基準ファイルに対する各ファイルの音声オフセットを推定"""
+    filenames = [f for f in _latest_results.get('filenames', []) if not f.startswith("[PRESET]")]
+    if len(filenames) < 2:
+        return "2つ以上の動画をアップロードすると音声同期を解析できます"
+    
+    # 基準ファイルを特定（未選択なら先頭）
+    reference_path = filenames[0]
+    for f in filenames:
+        if os.path.basename(f) == base_file_name:
+            reference_path = f
+            break
+    
+    reports = []
+    for file_path in filenames:
+        if file_path == reference_path:
+            continue
+        result = detect_sync_offset(reference_path, file_path)
+        reports.append(format_sync_report(result, os.path.basename(reference_path), os.path.basename(file_path)))
+    
+    return "\n\n".join(reports)
+
+
+# 変換ジョブのキュー（初回の実行時に作成）
+_job_runner = {'runner': None, 'shown': None}
+
+
+def _get_job_runner() -> JobRunner:
+    """変換ジョブのキューを取得"""
+    if _job_runner['runner'] is None:
+        _job_runner['runner'] = JobRunner()
+    return _job_runner['runner']
+
+
+def _conversion_jobs(base_file_name: str, output_dir: str, segments: int, tuning: EncoderTuning,
+                     source_root: str = "") -> list:
+    """
+    基準ファイル以外の全ファイルを基準の仕様に変換するジョブを作成（ファイルが足りなければ None）
+
+    source_root を指定すると、ソースをそのフォルダ内の同じ名前のファイルとして扱う
+    （アップロードされた一時ファイルではなく、別のマシンにある元の動画を変換するバッチ用）。
+    """
+    all_meta_raw = _latest_results.get('all_meta_raw', [])
+    # プリセットは all_meta_raw に含まれないため、実ファイルの分だけ使う
+    filenames = _latest_results.get('filenames', [])[:len(all_meta_raw)]
+    if len(all_meta_raw) < 2:
+        return None
+    if source_root:
+        # バッチは make / sh で実行するため、実行するマシンのパスは / 区切りで組み立てる
+        filenames = [posixpath.join(source_root, os.path.basename(f)) for f in filenames]
+    
+    base_index = 0
+    for i, f in enumerate(filenames):
+        if os.path.basename(f) == base_file_name:
+            base_index = i
+            break
+    
+    if not output_dir:
+        # 別のマシン向けのバッチでは、このアプリの場所ではなく実行したフォルダの下に出力する
+        output_dir = "converted" if source_root else os.path.join(os.path.dirname(os.path.abspath(__file__)), "converted")
+    
+    return create_jobs(all_meta_raw, filenames, base_index, output_dir, _latest_results.get('pictures'),
+                       segments, tuning)
+
+
+def start_conversions(base_file_name: str, output_dir: str, segmented: bool = False,
+                      encoder_speed: str = SPEED_BALANCED) -> str:
+    """基準ファイル以外の全ファイルを基準の仕様に変換するジョブを開始（segmented なら長尺ファイルを分割エンコード）"""
+    runner = _get_job_runner()
+    # 分割する区間数は、1ジョブで全コアを使い切る数（CPUコア数 ÷ 1プロセスのスレッド数）
+    segments = max(1, (os.cpu_count() or 1) // runner.threads_per_job) if segmented else 1
+    jobs = _conversion_jobs(base_file_name, output_dir, segments, EncoderTuning(encoder_speed, runner.threads_per_job))
+    if jobs is None:
+        return "2つ以上の動画をアップロードすると変換できます"
+    if not jobs:
+        return "変換できるファイルがありません"
+    
+    runner.submit(jobs)
+    return format_jobs(runner.jobs())
+
+
+def export_conversion_batch(base_file_name: str, output_dir: str, batch_format: str,
+                            encoder_speed: str = SPEED_BALANCED, source_root: str = ""):
+    """
+    変換ジョブを別のマシンで並列実行できるバッチスクリプト（Makefile / xargs用シェルスクリプト）に書き出す
+
+    アップロードされた動画はこのマシンの一時フォルダにあるため、別のマシンで実行するには
+    source_root（実行するマシン上の元の動画のフォルダ）を指定する。
+    """
+    source_root = (source_root or "").strip()
+    # 実行するマシンのコア数は分からないため、スレッド数はエンコーダーの既定に任せる
+    jobs = _conversion_jobs(base_file_name, output_dir, 1, EncoderTuning(encoder_speed, 0), source_root)
+    if not jobs:
+        return None, "2つ以上の動画をアップロードすると書き出せます"
+    
+    extension = ".mk" if batch_format == BATCH_MAKEFILE else ".sh"
+    key = hashlib.sha1(repr(([job.args for job in jobs], batch_format)).encode('utf-8')).hexdigest()
+    path, _ = _get_report_store().save("convert", key, extension,
+                                       lambda temp_path: export_batch(jobs, temp_path, batch_format))
+    
+    if source_root:
+        return path, f"バッチスクリプトを書き出しました: {os.path.basename(path)}（{len(jobs)}件、ソース: {source_root}）"
+    return path, (f"バッチスクリプトを書き出しました: {os.path.basename(path)}（{len(jobs)}件）\n"
+                  "注意: ソースはアップロードされたこのマシンの一時ファイルを指しているため、このマシンでしか実行できません。"
+                  "別のマシンで実行するには「元動画のフォルダ」を指定してください")
+
+
+def cancel_conversions() -> str:
+    """実行中・待機中の変換ジョブをキャンセル"""
+    runner = _get_job_runner()
+    runner.cancel()
+    return format_jobs(runner.jobs())
+
+
+def retry_conversions() -> str:
+    """失敗・キャンセル・検証NGの変換ジョブを再実行"""
+    runner = _get_job_runner()
+    runner.retry()
+    return format_jobs(runner.jobs())
+
+
+def refresh_conversions():
+    """変換ジョブの進捗表示を更新（前回から変化がなければ表示を変えない）"""
+    runner = _job_runner['runner']
+    if runner is None:
+        return gr.update()
+    text = format_jobs(runner.jobs())
+    if text == _job_runner.get('shown'):
+        return gr.update()
+    _job_runner['shown'] = text
+    return text
+
+
+# 知覚ハッシュインデックス（読み込み済みのものを保持）
+_phash_index = {'index': None}
+
+
+def _get_phash_index() -> PerceptualHashIndex:
+    """知覚ハッシュインデックスを取得（初回のみディスクから読み込む）"""
+    if _phash_index['index'] is None:
+        _phash_index['index'] = PerceptualHashIndex.load(DEFAULT_INDEX_PATH)
+    return _phash_index['index']
+
+
+def update_library_index(library_dir: str) -> str:
+    """ライブラリフォルダの動画を知覚ハッシュインデックスに登録"""
+    if not library_dir or not os.path.isdir(library_dir):
+        return "フォルダが見つかりません"
+    
+    index, added, failed = build_index(collect_video_files(library_dir), _get_phash_index())
+    index.save(DEFAULT_INDEX_PATH)
+    
+    return f"登録済み: {len(index)}件（追加・更新 {added}件, 失敗 {failed}件）"
+
+
+def search_similar_files(max_distance: float) -> str:
+    """アップロードした動画と同じ素材のファイルをライブラリから検索"""
+    filenames = [f for f in _latest_results.get('filenames', []) if not f.startswith("[PRESET]")]
+    if not filenames:
+        return "まず動画をアップロードしてください"
+    
+    index = _get_phash_index()
+    if len(index) == 0:
+        return "インデックスが空です。先にライブラリフォルダを登録してください"
+    
+    lines = []
+    for file_path in filenames:
+        lines.append(f"■ {os.path.basename(file_path)}")
+        results = find_similar(file_path, index, max_distance=max_distance)
+        if results is None:
+            lines.append("  ハッシュを計算できませんでした")
+        elif not results:
+            lines.append("  類似ファイルなし")
+        else:
+            for path, distance in results:
+                lines.append(f"  {distance:6.2f}  {path}")
+        lines.append("")
+    
+    return "\n".join(lines)
+
+
 # ネオンイエローテーマ
 neon_yellow_theme = gr.themes.Base(
     primary_hue=gr.themes.Color(
@@ -1302,6 +1860,13 @@ def create_app():
                 scale=0
             )
         
+        # 追加解析
+        extra_analysis_group = gr.CheckboxGroup(
+            label="追加解析（音声・映像をデコードするため時間がかかります）",
+            choices=EXTRA_ANALYSES,
+            value=[]
+        )
+        
         # プリセット追加
         gr.HTML("<p class='input-label' style='margin-top: 1rem;'>プリセットと比較</p>")
         with gr.Row():
@@ -1335,6 +1900,10 @@ def create_app():
                 label="差分がある項目のみ表示",
                 value=False
             )
+            group_specs_checkbox = gr.Checkbox(
+                label="同じ仕様のファイルを1列にまとめる（多数のファイル向け）",
+                value=False
+            )
             diff_info_label = gr.Textbox(
                 value="",
                 label="",
@@ -1343,6 +1912,21 @@ def create_app():
                 max_lines=1
             )
         
+        # 表示ページ（多数のファイル・項目は分割して表示）
+        with gr.Row():
+            file_page_input = gr.Number(
+                label=f"ファイル列のページ（{COMPARISON_PAGE_FILES}件ずつ）",
+                value=1,
+                minimum=1,
+                precision=0
+            )
+            row_page_input = gr.Number(
+                label=f"項目行のページ（{COMPARISON_PAGE_ROWS}件ずつ）",
+                value=1,
+                minimum=1,
+                precision=0
+            )
+        
         comparison_output = gr.HTML(
             value="<p style='color: #888;'>動画ファイルをドロップしてください（複数可）</p>",
             elem_classes=["diff-table"]
@@ -1360,6 +1944,13 @@ def create_app():
                 interactive=True,
                 scale=2
             )
+            encoder_speed_dropdown = gr.Dropdown(
+                label="エンコード速度（ffmpegコマンド・変換の実行）",
+                choices=list(ENCODER_SPEEDS),
+                value=SPEED_BALANCED,
+                interactive=True,
+                scale=1
+            )
         
         summary_output = gr.Textbox(
             value="",
@@ -1396,6 +1987,11 @@ def create_app():
                 variant="secondary",
                 size="sm"
             )
+            sample_encode_btn = gr.Button(
+                "試し変換で見積もる",
+                variant="secondary",
+                size="sm"
+            )
             save_btn = gr.Button(
                 "レポートを保存",
                 variant="secondary",
@@ -1417,49 +2013,312 @@ def create_app():
             visible=False
         )
         
+        # 解析結果の書き出し（型付きメタデータと基準ファイルとの比較）
+        with gr.Row():
+            export_format_radio = gr.Radio(
+                choices=list(EXPORT_FORMATS),
+                value=EXPORT_JSONL,
+                label="解析結果の書き出し形式",
+                scale=3
+            )
+            export_results_btn = gr.Button(
+                "解析結果を書き出し",
+                variant="secondary",
+                size="sm",
+                scale=1
+            )
+        export_files = gr.File(
+            label="解析結果",
+            file_count="multiple",
+            visible=False
+        )
+        
+        # 画質比較
+        gr.HTML("<h3 class='section-title'>画質比較（PSNR/SSIM）・音声同期</h3>")
+        with gr.Row():
+            quality_sampled_checkbox = gr.Checkbox(
+                label="サンプリングモード（長尺ファイルを数秒で推定）",
+                value=True
+            )
+            quality_btn = gr.Button(
+                "基準ファイルと画質を比較",
+                variant="secondary",
+                size="sm"
+            )
+            sync_btn = gr.Button(
+                "基準ファイルとの音声ずれを解析",
+                variant="secondary",
+                size="sm"
+            )
+        quality_output = gr.Textbox(
+            value="",
+            label="",
+            lines=8,
+            max_lines=30,
+            elem_classes=["summary-box"],
+            interactive=False
+        )
+        
+        # 変換の実行
+        gr.HTML("<h3 class='section-title'>変換の実行（基準ファイルの仕様に変換）</h3>")
+        with gr.Row():
+            convert_dir_input = gr.Textbox(
+                label="出力フォルダ（空欄ならアプリのフォルダの converted）",
+                placeholder="/path/to/output",
+                scale=3
+            )
+            convert_segmented_checkbox = gr.Checkbox(
+                label="長尺ファイルをキーフレームで分割して並列エンコード",
+                value=False,
+                scale=1
+            )
+            convert_btn = gr.Button(
+                "変換を実行",
+                variant="secondary",
+                size="sm",
+                scale=1
+            )
+            cancel_convert_btn = gr.Button(
+                "キャンセル",
+                variant="secondary",
+                size="sm",
+                scale=1
+            )
+            retry_convert_btn = gr.Button(
+                "失敗したジョブを再実行",
+                variant="secondary",
+                size="sm",
+                scale=1
+            )
+        with gr.Row():
+            batch_format_radio = gr.Radio(
+                label="バッチスクリプトの形式（make -j / xargs -P で並列実行）",
+                choices=list(BATCH_FORMATS),
+                value=BATCH_MAKEFILE,
+                scale=2
+            )
+            batch_source_root_input = gr.Textbox(
+                label="元動画のフォルダ（実行するマシン上のパス。空欄ならこのマシンの一時ファイルを使う）",
+                placeholder="/mnt/videos",
+                scale=2
+            )
+            export_batch_btn = gr.Button(
+                "バッチスクリプトを書き出し",
+                variant="secondary",
+                size="sm",
+                scale=1
+            )
+        batch_file = gr.File(
+            label="バッチスクリプト",
+            visible=False
+        )
+        convert_output = gr.Textbox(
+            value="",
+            label="",
+            lines=6,
+            max_lines=30,
+            elem_classes=["summary-box"],
+            interactive=False
+        )
+        convert_timer = gr.Timer(1.0)
+        
+        # フレーム差分
+        gr.HTML("<h3 class='section-title'>フレーム差分（ヒートマップ）</h3>")
+        with gr.Row():
+            frame_position_slider = gr.Slider(
+                minimum=0,
+                maximum=100,
+                value=10,
+                step=0.1,
+                label="位置（基準ファイルの尺に対する%）",
+                scale=3
+            )
+            frame_diff_btn = gr.Button(
+                "フレームを比較",
+                variant="secondary",
+                size="sm",
+                scale=1
+            )
+        frame_diff_image = gr.Image(
+            label="基準 | 比較 | 差分",
+            type="numpy",
+            interactive=False
+        )
+        frame_diff_output = gr.Textbox(
+            value="",
+            label="",
+            lines=3,
+            max_lines=15,
+            elem_classes=["summary-box"],
+            interactive=False
+        )
+        
+        # 類似ファイル検索
+        gr.HTML("<h3 class='section-title'>類似ファイル検索（ライブラリ）</h3>")
+        with gr.Row():
+            library_dir_input = gr.Textbox(
+                label="ライブラリフォルダ",
+                placeholder="/path/to/library",
+                scale=3
+            )
+            index_btn = gr.Button(
+                "インデックスを作成・更新",
+                variant="secondary",
+                size="sm",
+                scale=1
+            )
+        with gr.Row():
+            similar_distance_slider = gr.Slider(
+                label="類似判定のしきい値（1フレームあたりのハミング距離）",
+                minimum=0,
+                maximum=32,
+                value=DEFAULT_MAX_DISTANCE,
+                step=1,
+                scale=3
+            )
+            similar_btn = gr.Button(
+                "類似ファイルを検索",
+                variant="secondary",
+                size="sm",
+                scale=1
+            )
+        similar_output = gr.Textbox(
+            value="",
+            label="",
+            lines=6,
+            max_lines=20,
+            elem_classes=["summary-box"],
+            interactive=False
+        )
+        
         # フッター
         gr.HTML("""
             <div class="app-footer">
                 <p>DiffMovie v3.0 - Powered by ffprobe</p>
-                <p style="font-size: 0.8rem; color: #555;">ffmpegコマンド生成 / 差分フィルター / 基準ファイル選択 / プリセット比較</p>
+                <p style="font-size: 0.8rem; color: #555;">ffmpegコマンド生成 / 変換の実行 / 差分フィルター / 仕様グループ表示 / 基準ファイル選択 / プリセット比較 / ラウドネス / QC検出 / シーン解析 / クロップ・インターレース検出 / 色ヒストグラム / 画質比較 / 音声同期 / フレーム差分 / 類似ファイル検索</p>
             </div>
         """)
         
         # イベントハンドラ
         compare_btn.click(
             fn=analyze_multiple_videos,
-            inputs=[video_files],
+            inputs=[video_files, extra_analysis_group, group_specs_checkbox, file_page_input, row_page_input],
             outputs=[thumbnails_output, comparison_output, summary_output, ffmpeg_output, diff_info_label, base_file_dropdown]
         )
         
         # ファイル変更時も自動比較
         video_files.change(
             fn=analyze_multiple_videos,
-            inputs=[video_files],
+            inputs=[video_files, extra_analysis_group, group_specs_checkbox, file_page_input, row_page_input],
             outputs=[thumbnails_output, comparison_output, summary_output, ffmpeg_output, diff_info_label, base_file_dropdown]
         )
         
-        # 差分フィルターの適用
-        diff_filter_checkbox.change(
-            fn=apply_diff_filter,
-            inputs=[diff_filter_checkbox],
-            outputs=[comparison_output]
-        )
+        # 差分フィルター・仕様グループ表示・表示ページの切り替え
+        for control in (diff_filter_checkbox, group_specs_checkbox, file_page_input, row_page_input):
+            control.change(
+                fn=apply_diff_filter,
+                inputs=[diff_filter_checkbox, group_specs_checkbox, file_page_input, row_page_input],
+                outputs=[comparison_output]
+            )
         
-        # 基準ファイル変更時
-        base_file_dropdown.change(
-            fn=update_base_file,
-            inputs=[base_file_dropdown],
-            outputs=[summary_output, ffmpeg_output]
+        # 基準ファイル・エンコード速度の変更時
+        for control in (base_file_dropdown, encoder_speed_dropdown):
+            control.change(
+                fn=update_base_file,
+                inputs=[base_file_dropdown, encoder_speed_dropdown],
+                outputs=[summary_output, ffmpeg_output]
+            )
+        
+        # 試し変換ボタン
+        sample_encode_btn.click(
+            fn=estimate_by_sample_encode,
+            inputs=[base_file_dropdown, encoder_speed_dropdown],
+            outputs=[ffmpeg_output]
         )
         
         # プリセット追加ボタン
         add_preset_btn.click(
             fn=add_preset_to_comparison,
-            inputs=[preset_dropdown],
+            inputs=[preset_dropdown, file_page_input, row_page_input],
             outputs=[thumbnails_output, comparison_output, summary_output, ffmpeg_output, diff_info_label, base_file_dropdown]
         )
         
+        # 画質比較ボタン
+        quality_btn.click(
+            fn=run_quality_comparison,
+            inputs=[base_file_dropdown, quality_sampled_checkbox],
+            outputs=[quality_output]
+        )
+        
+        # 音声同期解析ボタン
+        sync_btn.click(
+            fn=run_sync_detection,
+            inputs=[base_file_dropdown],
+            outputs=[quality_output]
+        )
+        
+        # フレーム差分（スライダーを離したときにも更新）
+        frame_diff_btn.click(
+            fn=run_frame_diff,
+            inputs=[base_file_dropdown, frame_position_slider],
+            outputs=[frame_diff_image, frame_diff_output]
+        )
+        frame_position_slider.release(
+            fn=run_frame_diff,
+            inputs=[base_file_dropdown, frame_position_slider],
+            outputs=[frame_diff_image, frame_diff_output]
+        )
+        
+        # 変換の実行・キャンセル・再実行ボタン
+        convert_btn.click(
+            fn=start_conversions,
+            inputs=[base_file_dropdown, convert_dir_input, convert_segmented_checkbox, encoder_speed_dropdown],
+            outputs=[convert_output]
+        )
+        cancel_convert_btn.click(
+            fn=cancel_conversions,
+            inputs=[],
+            outputs=[convert_output]
+        )
+        retry_convert_btn.click(
+            fn=retry_conversions,
+            inputs=[],
+            outputs=[convert_output]
+        )
+        
+        # バッチスクリプトの書き出し
+        export_batch_btn.click(
+            fn=export_conversion_batch,
+            inputs=[base_file_dropdown, convert_dir_input, batch_format_radio, encoder_speed_dropdown,
+                    batch_source_root_input],
+            outputs=[batch_file, convert_output]
+        ).then(
+            fn=lambda x: gr.update(visible=True) if x else gr.update(visible=False),
+            inputs=[batch_file],
+            outputs=[batch_file]
+        )
+        
+        # 変換の進捗を定期的に更新
+        convert_timer.tick(
+            fn=refresh_conversions,
+            inputs=[],
+            outputs=[convert_output]
+        )
+        
+        # インデックス作成ボタン
+        index_btn.click(
+            fn=update_library_index,
+            inputs=[library_dir_input],
+            outputs=[similar_output]
+        )
+        
+        # 類似ファイル検索ボタン
+        similar_btn.click(
+            fn=search_similar_files,
+            inputs=[similar_distance_slider],
+            outputs=[similar_output]
+        )
+        
         # サマリーコピーボタンのJavaScript
         copy_summary_btn.click(
             fn=None,
@@ -1500,6 +2359,17 @@ def create_app():
             inputs=[download_file],
             outputs=[download_file]
         )
+        
+        # 解析結果の書き出しボタン
+        export_results_btn.click(
+            fn=export_result_files,
+            inputs=[base_file_dropdown, export_format_radio],
+            outputs=[export_files, save_status]
+        ).then(
+            fn=lambda x: gr.update(visible=True) if x else gr.update(visible=False),
+            inputs=[export_files],
+            outputs=[export_files]
+        )
     
     return app
 
@@ -0,0 +1,222 @@
+"""
+音声同期解析モジュール
+2つの動画の音声を短い区間ごとにデコードし、FFTによる相互相関で時間ずれ（オフセット）を推定する
+"""
+
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from video_analyzer import analyze_video
+from segments import spread_windows
+
+
+# 解析用のサンプルレート（モノラルにダウンミックス）
+SYNC_SAMPLE_RATE = 8000
+# 区間数と基準側の区間の長さ（秒）
+DEFAULT_WINDOW_COUNT = 5
+DEFAULT_WINDOW_LENGTH = 10.0
+# 探索するオフセットの範囲（±秒）
+DEFAULT_MAX_OFFSET = 5.0
+# オフセット・ドリフトの集計に使う最低信頼度（正規化相互相関）
+MIN_CONFIDENCE = 0.3
+
+
+@dataclass
+class SyncWindow:
+    """区間ごとの推定結果"""
+    time: float = 0.0        # 基準ファイル側の区間開始（秒）
+    offset: float = 0.0      # 比較ファイル側のずれ（秒、正なら比較ファイルが遅れている）
+    confidence: float = 0.0  # 正規化相互相関のピーク値（0-1）
+
+
+@dataclass
+class SyncResult:
+    """音声同期解析の結果"""
+    offset: Optional[float] = None
+    confidence: float = 0.0
+    drift_ms_per_min: Optional[float] = None
+    windows: list = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def _decode_audio(file_path: str, start: float, length: float) -> Optional[np.ndarray]:
+    """
+    指定区間の音声をモノラル・低サンプルレートのfloat32配列としてデコードする
+
+    区間の長さに比例したメモリしか使わないため、ファイル全体の長さには依存しない。
+    """
+    cmd = ['ffmpeg', '-v', 'error', '-nostdin']
+    if start > 0:
+        cmd += ['-ss', f'{start:.3f}']
+    cmd += [
+        '-t', f'{length:.3f}',
+        '-vn', '-sn', '-dn',
+        '-i', file_path,
+        '-map', '0:a:0',
+        '-ac', '1',
+        '-ar', str(SYNC_SAMPLE_RATE),
+        '-f', 'f32le',
+        '-'
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=60)
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+
+    samples = np.frombuffer(result.stdout, dtype=np.float32).astype(np.float64)
+    return samples - samples.mean()
+
+
+def _normalized_cross_correlation(reference: np.ndarray, search: np.ndarray) -> np.ndarray:
+    """
+    reference を search 上でずらしたときの正規化相互相関を返す
+
+    Returns:
+        np.ndarray: 長さ len(search) - len(reference) + 1。k番目は search[k:k+len(reference)] との相関
+    """
+    n = len(reference)
+    size = n + len(search) - 1
+    nfft = 1 << (size - 1).bit_length()
+
+    spectrum = np.fft.rfft(search, nfft) * np.conj(np.fft.rfft(reference, nfft))
+    correlation = np.fft.irfft(spectrum, nfft)[:len(search) - n + 1]
+
+    # search 側のスライディング窓エネルギーで正規化する
+    energy = np.concatenate(([0.0], np.cumsum(search ** 2)))
+    window_energy = energy[n:] - energy[:-n]
+    denominator = np.sqrt(np.sum(reference ** 2) * np.maximum(window_energy, 1e-12))
+    return correlation / denominator
+
+
+def _estimate_window(reference_path: str, other_path: str, start: float,
+                     length: float, max_offset: float) -> Optional[SyncWindow]:
+    """1区間ぶんのオフセットを推定する"""
+    search_start = max(start - max_offset, 0.0)
+    reference = _decode_audio(reference_path, start, length)
+    search = _decode_audio(other_path, search_start, start - search_start + length + max_offset)
+    if reference is None or search is None or len(search) < len(reference) or not reference.any():
+        return None
+
+    ncc = _normalized_cross_correlation(reference, search)
+    peak = int(np.argmax(ncc))
+
+    # 放物線補間でサンプル以下の精度に補正する
+    shift = 0.0
+    if 0 < peak < len(ncc) - 1:
+        left, center, right = ncc[peak - 1], ncc[peak], ncc[peak + 1]
+        curvature = left - 2 * center + right
+        if curvature < 0:
+            shift = 0.5 * (left - right) / curvature
+
+    offset = search_start + (peak + shift) / SYNC_SAMPLE_RATE - start
+    return SyncWindow(time=start, offset=offset, confidence=float(np.clip(ncc[peak], 0.0, 1.0)))
+
+
+def detect_sync_offset(reference_path: str, other_path: str,
+                       window_count: int = DEFAULT_WINDOW_COUNT,
+                       window_length: float = DEFAULT_WINDOW_LENGTH,
+                       max_offset: float = DEFAULT_MAX_OFFSET,
+                       max_workers: Optional[int] = None) -> SyncResult:
+    """
+    基準ファイルに対する比較ファイルの音声オフセットとドリフトを推定する
+
+    Args:
+        reference_path: 基準ファイルのパス
+        other_path: 比較ファイルのパス
+        window_count: 尺全体に分散して解析する区間数
+        window_length: 基準側の区間の長さ（秒）
+        max_offset: 探索するオフセットの範囲（±秒）
+        max_workers: 並列数
+
+    Returns:
+        SyncResult: 推定結果
+    """
+    for path in (reference_path, other_path):
+        if not path or not os.path.exists(path):
+            return SyncResult(error="ファイルが見つかりません")
+
+    ref_meta = analyze_video(reference_path)
+    other_meta = analyze_video(other_path)
+    if ref_meta.error or other_meta.error:
+        return SyncResult(error=ref_meta.error or other_meta.error)
+    if ref_meta.audio is None or other_meta.audio is None:
+        return SyncResult(error="音声ストリームがありません")
+
+    duration = min(ref_meta.duration, other_meta.duration)
+    windows = spread_windows(duration, window_count, window_length)
+    if not windows:
+        return SyncResult(error="尺を取得できませんでした")
+
+    workers = max_workers or min(len(windows), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        estimates = list(executor.map(
+            lambda w: _estimate_window(reference_path, other_path, w[0], w[1], max_offset),
+            windows
+        ))
+
+    estimates = [e for e in estimates if e is not None]
+    if not estimates:
+        return SyncResult(error="音声をデコードできませんでした")
+
+    result = SyncResult(windows=estimates)
+    reliable = [e for e in estimates if e.confidence >= MIN_CONFIDENCE]
+    if not reliable:
+        result.confidence = max(e.confidence for e in estimates)
+        result.error = "信頼できる一致が見つかりませんでした（内容が異なる可能性があります）"
+        return result
+
+    offsets = np.array([e.offset for e in reliable])
+    result.offset = float(np.median(offsets))
+    result.confidence = float(np.median([e.confidence for e in reliable]))
+
+    # 区間の時刻に対するオフセットの傾きをドリフトとする
+    if len(reliable) >= 2:
+        times = np.array([e.time for e in reliable])
+        if np.ptp(times) > 0:
+            slope = np.polyfit(times, offsets, 1)[0]
+            result.drift_ms_per_min = float(slope * 1000 * 60)
+
+    return result
+
+
+def format_sync_report(result: SyncResult, reference_name: str, other_name: str) -> str:
+    """音声同期解析の結果をテキストに整形"""
+    lines = []
+    lines.append("=" * 50)
+    lines.append("【音声同期】")
+    lines.append(f"基準: {reference_name}")
+    lines.append(f"比較: {other_name}")
+    lines.append("=" * 50)
+
+    if result.offset is not None:
+        offset_ms = result.offset * 1000
+        if abs(offset_ms) < 0.5:
+            lines.append("[オフセット] 0.0 ms（一致）")
+        else:
+            direction = "遅れ" if offset_ms > 0 else "先行"
+            lines.append(f"[オフセット] {offset_ms:+.1f} ms（比較ファイルが{direction}）")
+        lines.append(f"[信頼度] {result.confidence:.2f}")
+        if result.drift_ms_per_min is not None:
+            lines.append(f"[ドリフト] {result.drift_ms_per_min:+.2f} ms/分")
+    if result.error:
+        lines.append(f"エラー: {result.error}")
+
+    if result.windows:
+        lines.append("")
+        lines.append("区間ごとの推定:")
+        for window in result.windows:
+            lines.append(
+                f"  {window.time:8.2f}s  {window.offset * 1000:+9.1f} ms  信頼度 {window.confidence:.2f}"
+            )
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
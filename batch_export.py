@@ -0,0 +1,138 @@
+"""
+バッチ書き出しモジュール
+変換ジョブを、別のマシン（レンダー用のマシンなど）で並列に実行できる自己完結のスクリプトに書き出す。
+make -j 用の Makefile と、xargs -P で実行するシェルスクリプトの2形式に対応し、
+どちらもソースより新しい出力があるファイルはスキップする（中断しても続きから再開できる）
+"""
+
+import os
+import shlex
+from datetime import datetime
+
+
+BATCH_MAKEFILE = "make"
+BATCH_XARGS = "xargs"
+BATCH_FORMATS = (BATCH_MAKEFILE, BATCH_XARGS)
+# 書き出すファイル名
+BATCH_FILENAMES = {
+    BATCH_MAKEFILE: "Makefile",
+    BATCH_XARGS: "convert_all.sh",
+}
+
+
+def partial_path(output_path: str) -> str:
+    """
+    書き込み途中の出力のパス（拡張子はそのままにして、ffmpegがコンテナを判定できるようにする）
+
+    変換が終わってから本来の名前に移動するため、中断された出力が完了済みと判定されることはない。
+    """
+    base, ext = os.path.splitext(output_path)
+    return f"{base}.partial{ext}"
+
+
+def _ffmpeg_argv(job) -> list:
+    """ジョブの引数を、出力先を書き込み途中のパスに替えたバッチ用の引数にする"""
+    argv = [token for group in job.args for token in group]
+    argv[1:1] = ['-hide_banner', '-nostdin', '-y', '-loglevel', 'error']
+    argv[-1] = partial_path(job.output_path)
+    return argv
+
+
+def _make_prerequisite(path: str) -> str:
+    """Makefile の依存関係に書けるようにパスをエスケープする"""
+    escaped = path.replace('$', '$$')
+    for char in ('\\', ' ', ':', '#'):
+        escaped = escaped.replace(char, '\\' + char)
+    return escaped
+
+
+def _make_target(path: str) -> str:
+    """Makefile のターゲットに書けるようにパスをエスケープする（% があるとパターンルールになるため）"""
+    return _make_prerequisite(path).replace('%', '\\%')
+
+
+def _make_recipe(argv: list) -> str:
+    """Makefile のレシピに書けるようにコマンドをシェル用に引用する（$ は make 用に重ねる）"""
+    return " ".join(shlex.quote(token) for token in argv).replace('$', '$$')
+
+
+def build_makefile(jobs: list) -> str:
+    """
+    出力ごとのターゲットを持つ Makefile を作成する
+
+    ターゲットはソースに依存するため、ソースより新しい出力がある場合は make がスキップする。
+    """
+    outputs = [_make_prerequisite(job.output_path) for job in jobs]
+    lines = []
+    lines.append(f"# DiffMovie 変換バッチ（{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 作成）")
+    lines.append("# 使い方: make -f このファイル -j 並列数  （完了済みの出力はスキップし、中断しても続きから再開）")
+    lines.append("")
+    lines.append(".PHONY: all")
+    lines.append("all: " + " \\\n\t".join(outputs))
+    lines.append("")
+
+    for job in jobs:
+        argv = _ffmpeg_argv(job)
+        lines.append(f"{_make_target(job.output_path)}: {_make_prerequisite(job.source_path)}")
+        lines.append(f"\t@mkdir -p {_make_recipe([os.path.dirname(job.output_path) or '.'])}")
+        lines.append(f"\t{_make_recipe(argv)}")
+        lines.append(f"\t@mv {_make_recipe([argv[-1], job.output_path])}")
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+def build_xargs_script(jobs: list) -> str:
+    """
+    ジョブの一覧を xargs -P で並列に実行するシェルスクリプトを作成する
+
+    1ジョブ1行のコマンドをスクリプト内に持ち、各行はソースより新しい出力があればスキップする。
+    区切りには NUL を使うため、macOS の xargs でも動作する。
+    """
+    lines = []
+    lines.append("#!/bin/sh")
+    lines.append(f"# DiffMovie 変換バッチ（{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 作成）")
+    lines.append("# 使い方: sh このファイル [並列数]  （完了済みの出力はスキップし、中断しても続きから再開）")
+    lines.append('JOBS="${1:-$(getconf _NPROCESSORS_ONLN 2>/dev/null || echo 1)}"')
+    lines.append("")
+    lines.append("tr '\\n' '\\0' <<'DIFFMOVIE_JOBS' | xargs -0 -n 1 -P \"$JOBS\" sh -c")
+
+    for job in jobs:
+        argv = _ffmpeg_argv(job)
+        output = shlex.quote(job.output_path)
+        source = shlex.quote(job.source_path)
+        lines.append(
+            f"if [ -s {output} ] && [ {output} -nt {source} ]; then echo スキップ: {output}; "
+            f"else mkdir -p {shlex.quote(os.path.dirname(job.output_path) or '.')} && "
+            f"{' '.join(shlex.quote(token) for token in argv)} && "
+            f"mv {shlex.quote(argv[-1])} {output} && echo 完了: {output}; fi"
+        )
+
+    lines.append("DIFFMOVIE_JOBS")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def export_batch(jobs: list, path: str, batch_format: str = BATCH_MAKEFILE) -> str:
+    """
+    変換ジョブをバッチスクリプトに書き出す
+
+    Args:
+        jobs: ConversionJob のリスト
+        path: 書き出し先（ディレクトリを指定すると BATCH_FILENAMES の名前で保存）
+        batch_format: BATCH_MAKEFILE または BATCH_XARGS
+
+    Returns:
+        str: 書き出したファイルのパス
+    """
+    if batch_format not in BATCH_FORMATS:
+        raise ValueError(f"未対応の形式です: {batch_format}")
+    if os.path.isdir(path):
+        path = os.path.join(path, BATCH_FILENAMES[batch_format])
+
+    content = build_makefile(jobs) if batch_format == BATCH_MAKEFILE else build_xargs_script(jobs)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    if batch_format == BATCH_XARGS:
+        os.chmod(path, 0o755)
+    return path
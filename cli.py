@@ -0,0 +1,519 @@
+"""
+DiffMovie コマンドラインインターフェース
+GUIを起動せずにライブラリ向けの解析を実行する
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from phash_index import (
+    PerceptualHashIndex,
+    build_index,
+    collect_video_files,
+    find_similar,
+    DEFAULT_INDEX_PATH,
+    DEFAULT_MAX_DISTANCE,
+)
+from quality_metrics import (
+    measure_quality,
+    format_quality_report,
+    DEFAULT_SAMPLE_COUNT,
+    DEFAULT_SAMPLE_LENGTH,
+)
+from audio_sync import (
+    detect_sync_offset,
+    format_sync_report,
+    DEFAULT_WINDOW_COUNT,
+    DEFAULT_MAX_OFFSET,
+)
+from qc_detect import analyze_qc, format_qc_report
+from scene_detect import analyze_scenes, format_scene_report
+from spec_distance import analyze_spec_distance, format_spec_distance_report
+from video_analyzer import analyze_video, metadata_to_dict
+from preset_rules import PRESET_RULES, compile_rules, check_conformance, format_conformance_report
+from conversion_plan import EncoderTuning, ENCODER_SPEEDS, SPEED_BALANCED, SPEED_FASTEST, PATH_REMUX, plan_conversion
+from sample_encode import (
+    sample_encode,
+    format_sample_estimate,
+    DEFAULT_SAMPLE_COUNT as SAMPLE_ENCODE_COUNT,
+    DEFAULT_SAMPLE_LENGTH as SAMPLE_ENCODE_LENGTH,
+)
+from encoder_benchmark import (
+    run_benchmark,
+    format_benchmark,
+    BENCHMARK_ENCODERS,
+    BENCHMARK_SPEEDS,
+    BENCHMARK_RESOLUTIONS,
+    BENCHMARK_FRAMES,
+    DEFAULT_BENCHMARK_PATH,
+)
+from batch_export import export_batch, BATCH_FORMATS, BATCH_FILENAMES, BATCH_MAKEFILE
+from result_export import export_results, EXPORT_FORMATS, EXPORT_JSONL
+from report_store import ReportStore, RetentionPolicy, format_report_entries, DEFAULT_REPORTS_DIR
+from video_analyzer import parse_size_string
+from conversion_jobs import JobRunner, create_jobs, format_jobs, JOB_DONE, JOB_RUNNING
+
+
+def cmd_index(args) -> int:
+    """ディレクトリ以下の動画を知覚ハッシュインデックスに登録"""
+    paths = []
+    for target in args.paths:
+        if os.path.isdir(target):
+            paths.extend(collect_video_files(target))
+        else:
+            paths.append(target)
+
+    index = PerceptualHashIndex.load(args.index)
+    index, added, failed = build_index(paths, index, max_workers=args.jobs)
+    index.save(args.index)
+
+    print(f"インデックス: {args.index}")
+    print(f"登録済み: {len(index)}件（追加・更新 {added}件, 失敗 {failed}件）")
+    return 0
+
+
+def cmd_similar(args) -> int:
+    """指定した動画に類似したファイルをインデックスから検索"""
+    index = PerceptualHashIndex.load(args.index)
+    if len(index) == 0:
+        print(f"インデックスが空です。先に index コマンドを実行してください: {args.index}", file=sys.stderr)
+        return 1
+
+    results = find_similar(args.file, index, max_distance=args.max_distance, limit=args.limit)
+    if results is None:
+        print(f"ハッシュを計算できませんでした: {args.file}", file=sys.stderr)
+        return 1
+
+    if not results:
+        print("類似ファイルは見つかりませんでした")
+        return 0
+
+    for path, distance in results:
+        print(f"{distance:6.2f}  {path}")
+    return 0
+
+
+def cmd_quality(args) -> int:
+    """2つの動画のPSNR/SSIMを計測"""
+    result = measure_quality(
+        args.reference,
+        args.distorted,
+        sampled=args.sampled,
+        sample_count=args.samples,
+        sample_length=args.sample_length,
+        offset=args.offset,
+    )
+    print(format_quality_report(result, os.path.basename(args.reference), os.path.basename(args.distorted)))
+    return 1 if result.error else 0
+
+
+def cmd_sync(args) -> int:
+    """2つの動画の音声オフセットとドリフトを推定"""
+    result = detect_sync_offset(
+        args.reference,
+        args.other,
+        window_count=args.windows,
+        max_offset=args.max_offset,
+    )
+    print(format_sync_report(result, os.path.basename(args.reference), os.path.basename(args.other)))
+    return 1 if result.offset is None else 0
+
+
+def cmd_qc(args) -> int:
+    """黒フレーム・フリーズ・無音の区間を検出"""
+    exit_code = 0
+    for file_path in args.files:
+        result = analyze_qc(file_path)
+        print(format_qc_report(result, os.path.basename(file_path)))
+        if result.error:
+            exit_code = 1
+    return exit_code
+
+
+def cmd_scenes(args) -> int:
+    """シーンカットと代表フレームを解析"""
+    exit_code = 0
+    for file_path in args.files:
+        result = analyze_scenes(file_path)
+        print(format_scene_report(result, os.path.basename(file_path)))
+        if result.error:
+            exit_code = 1
+    return exit_code
+
+
+def _collect_paths(targets: list) -> list:
+    """ファイルとディレクトリの指定を動画ファイルのリストに展開"""
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            paths.extend(collect_video_files(target))
+        else:
+            paths.append(target)
+    return paths
+
+
+def _probe_all(paths: list, jobs: int = None) -> list:
+    """全ファイルのメタデータ辞書を並列に取得"""
+    workers = jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda p: metadata_to_dict(analyze_video(p)), paths))
+
+
+def cmd_distance(args) -> int:
+    """全ファイルの仕様距離から、最も近い参照ファイルと変換コストが最小の基準を求める"""
+    paths = _collect_paths(args.paths)
+    if len(paths) < 2:
+        print("2つ以上の動画ファイルを指定してください", file=sys.stderr)
+        return 1
+
+    all_metadata = _probe_all(paths, args.jobs)
+
+    base_index = None
+    if args.base:
+        names = [os.path.abspath(p) for p in paths]
+        if os.path.abspath(args.base) not in names:
+            print(f"基準ファイルが対象に含まれていません: {args.base}", file=sys.stderr)
+            return 1
+        base_index = names.index(os.path.abspath(args.base))
+
+    result = analyze_spec_distance(all_metadata)
+    print(format_spec_distance_report(result, paths, base_index))
+    return 0
+
+
+def cmd_conform(args) -> int:
+    """プリセットのルールに対する適合を判定（不適合のファイルがあれば終了コード1）"""
+    names = args.preset or list(PRESET_RULES)
+    unknown = [name for name in names if name not in PRESET_RULES]
+    if unknown:
+        print(f"未定義のプリセット: {', '.join(unknown)}（{' / '.join(PRESET_RULES)}）", file=sys.stderr)
+        return 1
+
+    paths = _collect_paths(args.paths)
+    if not paths:
+        print("動画ファイルが見つかりません", file=sys.stderr)
+        return 1
+
+    result = check_conformance(_probe_all(paths, args.jobs), compile_rules({n: PRESET_RULES[n] for n in names}))
+    print(format_conformance_report(result, paths))
+    return 0 if result.passed.all() else 1
+
+
+def _wait_jobs(runner: JobRunner) -> None:
+    """ジョブの終了まで進捗を1行で表示し続ける"""
+    while runner.is_busy():
+        time.sleep(1.0)
+        jobs = runner.jobs()
+        running = [j for j in jobs if j.status == JOB_RUNNING]
+        done = sum(1 for j in jobs if j.status == JOB_DONE)
+        line = f"完了 {done}/{len(jobs)}"
+        for job in running:
+            line += f"  [{job.job_id + 1}] {job.progress * 100:.0f}% {job.speed:.2f}x"
+        print(f"\r{line:<79}", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+
+
+def _probe_target_and_sources(args) -> tuple:
+    """ターゲットと変換するファイルを解析（解析できなければエラーメッセージを返す）"""
+    sources = _collect_paths(args.sources)
+    if not sources:
+        return None, None, "変換する動画ファイルを指定してください"
+
+    filenames = [args.target] + sources
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        all_meta_raw = list(executor.map(analyze_video, filenames))
+    if all_meta_raw[0].error:
+        return None, None, f"ターゲットを解析できません: {all_meta_raw[0].error}"
+    return all_meta_raw, filenames, None
+
+
+def cmd_convert(args) -> int:
+    """ターゲットの仕様に合わせて各ファイルを変換（完了しなかったジョブがあれば終了コード1）"""
+    all_meta_raw, filenames, error = _probe_target_and_sources(args)
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+
+    runner = JobRunner(max_parallel=args.jobs, threads_per_job=args.threads, verify=not args.no_verify)
+    # 0 は自動（CPUコア数 ÷ スレッド数）
+    segments = args.segments or max(1, (os.cpu_count() or 1) // runner.threads_per_job)
+    speed = SPEED_FASTEST if args.fastest else args.speed
+    tuning = EncoderTuning(speed, runner.threads_per_job)
+    runner.submit(create_jobs(all_meta_raw, filenames, 0, args.output, segments=segments, tuning=tuning))
+    _wait_jobs(runner)
+    for _ in range(args.retries):
+        if not runner.retry():
+            break
+        _wait_jobs(runner)
+
+    jobs = runner.jobs()
+    print(format_jobs(jobs))
+    return 0 if all(job.status == JOB_DONE for job in jobs) else 1
+
+
+def cmd_export(args) -> int:
+    """変換ジョブを並列実行用のバッチスクリプト（Makefile / xargs -P 用シェルスクリプト）に書き出す"""
+    all_meta_raw, filenames, error = _probe_target_and_sources(args)
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+
+    speed = SPEED_FASTEST if args.fastest else args.speed
+    jobs = create_jobs(all_meta_raw, filenames, 0, args.output, tuning=EncoderTuning(speed, args.threads or 0))
+    if not jobs:
+        print("変換できるファイルがありません", file=sys.stderr)
+        return 1
+
+    path = export_batch(jobs, args.script or BATCH_FILENAMES[args.format], args.format)
+    print(f"書き出しました: {path}（{len(jobs)}件）")
+    if args.format == BATCH_MAKEFILE:
+        print(f"実行: make -f {path} -j 並列数")
+    else:
+        print(f"実行: sh {path} 並列数")
+    return 0
+
+
+def cmd_results(args) -> int:
+    """解析結果を型付きメタデータと比較の2ファイルに書き出す（解析した順に1件ずつ書き込む）"""
+    paths = _collect_paths(args.paths)
+    target = analyze_video(args.target)
+    if target.error:
+        print(f"ターゲットを解析できません: {target.error}", file=sys.stderr)
+        return 1
+
+    def analyzed():
+        with ThreadPoolExecutor(max_workers=args.jobs or os.cpu_count() or 1) as executor:
+            for i, (path, meta) in enumerate(zip(paths, executor.map(analyze_video, paths)), 1):
+                if i % 100 == 0:
+                    print(f"\r解析済み {i}/{len(paths)}", end="", file=sys.stderr, flush=True)
+                yield meta, path
+
+    try:
+        metadata_path, comparison_path, count = export_results(target, analyzed(), args.output, args.format)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print(f"書き出しました: {metadata_path} / {comparison_path}（{count}ファイル）")
+    return 0
+
+
+def cmd_reports(args) -> int:
+    """保存済みのレポートを一覧表示し、--prune の場合は保存ポリシーを超えたファイルを削除"""
+    policy = RetentionPolicy.from_env()
+    # 0 を指定した項目は制限しない
+    if args.max_age_days is not None:
+        policy.max_age_days = args.max_age_days or None
+    if args.max_count is not None:
+        policy.max_count = args.max_count or None
+    if args.max_size is not None:
+        try:
+            size = int(float(args.max_size))
+        except ValueError:
+            size = int(parse_size_string(args.max_size))
+        policy.max_total_bytes = size or None
+
+    store = ReportStore(args.dir, policy)
+    if args.prune:
+        removed = store.prune()
+        for entry in removed:
+            print(f"削除: {entry.filename}", file=sys.stderr)
+        print(f"{len(removed)}件を削除しました", file=sys.stderr)
+    print(format_report_entries(store.entries(), policy))
+    return 0
+
+
+def cmd_estimate(args) -> int:
+    """分散した区間を試し変換して、各ファイルの変換後のサイズと処理時間を推定"""
+    all_meta_raw, filenames, error = _probe_target_and_sources(args)
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+
+    speed = SPEED_FASTEST if args.fastest else args.speed
+    target_meta = all_meta_raw[0]
+    failed = False
+    for meta, path in zip(all_meta_raw[1:], filenames[1:]):
+        if meta.error:
+            print(f"{path}: 解析できません: {meta.error}")
+            failed = True
+            continue
+        plan = plan_conversion(meta, target_meta)
+        if plan.path == PATH_REMUX:
+            print(f"{path}: {plan.describe()}（試し変換なし）")
+            continue
+        result = sample_encode(meta, target_meta, path, plan, speed, args.samples, args.sample_length)
+        failed = failed or bool(result.error)
+        print(f"{path}: {format_sample_estimate(result)}")
+    return 1 if failed else 0
+
+
+def cmd_benchmark(args) -> int:
+    """合成映像でエンコーダーの速度を計測し、処理時間の見込みに使う結果を保存"""
+    resolutions = []
+    for text in args.resolution or [f"{w}x{h}" for w, h in BENCHMARK_RESOLUTIONS]:
+        try:
+            width, height = (int(v) for v in text.lower().split('x'))
+        except ValueError:
+            print(f"解像度は 幅x高さ で指定してください: {text}", file=sys.stderr)
+            return 1
+        resolutions.append((width, height))
+
+    def report(encoder, speed, width, height, entry):
+        result = f"{entry.fps:.1f} fps" if entry else "使用できません"
+        print(f"  {encoder} / {speed} / {width}x{height}: {result}", file=sys.stderr)
+
+    benchmark = run_benchmark(args.encoder or BENCHMARK_ENCODERS, args.speed or BENCHMARK_SPEEDS, resolutions,
+                              args.threads, args.frames, on_result=report)
+    benchmark.save(args.output)
+    print(format_benchmark(benchmark))
+    print(f"保存先: {args.output}")
+    return 0 if benchmark.entries else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """引数パーサーを構築"""
+    parser = argparse.ArgumentParser(prog="diffmovie", description="DiffMovie - 動画メタデータ比較ツール")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="動画ライブラリの知覚ハッシュインデックスを作成・更新")
+    index_parser.add_argument("paths", nargs="+", help="動画ファイルまたはディレクトリ")
+    index_parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="インデックスファイルのパス")
+    index_parser.add_argument("-j", "--jobs", type=int, default=None, help="並列数（省略時はCPUコア数）")
+    index_parser.set_defaults(func=cmd_index)
+
+    similar_parser = subparsers.add_parser("similar", help="指定した動画と同じ素材のファイルを検索")
+    similar_parser.add_argument("file", help="検索元の動画ファイル")
+    similar_parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="インデックスファイルのパス")
+    similar_parser.add_argument("--max-distance", type=float, default=DEFAULT_MAX_DISTANCE,
+                                help="1フレームあたりの平均ハミング距離の上限（0-64）")
+    similar_parser.add_argument("--limit", type=int, default=20, help="最大表示件数")
+    similar_parser.set_defaults(func=cmd_similar)
+
+    quality_parser = subparsers.add_parser("quality", help="基準ファイルに対するPSNR/SSIMを計測")
+    quality_parser.add_argument("reference", help="基準（高画質側）の動画ファイル")
+    quality_parser.add_argument("distorted", help="比較（変換後）の動画ファイル")
+    quality_parser.add_argument("--sampled", action="store_true", help="分散した区間だけを並列に評価して推定する")
+    quality_parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLE_COUNT, help="サンプリング区間数")
+    quality_parser.add_argument("--sample-length", type=float, default=DEFAULT_SAMPLE_LENGTH,
+                                help="サンプリング区間の長さ（秒）")
+    quality_parser.add_argument("--offset", type=float, default=0.0,
+                                help="比較ファイル側の開始オフセット（秒。負の値は基準ファイル側をずらす）")
+    quality_parser.set_defaults(func=cmd_quality)
+
+    sync_parser = subparsers.add_parser("sync", help="基準ファイルに対する音声のずれ（オフセット・ドリフト）を推定")
+    sync_parser.add_argument("reference", help="基準の動画ファイル")
+    sync_parser.add_argument("other", help="比較する動画ファイル")
+    sync_parser.add_argument("--windows", type=int, default=DEFAULT_WINDOW_COUNT, help="解析する区間数")
+    sync_parser.add_argument("--max-offset", type=float, default=DEFAULT_MAX_OFFSET, help="探索範囲（±秒）")
+    sync_parser.set_defaults(func=cmd_sync)
+
+    qc_parser = subparsers.add_parser("qc", help="黒フレーム・フリーズ・無音の区間を検出")
+    qc_parser.add_argument("files", nargs="+", help="動画ファイル")
+    qc_parser.set_defaults(func=cmd_qc)
+
+    scenes_parser = subparsers.add_parser("scenes", help="シーンカットと代表フレームを解析")
+    scenes_parser.add_argument("files", nargs="+", help="動画ファイル")
+    scenes_parser.set_defaults(func=cmd_scenes)
+
+    distance_parser = subparsers.add_parser("distance", help="仕様距離から最も近い参照ファイルと最適な基準を提案")
+    distance_parser.add_argument("paths", nargs="+", help="動画ファイルまたはディレクトリ")
+    distance_parser.add_argument("--base", default=None, help="現在の基準ファイル（最適な基準と変換コストを比較）")
+    distance_parser.add_argument("-j", "--jobs", type=int, default=None, help="ffprobeの並列数（省略時はCPUコア数）")
+    distance_parser.set_defaults(func=cmd_distance)
+
+    conform_parser = subparsers.add_parser("conform", help="プリセットのルール（範囲・許容誤差）に対する適合を判定")
+    conform_parser.add_argument("paths", nargs="+", help="動画ファイルまたはディレクトリ")
+    conform_parser.add_argument("--preset", action="append", default=None,
+                                help="判定するプリセット名（複数指定可、省略時はすべて）")
+    conform_parser.add_argument("-j", "--jobs", type=int, default=None, help="ffprobeの並列数（省略時はCPUコア数）")
+    conform_parser.set_defaults(func=cmd_conform)
+
+    convert_parser = subparsers.add_parser("convert", help="ターゲットの仕様に合わせて各ファイルを変換・検証")
+    convert_parser.add_argument("target", help="仕様を合わせるターゲットの動画ファイル")
+    convert_parser.add_argument("sources", nargs="+", help="変換する動画ファイルまたはディレクトリ")
+    convert_parser.add_argument("-o", "--output", default="converted", help="出力先ディレクトリ")
+    convert_parser.add_argument("-j", "--jobs", type=int, default=None,
+                                help="同時に実行するジョブ数（省略時はCPUコア数 ÷ スレッド数）")
+    convert_parser.add_argument("--threads", type=int, default=None,
+                                help="1ジョブあたりのエンコーダースレッド数（省略時はCPUコア数、最大8）")
+    convert_parser.add_argument("--speed", choices=ENCODER_SPEEDS, default=SPEED_BALANCED,
+                                help="エンコード速度の目標（エンコーダーごとの -preset / -cpu-used などに変換）")
+    convert_parser.add_argument("--fastest", action="store_true",
+                                help=f"一括変換向けに「{SPEED_FASTEST}」で変換する（--speed より優先）")
+    convert_parser.add_argument("--segments", type=int, default=1,
+                                help="長尺ファイルの映像をキーフレームで分割して並列にエンコードする区間数（0で自動）")
+    convert_parser.add_argument("--retries", type=int, default=0, help="失敗したジョブの再実行回数")
+    convert_parser.add_argument("--no-verify", action="store_true", help="変換後のffprobeによる検証を省略する")
+    convert_parser.set_defaults(func=cmd_convert)
+
+    export_parser = subparsers.add_parser("export", help="変換コマンドを並列実行用のバッチスクリプトに書き出す（完了済みはスキップ）")
+    export_parser.add_argument("target", help="仕様を合わせるターゲットの動画ファイル")
+    export_parser.add_argument("sources", nargs="+", help="変換する動画ファイルまたはディレクトリ")
+    export_parser.add_argument("-o", "--output", default="converted", help="変換後のファイルの出力先ディレクトリ")
+    export_parser.add_argument("--format", choices=BATCH_FORMATS, default=BATCH_MAKEFILE,
+                               help="make: make -j 用の Makefile / xargs: xargs -P で実行するシェルスクリプト")
+    export_parser.add_argument("--script", default=None, help="書き出すファイル（省略時は Makefile / convert_all.sh）")
+    export_parser.add_argument("--speed", choices=ENCODER_SPEEDS, default=SPEED_BALANCED, help="エンコード速度の目標")
+    export_parser.add_argument("--fastest", action="store_true", help=f"「{SPEED_FASTEST}」で書き出す（--speed より優先）")
+    export_parser.add_argument("--threads", type=int, default=None,
+                               help="1ジョブあたりのエンコーダースレッド数（省略時はエンコーダーの既定）")
+    export_parser.set_defaults(func=cmd_export)
+
+    results_parser = subparsers.add_parser("results", help="解析結果をJSON Lines / CSV / Parquet / Arrowに書き出す（基準ファイルとの比較付き）")
+    results_parser.add_argument("target", help="比較の基準にする動画ファイル")
+    results_parser.add_argument("paths", nargs="+", help="動画ファイルまたはディレクトリ")
+    results_parser.add_argument("-o", "--output", default="results",
+                                help="出力先（<出力先>_metadata.<拡張子> と <出力先>_comparison.<拡張子> に保存）")
+    results_parser.add_argument("--format", choices=EXPORT_FORMATS, default=EXPORT_JSONL, help="書き出し形式")
+    results_parser.add_argument("-j", "--jobs", type=int, default=None, help="ffprobeの並列数（省略時はCPUコア数）")
+    results_parser.set_defaults(func=cmd_results)
+
+    reports_parser = subparsers.add_parser("reports", help="保存済みのレポートの一覧表示と、保存ポリシーによる削除")
+    reports_parser.add_argument("--dir", default=DEFAULT_REPORTS_DIR, help="レポートの保存先")
+    reports_parser.add_argument("--prune", action="store_true", help="保存ポリシーを超えた古いファイルを削除する")
+    reports_parser.add_argument("--max-age-days", type=float, default=None,
+                                help="最後に使ってからの保存日数（省略時は DIFFMOVIE_REPORT_MAX_AGE_DAYS、0で無制限）")
+    reports_parser.add_argument("--max-count", type=int, default=None,
+                                help="保存する件数（省略時は DIFFMOVIE_REPORT_MAX_COUNT、0で無制限）")
+    reports_parser.add_argument("--max-size", default=None,
+                                help="合計サイズ（例: \"500 MB\"。省略時は DIFFMOVIE_REPORT_MAX_SIZE、0で無制限）")
+    reports_parser.set_defaults(func=cmd_reports)
+
+    estimate_parser = subparsers.add_parser("estimate", help="分散した区間を試し変換して変換後のサイズと処理時間を推定")
+    estimate_parser.add_argument("target", help="仕様を合わせるターゲットの動画ファイル")
+    estimate_parser.add_argument("sources", nargs="+", help="変換する動画ファイルまたはディレクトリ")
+    estimate_parser.add_argument("--speed", choices=ENCODER_SPEEDS, default=SPEED_BALANCED, help="エンコード速度の目標")
+    estimate_parser.add_argument("--fastest", action="store_true", help=f"「{SPEED_FASTEST}」で推定する（--speed より優先）")
+    estimate_parser.add_argument("--samples", type=int, default=SAMPLE_ENCODE_COUNT,
+                                 help="試し変換する区間数")
+    estimate_parser.add_argument("--sample-length", type=float, default=SAMPLE_ENCODE_LENGTH,
+                                 help="試し変換する区間の長さ（秒）")
+    estimate_parser.set_defaults(func=cmd_estimate)
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="エンコーダーの速度を計測（変換の処理時間の見込みに使用）")
+    benchmark_parser.add_argument("--encoder", action="append", choices=BENCHMARK_ENCODERS, default=None,
+                                  help="計測するエンコーダー（複数指定可、省略時はすべて）")
+    benchmark_parser.add_argument("--speed", action="append", choices=ENCODER_SPEEDS, default=None,
+                                  help="計測するエンコード速度（複数指定可）")
+    benchmark_parser.add_argument("--resolution", action="append", default=None,
+                                  help="計測する解像度（例: 1920x1080。複数指定可）")
+    benchmark_parser.add_argument("--threads", type=int, default=None, help="エンコーダーのスレッド数（省略時はCPUコア数）")
+    benchmark_parser.add_argument("--frames", type=int, default=BENCHMARK_FRAMES, help="1条件でエンコードするフレーム数")
+    benchmark_parser.add_argument("-o", "--output", default=DEFAULT_BENCHMARK_PATH, help="計測結果の保存先")
+    benchmark_parser.set_defaults(func=cmd_benchmark)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
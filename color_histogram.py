@@ -0,0 +1,226 @@
+"""
+色ヒストグラム比較モジュール
+サンプリングしたフレームの輝度・色差ヒストグラムを比較し、レンジ（フル/リミテッド）やガンマの不一致を推定する
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from analysis_cache import cached_analysis
+from frame_sampler import sample_timestamps, read_frames
+from video_analyzer import analyze_video
+
+
+# サンプリングするフレーム数と縮小サイズ（ヒストグラムには十分な画素数）
+DEFAULT_FRAME_COUNT = 8
+HIST_WIDTH = 320
+HIST_HEIGHT = 180
+# 黒レベル・白レベルとみなすパーセンタイル
+BLACK_PERCENTILE = 0.005
+WHITE_PERCENTILE = 0.995
+# フル/リミテッドの変換比（255 / 219）と、その判定許容幅
+RANGE_RATIO = 255 / 219
+RANGE_TOLERANCE = 0.05
+# レベルを揃えた後の中間調の差（0-1）がこれ以上ならガンマ・グレーディングの差とみなす
+GAMMA_TOLERANCE = 0.04
+# 距離の計算に使うビン数（256ビンのままでは縮小・再エンコードによる細かな差に敏感すぎる）
+DISTANCE_BINS = 32
+# これ未満のヒストグラム距離は一致とみなす
+MATCH_DISTANCE = 0.15
+
+
+@dataclass
+class HistogramResult:
+    """
+    色ヒストグラムの解析結果
+
+    値は宣言されたカラーレンジに従ってリミテッドレンジに正規化した8bitコード値
+    （プレーヤーでの見え方に相当するため、宣言と実際の内容の食い違いがそのまま表れる）。
+    """
+    luma: list = field(default_factory=list)  # 輝度ヒストグラム（256ビン、合計1）
+    cb: list = field(default_factory=list)
+    cr: list = field(default_factory=list)
+    black_level: float = 0.0
+    white_level: float = 0.0
+    frames: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class HistogramComparison:
+    """2ファイル間のヒストグラム比較結果"""
+    distance: float = 0.0            # ヘリンジャー距離（0-1、Y/Cb/Crの平均）
+    luma_distance: float = 0.0
+    chroma_distance: float = 0.0     # Cb/Crの平均
+    range_mismatch: bool = False
+    gamma_shift: float = 0.0         # レベルを揃えた後の中間調の差（正なら比較側が明るい）
+
+
+def _run_histogram(file_path: str, frame_count: int = DEFAULT_FRAME_COUNT,
+                   max_workers: Optional[int] = None) -> HistogramResult:
+    """サンプリングしたフレームをパイプで受け取り、ヒストグラムを集計する"""
+    if not file_path or not os.path.exists(file_path):
+        return HistogramResult(error="ファイルが見つかりません")
+
+    meta = analyze_video(file_path)
+    if meta.error:
+        return HistogramResult(error=meta.error)
+    if meta.video is None:
+        return HistogramResult(error="映像ストリームがありません")
+
+    timestamps = sample_timestamps(meta.duration, frame_count)
+    frames = [f for f in read_frames(file_path, timestamps, HIST_WIDTH, HIST_HEIGHT,
+                                     'yuv444p', max_workers) if f is not None]
+    if not frames:
+        return HistogramResult(error="フレームを取得できませんでした")
+
+    # (フレーム, プレーン, 画素) に並べて、プレーンごとに一括で数える
+    planes = np.stack(frames).reshape(len(frames), 3, -1).transpose(1, 0, 2).reshape(3, -1)
+    hists = [np.bincount(plane, minlength=256) / plane.size for plane in planes]
+
+    cdf = np.cumsum(hists[0])
+    return HistogramResult(
+        luma=hists[0].round(6).tolist(),
+        cb=hists[1].round(6).tolist(),
+        cr=hists[2].round(6).tolist(),
+        black_level=float(np.searchsorted(cdf, BLACK_PERCENTILE)),
+        white_level=float(np.searchsorted(cdf, WHITE_PERCENTILE)),
+        frames=len(frames),
+    )
+
+
+def analyze_histogram(file_path: str) -> HistogramResult:
+    """
+    サンプリングしたフレームの色ヒストグラムを解析する（ファイル同一性ごとにキャッシュ）
+
+    Args:
+        file_path: 動画ファイルのパス
+
+    Returns:
+        HistogramResult: 解析結果
+    """
+    return cached_analysis("histogram-v1", file_path, _run_histogram, HistogramResult)
+
+
+def _hellinger(a: list, b: list) -> float:
+    """256ビンのヒストグラムを DISTANCE_BINS に集約したヘリンジャー距離（0-1）"""
+    a = np.asarray(a).reshape(DISTANCE_BINS, -1).sum(axis=1)
+    b = np.asarray(b).reshape(DISTANCE_BINS, -1).sum(axis=1)
+    return float(np.sqrt(max(0.0, 1.0 - np.sum(np.sqrt(a * b)))))
+
+
+def _normalized_median(result: HistogramResult) -> float:
+    """黒レベル・白レベルを0-1に揃えたときの輝度の中央値"""
+    median = float(np.searchsorted(np.cumsum(result.luma), 0.5))
+    span = max(result.white_level - result.black_level, 1.0)
+    return (median - result.black_level) / span
+
+
+def compare_histograms(base: HistogramResult, other: HistogramResult) -> HistogramComparison:
+    """
+    基準ファイルに対する比較ファイルのヒストグラムの差を評価する
+
+    レンジの不一致は黒〜白の幅の比が 255/219（またはその逆数）に近いこと、
+    ガンマの差はレベルを揃えた後の中間調のずれで判定する。
+    """
+    luma_distance = _hellinger(base.luma, other.luma)
+    chroma_distance = (_hellinger(base.cb, other.cb) + _hellinger(base.cr, other.cr)) / 2
+    comparison = HistogramComparison(
+        distance=(luma_distance + 2 * chroma_distance) / 3,
+        luma_distance=luma_distance,
+        chroma_distance=chroma_distance,
+    )
+    if comparison.distance < MATCH_DISTANCE:
+        return comparison
+
+    base_span = base.white_level - base.black_level
+    other_span = other.white_level - other.black_level
+    if base_span > 0 and other_span > 0:
+        ratio = other_span / base_span
+        comparison.range_mismatch = any(
+            abs(ratio / expected - 1) <= RANGE_TOLERANCE for expected in (RANGE_RATIO, 1 / RANGE_RATIO)
+        )
+    # ガンマ・グレーディングの差は輝度に表れ、色差の分布はほぼ変わらない
+    if comparison.chroma_distance < MATCH_DISTANCE:
+        comparison.gamma_shift = _normalized_median(other) - _normalized_median(base)
+    return comparison
+
+
+def histogram_to_dict(result: HistogramResult, base: Optional[HistogramResult] = None) -> dict:
+    """
+    HistogramResultを比較テーブル用の辞書に変換
+
+    Args:
+        result: 対象ファイルの解析結果
+        base: 基準ファイルの解析結果（距離と判定の行を追加する。対象が基準自身なら省略）
+
+    Returns:
+        dict: キーが項目名、値が表示文字列の辞書
+    """
+    if result.error:
+        return {
+            "輝度レベル（黒/白）": "N/A",
+            "ヒストグラム距離（基準比）": "N/A",
+            "レンジ・ガンマ判定": "N/A",
+        }
+
+    rows = {
+        "輝度レベル（黒/白）": f"{result.black_level:.0f} / {result.white_level:.0f}",
+        "ヒストグラム距離（基準比）": "基準",
+        "レンジ・ガンマ判定": "基準",
+    }
+    if base is None or base.error:
+        return rows
+
+    comparison = compare_histograms(base, result)
+    rows["ヒストグラム距離（基準比）"] = f"{comparison.distance:.3f}"
+
+    findings = []
+    if comparison.range_mismatch:
+        findings.append("レンジ不一致の可能性（フル/リミテッド）")
+    if abs(comparison.gamma_shift) >= GAMMA_TOLERANCE:
+        direction = "明るい" if comparison.gamma_shift > 0 else "暗い"
+        findings.append(f"ガンマ・グレーディング差の可能性（中間調が{direction} {comparison.gamma_shift:+.2f}）")
+    if findings:
+        rows["レンジ・ガンマ判定"] = " / ".join(findings)
+    elif comparison.distance < MATCH_DISTANCE:
+        rows["レンジ・ガンマ判定"] = "一致"
+    else:
+        rows["レンジ・ガンマ判定"] = "差あり（内容が異なる可能性）"
+    return rows
+
+
+def format_histogram_matrix(results: list, names: list) -> str:
+    """
+    全ファイルの組み合わせについてヒストグラム距離の表をテキストに整形
+
+    Args:
+        results: HistogramResultのリスト
+        names: 表示名のリスト（results と同じ順序）
+    """
+    lines = []
+    lines.append("=" * 50)
+    lines.append("【ヒストグラム距離（ペアごと）】")
+    lines.append("=" * 50)
+    for i, name in enumerate(names):
+        lines.append(f"  [{i + 1}] {name}")
+    lines.append("")
+    lines.append("      " + "".join(f"{f'[{j + 1}]':>8}" for j in range(len(names))))
+
+    for i, row_result in enumerate(results):
+        cells = []
+        for j, col_result in enumerate(results):
+            if row_result.error or col_result.error:
+                cells.append(f"{'N/A':>8}")
+            elif i == j:
+                cells.append(f"{'-':>8}")
+            else:
+                cells.append(f"{compare_histograms(row_result, col_result).distance:8.3f}")
+        lines.append(f"{f'[{i + 1}]':<6}" + "".join(cells))
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
@@ -0,0 +1,478 @@
+"""
+変換ジョブモジュール
+生成したffmpegコマンドをジョブとして並列に実行し、-progress の出力から進捗を取得する。
+完了後は出力をffprobeで解析し、ターゲットの仕様と一致するかを検証する
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+from conversion_plan import (
+    EncoderTuning,
+    plan_conversion,
+    build_ffmpeg_args,
+    output_name_for,
+    FPS_TOLERANCE,
+)
+from segment_encode import SegmentPlan, plan_segments, write_segment_list, verify_segmented
+from video_analyzer import analyze_video, format_duration
+
+
+# ジョブの状態
+JOB_PENDING = "待機中"
+JOB_RUNNING = "実行中"
+JOB_DONE = "完了"
+JOB_MISMATCH = "検証NG"
+JOB_FAILED = "失敗"
+JOB_CANCELLED = "キャンセル"
+FINISHED_STATES = (JOB_DONE, JOB_MISMATCH, JOB_FAILED, JOB_CANCELLED)
+RETRYABLE_STATES = (JOB_MISMATCH, JOB_FAILED, JOB_CANCELLED)
+
+# 1ジョブあたりのエンコーダースレッド数の上限（これ以上はスレッドを増やしても速くなりにくい）
+DEFAULT_ENCODER_THREADS = 8
+# キャンセル時に terminate してから kill するまでの猶予（秒）
+CANCEL_GRACE_SECONDS = 5.0
+
+
+@dataclass
+class ConversionJob:
+    """1ファイルの変換ジョブ"""
+    job_id: int
+    source_path: str
+    output_path: str
+    args: list                          # build_ffmpeg_args の結果（引数のグループ）
+    target_meta: object                 # 検証に使うターゲットのメタデータ
+    duration: float = 0.0               # ソースの尺（進捗の計算に使う）
+    start_time: float = 0.0             # ソースの映像の開始時刻（分割の境界を -ss の基準にそろえる）
+    encodes: bool = True                # 再エンコードを含むか（含まなければスレッドを割り当てない）
+    has_video: bool = True              # ソースに映像があるか（なければ出力の映像は検証しない）
+    has_audio: bool = True
+    segments: int = 1                   # 映像を分割して並列にエンコードする区間数の上限（1なら分割しない）
+    segment_count: int = 0              # 実際に分割した区間数（分割していなければ0）
+    plan_label: str = ""
+    status: str = JOB_PENDING
+    progress: float = 0.0               # 0-1
+    fps: float = 0.0
+    speed: float = 0.0                  # 実時間に対する倍率
+    eta: Optional[float] = None         # 残り時間（秒）
+    attempts: int = 0
+    error: Optional[str] = None
+    mismatches: list = field(default_factory=list)
+
+
+def create_jobs(all_meta_raw: list, filenames: list, base_index: int, output_dir: str,
+                pictures: list = None, segments: int = 1, tuning: Optional[EncoderTuning] = None) -> list:
+    """
+    基準ファイル以外の全ファイルを、基準の仕様に変換するジョブを作成
+
+    Args:
+        all_meta_raw: 全ファイルのメタデータリスト
+        filenames: ファイル名リスト
+        base_index: 基準（ターゲット）ファイルのインデックス
+        output_dir: 出力先ディレクトリ
+        pictures: 全ファイルのクロップ・インターレース検出結果（省略可）
+        segments: 長尺ファイルの映像を分割して並列にエンコードする区間数の上限（1なら分割しない）
+        tuning: エンコーダーの速度・スレッド設定（省略時は実行時に -threads のみ指定する）
+
+    Returns:
+        list: ConversionJobのリスト（job_id は JobRunner.submit で振り直す）
+    """
+    base_meta = all_meta_raw[base_index]
+    jobs = []
+    # 別のフォルダにある同じ名前のソースが同じ出力を上書きしないよう、重なった名前には連番を付ける
+    # （大文字・小文字を区別しないファイルシステムでも重ならないよう小文字で比べる）
+    used_names = set()
+    for i, (meta, source_path) in enumerate(zip(all_meta_raw, filenames)):
+        if i == base_index or meta.error:
+            continue
+        source_picture = pictures[i] if pictures else None
+        target_picture = pictures[base_index] if pictures else None
+        plan = plan_conversion(meta, base_meta, source_picture, target_picture)
+        name = output_name_for(source_path, base_meta, filenames[base_index])
+        stem, ext = os.path.splitext(name)
+        number = 2
+        while name.lower() in used_names:
+            name = f"{stem}_{number}{ext}"
+            number += 1
+        used_names.add(name.lower())
+        output_path = os.path.join(output_dir, name)
+        jobs.append(ConversionJob(
+            job_id=len(jobs),
+            source_path=source_path,
+            output_path=output_path,
+            args=build_ffmpeg_args(meta, base_meta, source_path, output_path, plan, tuning),
+            target_meta=base_meta,
+            duration=meta.duration,
+            start_time=meta.video.start_time if meta.video else 0.0,
+            encodes=(plan.has_video and not plan.video_copy) or (plan.has_audio and not plan.audio_copy),
+            has_video=plan.has_video,
+            has_audio=plan.has_audio,
+            segments=segments,
+            plan_label=plan.describe(),
+        ))
+    return jobs
+
+
+def verify_output(output_path: str, target_meta, has_video: bool = True, has_audio: bool = True) -> list:
+    """
+    変換後のファイルを解析し、ターゲットの仕様と異なる項目を返す
+
+    Args:
+        output_path: 変換後のファイル
+        target_meta: ターゲットのメタデータ
+        has_video: ソースに映像があるか（False なら映像は検証しない）
+        has_audio: ソースに音声があるか（False なら音声は検証しない）
+
+    Returns:
+        list: 不一致の説明のリスト（一致していれば空）
+    """
+    meta = analyze_video(output_path)
+    if meta.error:
+        return [f"解析エラー: {meta.error}"]
+
+    mismatches = []
+
+    def check(label, actual, expected):
+        if expected in (None, "N/A", 0) or str(actual).lower() == str(expected).lower():
+            return
+        mismatches.append(f"{label}: {actual}（期待: {expected}）")
+
+    tv, ov = target_meta.video, meta.video
+    if tv is not None and has_video:
+        if ov is None:
+            mismatches.append("映像ストリームがありません")
+        else:
+            check("映像コーデック", ov.codec_name, tv.codec_name)
+            check("解像度", f"{ov.width}x{ov.height}", f"{tv.width}x{tv.height}" if tv.width > 0 else None)
+            check("ピクセルフォーマット", ov.pix_fmt, tv.pix_fmt)
+            try:
+                if abs(float(ov.fps) - float(tv.fps)) > FPS_TOLERANCE:
+                    mismatches.append(f"フレームレート: {ov.fps}（期待: {tv.fps}）")
+            except ValueError:
+                pass
+
+    ta, oa = target_meta.audio, meta.audio
+    if ta is not None and has_audio:
+        if oa is None:
+            mismatches.append("音声ストリームがありません")
+        else:
+            check("音声コーデック", oa.codec_name, ta.codec_name)
+            check("サンプルレート", oa.sample_rate, ta.sample_rate)
+            check("チャンネル数", oa.channels, ta.channels)
+
+    return mismatches
+
+
+class JobRunner:
+    """
+    変換ジョブを並列に実行するキュー
+
+    再エンコードを含むジョブには threads_per_job 本のエンコーダースレッドを割り当て、
+    同時実行数は CPUコア数 ÷ threads_per_job にする（コア数を超えて奪い合わないようにする）。
+    分割エンコードのジョブは区間を並列にエンコードするため、同時に1件ずつ実行する。
+    """
+
+    def __init__(self, max_parallel: Optional[int] = None, threads_per_job: Optional[int] = None,
+                 verify: bool = True):
+        cores = os.cpu_count() or 1
+        self.threads_per_job = threads_per_job or max(1, min(DEFAULT_ENCODER_THREADS, cores))
+        self.max_parallel = max_parallel or max(1, cores // self.threads_per_job)
+        self.verify = verify
+        self._jobs = []
+        self._processes = {}
+        self._progress = {}
+        self._cancelled = set()
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._segment_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_parallel)
+
+    def submit(self, jobs: list) -> list:
+        """ジョブを追加して実行を開始する（job_id はキュー内で一意に振り直す）"""
+        with self._lock:
+            for job in jobs:
+                job.job_id = len(self._jobs)
+                self._jobs.append(job)
+                self._futures[job.job_id] = self._executor.submit(self._run, job)
+        return jobs
+
+    def jobs(self) -> list:
+        """全ジョブの現在の状態（コピー）"""
+        with self._lock:
+            return [replace(job, mismatches=list(job.mismatches)) for job in self._jobs]
+
+    def cancel(self, job_id: Optional[int] = None) -> None:
+        """
+        ジョブをキャンセルする（job_id を省略すると未完了の全ジョブ）
+
+        実行中のffmpegは terminate で終了を求め、CANCEL_GRACE_SECONDS 秒たっても終わらなければ kill する。
+        """
+        with self._lock:
+            targets = [j for j in self._jobs if job_id is None or j.job_id == job_id]
+            for job in targets:
+                if job.status in FINISHED_STATES:
+                    continue
+                self._cancelled.add(job.job_id)
+                if job.status == JOB_PENDING:
+                    job.status = JOB_CANCELLED
+                    # 待機中のジョブは実行待ちの列から外す（残しておくと再実行後に二重に実行される）
+                    self._futures[job.job_id].cancel()
+                for process in self._processes.get(job.job_id, []):
+                    process.terminate()
+                    timer = threading.Timer(CANCEL_GRACE_SECONDS, _kill_if_running, (process,))
+                    timer.daemon = True
+                    timer.start()
+
+    def retry(self, job_id: Optional[int] = None) -> int:
+        """失敗・キャンセル・検証NGのジョブを再実行する（job_id を省略すると該当する全ジョブ）"""
+        count = 0
+        with self._lock:
+            for job in self._jobs:
+                if (job_id is not None and job.job_id != job_id) or job.status not in RETRYABLE_STATES:
+                    continue
+                self._cancelled.discard(job.job_id)
+                job.status = JOB_PENDING
+                job.progress, job.fps, job.speed, job.eta = 0.0, 0.0, 0.0, None
+                job.error = None
+                job.mismatches = []
+                # 前回の実行がまだ終わっていなければ（キャンセル直後で実行待ちの列から外せなかった場合など）、
+                # そのまま前回の実行に任せる（二重に実行して同じ出力に書き込まないようにする）
+                if self._futures[job.job_id].done():
+                    self._futures[job.job_id] = self._executor.submit(self._run, job)
+                count += 1
+        return count
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """全ジョブの終了を待つ（タイムアウトしたら False）"""
+        with self._lock:
+            futures = list(self._futures.values())
+        for future in futures:
+            if future.cancelled():
+                continue
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                return False
+        return True
+
+    def is_busy(self) -> bool:
+        with self._lock:
+            return any(job.status not in FINISHED_STATES for job in self._jobs)
+
+    def _command(self, argv: list, encodes: bool) -> list:
+        """ffmpegの引数に、進捗出力と上書き・スレッド数の指定を加えた実行用の引数"""
+        argv = list(argv)
+        argv[1:1] = ['-hide_banner', '-nostdin', '-y', '-nostats', '-loglevel', 'error', '-progress', 'pipe:1']
+        # スレッド数をエンコーダーの設定で指定済みなら重ねて指定しない
+        if encodes and '-threads' not in argv and '-x265-params' not in argv:
+            argv[-1:-1] = ['-threads', str(self.threads_per_job)]
+        return argv
+
+    def _update_progress(self, job: ConversionJob, slot, values: dict) -> None:
+        """
+        -progress の1ブロック分の値を反映する
+
+        分割エンコードでは区間ごとの処理済みの尺・fps・速度を合計して1ジョブの進捗にする
+        （slot が None のプロセスは進捗に含めない）。
+        """
+        if slot is None:
+            return
+        out_time = values.get('out_time_us') or values.get('out_time_ms')
+        try:
+            seconds = int(out_time) / 1_000_000
+        except (TypeError, ValueError):
+            seconds = 0.0
+        try:
+            speed = float(values.get('speed', '').rstrip('x'))
+        except ValueError:
+            speed = 0.0
+        try:
+            fps = float(values.get('fps', 0))
+        except ValueError:
+            fps = 0.0
+
+        with self._lock:
+            slots = self._progress.setdefault(job.job_id, {})
+            slots[slot] = (max(seconds, 0.0), fps, speed)
+            seconds = sum(v[0] for v in slots.values())
+            job.fps = sum(v[1] for v in slots.values())
+            job.speed = sum(v[2] for v in slots.values())
+            if job.duration > 0:
+                job.progress = min(seconds / job.duration, 1.0)
+                # 出力の時刻が尺を少し超えることがあるため、残り時間は0で止める
+                job.eta = max(job.duration - seconds, 0.0) / job.speed if job.speed > 0 else None
+
+    def _execute(self, job: ConversionJob, argv: list, slot=0) -> tuple:
+        """
+        ffmpegを1プロセス実行し、進捗を反映する
+
+        Returns:
+            tuple: (終了コード, エラー出力の行のリスト)。ffmpegが見つからなければ終了コードは None
+        """
+        with tempfile.TemporaryFile(mode='w+') as stderr:
+            with self._lock:
+                if job.job_id in self._cancelled:
+                    return -1, []
+                try:
+                    process = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=stderr, text=True)
+                except FileNotFoundError:
+                    return None, ["ffmpegが見つかりません"]
+                self._processes.setdefault(job.job_id, []).append(process)
+
+            values = {}
+            for line in process.stdout:
+                key, _, value = line.strip().partition('=')
+                values[key] = value
+                if key == 'progress':
+                    self._update_progress(job, slot, values)
+                    values = {}
+            returncode = process.wait()
+
+            with self._lock:
+                self._processes[job.job_id].remove(process)
+
+            stderr.seek(0)
+            return returncode, [line.strip() for line in stderr.read().splitlines() if line.strip()]
+
+    def _execute_segmented(self, job: ConversionJob, plan: SegmentPlan) -> tuple:
+        """区間ごとの映像エンコードと音声の処理を並列に実行し、連結する"""
+        os.makedirs(plan.work_dir, exist_ok=True)
+        write_segment_list(plan)
+
+        tasks = [(self._command(argv, True), i) for i, argv in enumerate(plan.segment_commands)]
+        if plan.audio_command:
+            tasks.append((self._command(plan.audio_command, True), None))
+
+        # 区間の数だけプロセスを同時に起動する（分割エンコードのジョブは1件ずつなのでコア数を超えない）
+        with self._segment_lock, ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            results = list(executor.map(lambda task: self._execute(job, *task), tasks))
+
+        for returncode, messages in results:
+            if returncode != 0:
+                return returncode, messages
+        return self._execute(job, self._command(plan.concat_command, False), slot=None)
+
+    def _run(self, job: ConversionJob) -> None:
+        while True:
+            # 想定外の例外でジョブが実行中のまま残らないようにする
+            try:
+                self._run_job(job)
+            except Exception as e:
+                with self._lock:
+                    job.status = JOB_FAILED
+                    job.error = str(e)
+            # 終了する直前に再実行を指示された（retry が新しく投入しなかった）場合は続けて実行する
+            with self._lock:
+                if job.status != JOB_PENDING:
+                    return
+
+    def _run_job(self, job: ConversionJob) -> None:
+        with self._lock:
+            if job.job_id in self._cancelled:
+                job.status = JOB_CANCELLED
+                return
+            job.status = JOB_RUNNING
+            job.attempts += 1
+            self._progress.pop(job.job_id, None)
+
+        output_dir = os.path.dirname(job.output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        plan = None
+        if job.segments > 1:
+            plan = plan_segments(job.args, job.source_path, job.output_path, job.duration, job.segments,
+                                 start_time=job.start_time)
+        with self._lock:
+            job.segment_count = len(plan.segments) if plan is not None else 0
+
+        try:
+            if plan is not None:
+                returncode, messages = self._execute_segmented(job, plan)
+            else:
+                argv = [token for group in job.args for token in group]
+                returncode, messages = self._execute(job, self._command(argv, job.encodes))
+        finally:
+            if plan is not None:
+                shutil.rmtree(plan.work_dir, ignore_errors=True)
+
+        with self._lock:
+            cancelled = job.job_id in self._cancelled
+
+        if cancelled:
+            # 途中までの出力は残さない
+            if os.path.exists(job.output_path):
+                os.remove(job.output_path)
+            with self._lock:
+                job.status = JOB_CANCELLED
+            return
+
+        if returncode != 0:
+            with self._lock:
+                job.status = JOB_FAILED
+                job.error = messages[-1] if messages else f"ffmpegが終了コード {returncode} で終了しました"
+            return
+
+        mismatches = []
+        if self.verify:
+            mismatches = verify_output(job.output_path, job.target_meta, job.has_video, job.has_audio)
+            if plan is not None:
+                mismatches += verify_segmented(job.source_path, job.output_path, plan)
+        with self._lock:
+            job.progress = 1.0
+            job.eta = 0.0
+            job.mismatches = mismatches
+            job.status = JOB_MISMATCH if mismatches else JOB_DONE
+
+
+def _kill_if_running(process: subprocess.Popen) -> None:
+    """terminate しても終了しないプロセスを強制終了する"""
+    if process.poll() is None:
+        process.kill()
+
+
+def format_jobs(jobs: list) -> str:
+    """ジョブの一覧と進捗をテキストに整形"""
+    if not jobs:
+        return "変換ジョブはありません"
+
+    counts = {}
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+    states = [JOB_DONE, JOB_RUNNING, JOB_PENDING, JOB_MISMATCH, JOB_FAILED, JOB_CANCELLED]
+
+    lines = []
+    lines.append("=" * 50)
+    lines.append("【変換ジョブ】 " + " / ".join(f"{s} {counts[s]}" for s in states if s in counts))
+    lines.append("=" * 50)
+
+    for job in jobs:
+        line = (f"[{job.job_id + 1}] {os.path.basename(job.source_path)} -> "
+                f"{os.path.basename(job.output_path)}  {job.status}")
+        if job.status == JOB_RUNNING:
+            if job.eta is None:
+                eta = "-"
+            else:
+                # format_duration は0秒を N/A と表示するため、エンコードを終えて検証中のジョブは別に表示する
+                eta = format_duration(job.eta) if job.eta > 0 else "まもなく完了"
+            line += f"  {job.progress * 100:5.1f}%  {job.fps:.1f} fps  {job.speed:.2f}x  残り {eta}"
+        if job.attempts > 1:
+            line += f"  （{job.attempts}回目）"
+        lines.append(line)
+        lines.append(f"    方式: {job.plan_label}")
+        if job.segment_count:
+            lines.append(f"    分割エンコード: {job.segment_count}区間を並列に処理")
+        if job.error:
+            lines.append(f"    エラー: {job.error}")
+        for mismatch in job.mismatches:
+            lines.append(f"    不一致: {mismatch}")
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
@@ -0,0 +1,448 @@
+"""
+変換プランモジュール
+ソースとターゲットの仕様をストリームごとに比較し、コピー（リマックス）で済むか、
+どのフィルター・オプションが本当に必要かを決める
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+from crop_interlace import (
+    has_letterbox,
+    is_interlaced,
+    crop_filter,
+    deinterlace_filter,
+)
+from video_analyzer import parse_bitrate_string
+
+
+# 同じコーデックとみなす名前
+CODEC_ALIASES = {
+    'h265': 'hevc',
+    'avc': 'h264',
+}
+# ソースのビットレートがターゲットをこの割合まで上回っていてもコピーを許す
+BITRATE_TOLERANCE = 0.1
+# fpsが一致しているとみなす差
+FPS_TOLERANCE = 0.01
+
+# 処理時間の目安（映像の再エンコードを1とした相対値）
+VIDEO_ENCODE_COST = 1.0
+AUDIO_ENCODE_COST = 0.02
+REMUX_COST = 0.01  # コピーのみでもかかる読み書きの時間
+
+PATH_REMUX = "リマックスのみ（映像・音声コピー）"
+PATH_VIDEO_COPY = "映像コピー + 音声再エンコード"
+PATH_AUDIO_COPY = "映像再エンコード + 音声コピー"
+PATH_FULL = "フル再エンコード"
+
+
+@dataclass
+class ConversionPlan:
+    """ストリームごとの変換方針"""
+    video_copy: bool = False
+    audio_copy: bool = False
+    video_filters: list = field(default_factory=list)  # 再エンコード時に必要なフィルター（no-opは含めない）
+    change_fps: bool = False
+    change_pix_fmt: bool = False
+    change_video_bitrate: bool = False
+    change_sample_rate: bool = False
+    change_channels: bool = False
+    change_audio_bitrate: bool = False
+    has_video: bool = False
+    has_audio: bool = False
+
+    @property
+    def path(self) -> str:
+        """変換方式の名前"""
+        video_encode = self.has_video and not self.video_copy
+        audio_encode = self.has_audio and not self.audio_copy
+        if not video_encode and not audio_encode:
+            return PATH_REMUX
+        if not video_encode:
+            return PATH_VIDEO_COPY
+        if not audio_encode:
+            return PATH_AUDIO_COPY
+        return PATH_FULL
+
+    @property
+    def relative_cost(self) -> float:
+        """処理時間の目安（フル再エンコードの映像を1とした相対値）"""
+        cost = REMUX_COST
+        if self.has_video and not self.video_copy:
+            cost += VIDEO_ENCODE_COST
+        if self.has_audio and not self.audio_copy:
+            cost += AUDIO_ENCODE_COST
+        return cost
+
+    @property
+    def expected_speedup(self) -> float:
+        """フル再エンコードと比べた速さの目安（倍）"""
+        full = REMUX_COST + (VIDEO_ENCODE_COST if self.has_video else 0.0) + (AUDIO_ENCODE_COST if self.has_audio else 0.0)
+        return full / self.relative_cost
+
+    def describe(self) -> str:
+        """変換方式と速さの目安の表示"""
+        speedup = self.expected_speedup
+        if speedup < 1.5:
+            return self.path
+        return f"{self.path} / フル再エンコード比 約{speedup:.0f}倍速の見込み"
+
+
+def _codec(name: str) -> str:
+    name = (name or "N/A").lower()
+    return CODEC_ALIASES.get(name, name)
+
+
+def _fps(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _bitrate(value: str) -> float:
+    """表示用のビットレート文字列をbpsに変換（不明なら0）"""
+    try:
+        return parse_bitrate_string(value or "N/A")
+    except ValueError:
+        return 0.0
+
+
+def _exceeds(source_bitrate: str, target_bitrate: str) -> bool:
+    """ソースのビットレートがターゲットを許容幅より大きく上回るか（どちらか不明なら False）"""
+    source, target = _bitrate(source_bitrate), _bitrate(target_bitrate)
+    return source > 0 and target > 0 and source > target * (1 + BITRATE_TOLERANCE)
+
+
+def plan_conversion(source_meta, target_meta, source_picture=None, target_picture=None) -> ConversionPlan:
+    """
+    ソースをターゲットの仕様に合わせるための変換方針を決める
+
+    ストリームのコーデック・解像度・fps・ピクセルフォーマット（音声はサンプルレート・チャンネル数）が
+    すでにターゲットと一致し、ビットレートも上回らず、必要なフィルターもなければコピーする。
+
+    Args:
+        source_meta: ソース動画のメタデータ
+        target_meta: ターゲット動画のメタデータ
+        source_picture: ソース動画のクロップ・インターレース検出結果（省略可）
+        target_picture: ターゲット動画のクロップ・インターレース検出結果（省略可）
+
+    Returns:
+        ConversionPlan: 変換方針
+    """
+    plan = ConversionPlan()
+    sv = source_meta.video if source_meta else None
+    tv = target_meta.video if target_meta else None
+    sa = source_meta.audio if source_meta else None
+    ta = target_meta.audio if target_meta else None
+
+    if tv is not None:
+        plan.has_video = sv is not None
+
+        # 映像フィルター（デインターレース → クロップ → 解像度）
+        if is_interlaced(source_picture) and not is_interlaced(target_picture):
+            plan.video_filters.append(deinterlace_filter(source_picture))
+
+        if tv.width > 0 and tv.height > 0:
+            cropped = False
+            # 黒帯を除いた方がターゲットのアスペクト比に近い場合だけクロップする
+            if has_letterbox(source_picture) and not has_letterbox(target_picture):
+                target_ratio = tv.width / tv.height
+                cropped_ratio = source_picture.crop_w / source_picture.crop_h
+                full_ratio = source_picture.width / source_picture.height
+                if abs(cropped_ratio - target_ratio) < abs(full_ratio - target_ratio):
+                    plan.video_filters.append(crop_filter(source_picture))
+                    cropped = True
+            # 解像度がすでに同じならスケールしない
+            if cropped or sv is None or (sv.width, sv.height) != (tv.width, tv.height):
+                plan.video_filters.append(f"scale={tv.width}:{tv.height}")
+
+        target_fps = _fps(tv.fps)
+        source_fps = _fps(sv.fps) if sv else None
+        plan.change_fps = target_fps is not None and (
+            source_fps is None or abs(source_fps - target_fps) > FPS_TOLERANCE
+        )
+        plan.change_pix_fmt = tv.pix_fmt != "N/A" and (sv is None or sv.pix_fmt != tv.pix_fmt)
+        plan.change_video_bitrate = sv is None or _exceeds(sv.bit_rate, tv.bit_rate)
+
+        plan.video_copy = (
+            sv is not None
+            and tv.codec_name != "N/A"
+            and _codec(sv.codec_name) == _codec(tv.codec_name)
+            and not plan.video_filters
+            and not plan.change_fps
+            and not plan.change_pix_fmt
+            and not plan.change_video_bitrate
+        )
+
+    if ta is not None:
+        plan.has_audio = sa is not None
+        plan.change_sample_rate = ta.sample_rate != "N/A" and (sa is None or sa.sample_rate != ta.sample_rate)
+        plan.change_channels = ta.channels > 0 and (sa is None or sa.channels != ta.channels)
+        plan.change_audio_bitrate = sa is None or _exceeds(sa.bit_rate, ta.bit_rate)
+
+        plan.audio_copy = (
+            sa is not None
+            and ta.codec_name != "N/A"
+            and _codec(sa.codec_name) == _codec(ta.codec_name)
+            and not plan.change_sample_rate
+            and not plan.change_channels
+            and not plan.change_audio_bitrate
+        )
+
+    return plan
+
+
+# ターゲットのコーデックに対応するエンコーダー
+VIDEO_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+    'h265': 'libx265',
+    'vp9': 'libvpx-vp9',
+    'vp8': 'libvpx',
+    'av1': 'libaom-av1',
+    'prores': 'prores_ks',
+}
+AUDIO_ENCODERS = {
+    'aac': 'aac',
+    'mp3': 'libmp3lame',
+    'opus': 'libopus',
+    'vorbis': 'libvorbis',
+    'flac': 'flac',
+    'pcm_s16le': 'pcm_s16le',
+    'pcm_s24le': 'pcm_s24le',
+}
+# ターゲットのコンテナに合わせた拡張子
+FORMAT_EXTENSIONS = {
+    'mp4': '.mp4',
+    'mov': '.mov',
+    'matroska': '.mkv',
+    'webm': '.webm',
+    'avi': '.avi',
+}
+
+
+# エンコード速度の目標（品質と速度のバランス）
+SPEED_QUALITY = "品質優先"
+SPEED_BALANCED = "標準"
+SPEED_FAST = "速度優先"
+SPEED_FASTEST = "最速（仕様適合のみ）"  # 一括変換向け。ターゲットの仕様を満たす範囲で最も速い設定
+ENCODER_SPEEDS = (SPEED_QUALITY, SPEED_BALANCED, SPEED_FAST, SPEED_FASTEST)
+
+# x264 / x265 の -preset
+X26X_PRESETS = {
+    SPEED_QUALITY: 'slow',
+    SPEED_BALANCED: 'medium',
+    SPEED_FAST: 'veryfast',
+    SPEED_FASTEST: 'ultrafast',
+}
+# libvpx-vp9 の (-deadline, -cpu-used)
+VP9_SPEEDS = {
+    SPEED_QUALITY: ('good', 1),
+    SPEED_BALANCED: ('good', 2),
+    SPEED_FAST: ('good', 4),
+    SPEED_FASTEST: ('realtime', 8),
+}
+# libaom-av1 の (-usage, -cpu-used)
+AV1_SPEEDS = {
+    SPEED_QUALITY: ('good', 3),
+    SPEED_BALANCED: ('good', 4),
+    SPEED_FAST: ('good', 6),
+    SPEED_FASTEST: ('realtime', 8),
+}
+# VP9 / AV1 のタイル1列の最小幅（これより細かく分けても並列化できない）
+MIN_TILE_WIDTH = 256
+
+
+@dataclass
+class EncoderTuning:
+    """エンコーダーの速度・スレッド設定"""
+    speed: str = SPEED_BALANCED
+    threads: int = 0  # エンコーダーに割り当てるスレッド数（0ならエンコーダーの既定）
+
+
+def _tile_columns_log2(threads: int, width: int) -> int:
+    """スレッド数と幅から、タイル列数（2の累乗）の log2 を決める"""
+    columns = 0
+    while (2 << columns) <= threads and width // (2 << columns) >= MIN_TILE_WIDTH and columns < 6:
+        columns += 1
+    return columns
+
+
+def encoder_options(encoder: str, tuning: EncoderTuning, width: int = 0) -> list:
+    """
+    エンコーダーごとの速度・スレッドのオプション
+
+    Args:
+        encoder: エンコーダー名（VIDEO_ENCODERS の値）
+        tuning: 速度とスレッド数
+        width: 出力の幅（VP9 / AV1 のタイル分割に使う。不明なら0）
+
+    Returns:
+        list: 引数のグループのリスト
+    """
+    speed = tuning.speed if tuning.speed in ENCODER_SPEEDS else SPEED_BALANCED
+    threads = tuning.threads
+    groups = []
+
+    if encoder in ('libx264', 'libx265'):
+        groups.append(['-preset', X26X_PRESETS[speed]])
+        if speed == SPEED_FASTEST:
+            # CABACやデブロッキングを省く設定で、エンコードも速くなる
+            groups.append(['-tune', 'fastdecode'])
+        if threads and encoder == 'libx264':
+            groups.append(['-threads', str(threads)])
+        elif threads:
+            # libx265 は -threads ではなくスレッドプールの大きさで並列数を決める
+            groups.append(['-x265-params', f'pools={threads}'])
+
+    elif encoder == 'libvpx-vp9':
+        deadline, cpu_used = VP9_SPEEDS[speed]
+        groups.append(['-deadline', deadline])
+        groups.append(['-cpu-used', str(cpu_used)])
+        groups.append(['-row-mt', '1'])
+        if threads:
+            groups.append(['-tile-columns', str(_tile_columns_log2(threads, width))])
+            groups.append(['-threads', str(threads)])
+
+    elif encoder == 'libaom-av1':
+        usage, cpu_used = AV1_SPEEDS[speed]
+        groups.append(['-usage', usage])
+        groups.append(['-cpu-used', str(cpu_used)])
+        groups.append(['-row-mt', '1'])
+        if threads:
+            groups.append(['-tiles', f'{1 << _tile_columns_log2(threads, width)}x1'])
+            groups.append(['-threads', str(threads)])
+
+    elif threads:
+        # prores_ks などはスライス・フレーム単位の並列化のみ
+        groups.append(['-threads', str(threads)])
+
+    return groups
+
+
+def video_encoder(target_meta) -> str:
+    """ターゲットの映像コーデックに対応するエンコーダー名"""
+    tv = target_meta.video
+    codec = tv.codec_name.lower() if tv and tv.codec_name != "N/A" else 'h264'
+    return VIDEO_ENCODERS.get(codec, 'libx264')
+
+
+def output_name_for(source_path: str, target_meta, target_path: str) -> str:
+    """変換後のファイル名（<ソース名>_to_<ターゲット名>.<ターゲットのコンテナの拡張子>）"""
+    base, ext = os.path.splitext(os.path.basename(source_path))
+    if target_meta.format_name:
+        for fmt, new_ext in FORMAT_EXTENSIONS.items():
+            if fmt in target_meta.format_name.lower():
+                ext = new_ext
+                break
+    target_base = os.path.splitext(os.path.basename(target_path))[0]
+    return f"{base}_to_{target_base}{ext}"
+
+
+def build_ffmpeg_args(source_meta, target_meta, source_path: str, output_path: str,
+                      plan: ConversionPlan, tuning: Optional[EncoderTuning] = None) -> list:
+    """
+    変換方針に従ってffmpegの引数を組み立てる
+
+    tuning を指定すると、映像を再エンコードする場合にエンコーダーの速度・スレッドのオプションを加える。
+
+    Returns:
+        list: 引数のグループのリスト（例: [['ffmpeg'], ['-i'], [パス], ['-c:v', 'copy'], ...]）。
+              表示では1グループ1行、実行では平らにして使う。
+    """
+    groups = [['ffmpeg'], ['-i'], [source_path]]
+
+    # 映像設定
+    if target_meta.video and plan.video_copy:
+        groups.append(['-c:v', 'copy'])
+    elif target_meta.video:
+        tv = target_meta.video
+        encoder = video_encoder(target_meta)
+        groups.append(['-c:v', encoder])
+        if tuning is not None:
+            groups.extend(encoder_options(encoder, tuning, tv.width))
+
+        # 映像フィルター（デインターレース → クロップ → 解像度）
+        if plan.video_filters:
+            groups.append(['-vf', ",".join(plan.video_filters)])
+
+        # フレームレート
+        if plan.change_fps:
+            try:
+                groups.append(['-r', f'{float(tv.fps):.2f}'])
+            except ValueError:
+                pass
+
+        # ビットレート
+        if tv.bit_rate != "N/A" and 'Mbps' in tv.bit_rate:
+            try:
+                groups.append(['-b:v', f"{float(tv.bit_rate.replace(' Mbps', '')):.1f}M"])
+            except ValueError:
+                pass
+        elif tv.bit_rate != "N/A" and 'Kbps' in tv.bit_rate:
+            try:
+                groups.append(['-b:v', f"{float(tv.bit_rate.replace(' Kbps', '')):.0f}K"])
+            except ValueError:
+                pass
+
+        # ピクセルフォーマット（エンコーダーの既定に任せず明示する）
+        if tv.pix_fmt != "N/A":
+            groups.append(['-pix_fmt', tv.pix_fmt])
+
+    # 音声設定
+    if target_meta.audio and plan.audio_copy:
+        groups.append(['-c:a', 'copy'])
+    elif target_meta.audio:
+        ta = target_meta.audio
+        acodec = ta.codec_name.lower() if ta.codec_name != "N/A" else 'aac'
+        groups.append(['-c:a', AUDIO_ENCODERS.get(acodec, 'aac')])
+
+        # サンプルレート
+        if plan.change_sample_rate:
+            groups.append(['-ar', str(ta.sample_rate)])
+
+        # チャンネル数
+        if plan.change_channels:
+            groups.append(['-ac', str(ta.channels)])
+
+        # ビットレート
+        if ta.bit_rate != "N/A" and 'Kbps' in ta.bit_rate:
+            try:
+                groups.append(['-b:a', f"{float(ta.bit_rate.replace(' Kbps', '')):.0f}k"])
+            except ValueError:
+                pass
+
+    groups.append([output_path])
+    return groups
+
+
+def format_ffmpeg_command(groups: list) -> str:
+    """引数のグループをコピーして使えるコマンド文字列に整形（パスとフィルターは引用符で囲む）"""
+    lines = []
+    for group in groups:
+        if group[0].startswith('-') or group == ['ffmpeg']:
+            lines.append(" ".join(f'"{token}"' if '=' in token else token for token in group))
+        else:
+            lines.append(f'"{group[0]}"')
+    return ' \\\n  '.join(lines)
+
+
+def split_stream_args(groups: list) -> tuple:
+    """
+    build_ffmpeg_args の結果を映像・音声のオプションに分ける（入力・出力のパスは含めない）
+
+    Returns:
+        tuple: (映像のオプション, 音声のオプション)。それぞれ平らな引数のリスト
+    """
+    video, audio = [], []
+    current = video
+    for group in groups[3:-1]:
+        if group[0] == '-c:v':
+            current = video
+        elif group[0] == '-c:a':
+            current = audio
+        current.extend(group)
+    return video, audio
@@ -0,0 +1,218 @@
+"""
+クロップ・インターレース検出モジュール
+尺全体に分散した短い区間でcropdetectとidetを並列に実行し、黒帯とフィールドオーダーを推定する
+"""
+
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from analysis_cache import cached_analysis
+from segments import spread_windows
+from video_analyzer import analyze_video
+
+
+# サンプリングする区間数と1区間の長さ（秒）
+DEFAULT_SAMPLE_COUNT = 6
+DEFAULT_SAMPLE_LENGTH = 2.0
+# 黒とみなす輝度のしきい値（cropdetectのlimit）
+CROP_LIMIT = 24
+# これ未満の黒帯はクロップしない（ピクセル、上下・左右の合計）
+MIN_CROP_MARGIN = 8
+# インターレースと判定する、片方のフィールドオーダーと判定されたフレームの割合
+# （動きの激しいプログレッシブ映像では TFF/BFF が混在して判定されるため、片方の多数で判定する）
+INTERLACED_RATIO = 0.5
+
+
+@dataclass
+class CropInterlaceResult:
+    """クロップ・インターレース検出の結果"""
+    width: int = 0             # 元の解像度
+    height: int = 0
+    crop_w: int = 0            # 検出した有効領域（黒帯を除いた範囲）
+    crop_h: int = 0
+    crop_x: int = 0
+    crop_y: int = 0
+    field_order: str = "undetermined"  # "progressive" / "tff" / "bff" / "undetermined"
+    tff_frames: int = 0
+    bff_frames: int = 0
+    progressive_frames: int = 0
+    error: Optional[str] = None
+
+
+_CROP_PATTERN = re.compile(r"x1:(?P<x1>-?\d+) x2:(?P<x2>-?\d+) y1:(?P<y1>-?\d+) y2:(?P<y2>-?\d+)")
+_IDET_PATTERN = re.compile(
+    r"Multi frame detection: TFF:\s*(?P<tff>\d+) BFF:\s*(?P<bff>\d+) Progressive:\s*(?P<prog>\d+)"
+)
+
+
+def _scan_window(file_path: str, start: float, length: float) -> Optional[dict]:
+    """
+    1区間でidetとcropdetectを実行する
+
+    Returns:
+        dict: 有効領域の境界（x1, x2, y1, y2。全面が黒なら None）とidetのフレーム数
+    """
+    cmd = [
+        'ffmpeg', '-hide_banner', '-nostdin', '-nostats',
+        '-ss', f'{start:.3f}',
+        '-t', f'{length:.3f}',
+        '-an', '-sn', '-dn',
+        '-i', file_path,
+        '-map', '0:v:0',
+        '-vf', f'idet,cropdetect=limit={CROP_LIMIT}:round=2:reset=0',
+        '-f', 'null', '-'
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+    if result.returncode != 0:
+        return None
+
+    # reset=0 のため最後の行が区間全体の有効領域になる
+    bounds = None
+    counts = {'tff': 0, 'bff': 0, 'prog': 0}
+    for line in result.stderr.splitlines():
+        match = _CROP_PATTERN.search(line)
+        if match:
+            x1, x2, y1, y2 = (int(match.group(k)) for k in ('x1', 'x2', 'y1', 'y2'))
+            # 全面が黒のフレームだけの区間では x2 < x1 になる
+            bounds = (x1, x2, y1, y2) if x2 >= x1 and y2 >= y1 else None
+            continue
+        match = _IDET_PATTERN.search(line)
+        if match:
+            counts = {k: int(match.group(k)) for k in counts}
+
+    return {'bounds': bounds, **counts}
+
+
+def _run_detection(file_path: str, sample_count: int = DEFAULT_SAMPLE_COUNT,
+                   sample_length: float = DEFAULT_SAMPLE_LENGTH,
+                   max_workers: Optional[int] = None) -> CropInterlaceResult:
+    """サンプリング区間を並列に検出して結果を統合する"""
+    if not file_path or not os.path.exists(file_path):
+        return CropInterlaceResult(error="ファイルが見つかりません")
+
+    meta = analyze_video(file_path)
+    if meta.error:
+        return CropInterlaceResult(error=meta.error)
+    if meta.video is None or meta.video.width <= 0 or meta.video.height <= 0:
+        return CropInterlaceResult(error="映像ストリームがありません")
+
+    windows = spread_windows(meta.duration, sample_count, sample_length)
+    if not windows:
+        return CropInterlaceResult(error="尺を取得できませんでした")
+
+    workers = max_workers or min(len(windows), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        scans = list(executor.map(lambda w: _scan_window(file_path, w[0], w[1]), windows))
+    scans = [s for s in scans if s is not None]
+    if not scans:
+        return CropInterlaceResult(error="映像をデコードできませんでした")
+
+    width, height = meta.video.width, meta.video.height
+    result = CropInterlaceResult(
+        width=width,
+        height=height,
+        tff_frames=sum(s['tff'] for s in scans),
+        bff_frames=sum(s['bff'] for s in scans),
+        progressive_frames=sum(s['prog'] for s in scans),
+    )
+
+    # どの区間でも黒だった範囲だけを黒帯とする（各区間の有効領域の和）
+    bounds = [s['bounds'] for s in scans if s['bounds'] is not None]
+    if bounds:
+        x1 = min(b[0] for b in bounds)
+        x2 = max(b[1] for b in bounds)
+        y1 = min(b[2] for b in bounds)
+        y2 = max(b[3] for b in bounds)
+        # 4:2:0 のクロマに合わせて幅・高さ・位置を偶数にする
+        result.crop_w = (x2 - x1 + 1) // 2 * 2
+        result.crop_h = (y2 - y1 + 1) // 2 * 2
+        result.crop_x = (x1 + (x2 - x1 + 1 - result.crop_w) // 2) // 2 * 2
+        result.crop_y = (y1 + (y2 - y1 + 1 - result.crop_h) // 2) // 2 * 2
+    else:
+        result.crop_w, result.crop_h = width, height
+
+    dominant = max(result.tff_frames, result.bff_frames)
+    total = result.tff_frames + result.bff_frames + result.progressive_frames
+    if total > 0:
+        if dominant >= total * INTERLACED_RATIO:
+            result.field_order = "tff" if result.tff_frames >= result.bff_frames else "bff"
+        else:
+            result.field_order = "progressive"
+
+    return result
+
+
+def analyze_crop_interlace(file_path: str) -> CropInterlaceResult:
+    """
+    黒帯（クロップ範囲）とフィールドオーダーを検出する（ファイル同一性ごとにキャッシュ）
+
+    Args:
+        file_path: 動画ファイルのパス
+
+    Returns:
+        CropInterlaceResult: 検出結果
+    """
+    return cached_analysis("cropidet-v1", file_path, _run_detection, CropInterlaceResult)
+
+
+def has_letterbox(result: Optional[CropInterlaceResult]) -> bool:
+    """クロップすべき黒帯があるか"""
+    if result is None or result.error or result.crop_w <= 0 or result.crop_h <= 0:
+        return False
+    return (result.width - result.crop_w >= MIN_CROP_MARGIN
+            or result.height - result.crop_h >= MIN_CROP_MARGIN)
+
+
+def is_interlaced(result: Optional[CropInterlaceResult]) -> bool:
+    """インターレースと判定されたか"""
+    return result is not None and not result.error and result.field_order in ("tff", "bff")
+
+
+def crop_filter(result: CropInterlaceResult) -> str:
+    """ffmpegのcropフィルター文字列"""
+    return f"crop={result.crop_w}:{result.crop_h}:{result.crop_x}:{result.crop_y}"
+
+
+def deinterlace_filter(result: CropInterlaceResult) -> str:
+    """検出したフィールドオーダーに合わせたffmpegのデインターレースフィルター文字列"""
+    return f"bwdif=mode=send_frame:parity={result.field_order}:deint=all"
+
+
+_FIELD_ORDER_LABELS = {
+    "progressive": "プログレッシブ",
+    "tff": "インターレース（TFF）",
+    "bff": "インターレース（BFF）",
+    "undetermined": "判定不能",
+}
+
+
+def crop_interlace_to_dict(result: CropInterlaceResult) -> dict:
+    """
+    CropInterlaceResultを比較テーブル用の辞書に変換
+
+    Returns:
+        dict: キーが項目名、値が表示文字列の辞書
+    """
+    if result.error:
+        return {
+            "検出クロップ": "N/A",
+            "走査方式（検出）": "N/A",
+        }
+
+    if has_letterbox(result):
+        crop = f"{result.crop_w}x{result.crop_h}+{result.crop_x}+{result.crop_y}"
+    else:
+        crop = "なし"
+
+    return {
+        "検出クロップ": crop,
+        "走査方式（検出）": _FIELD_ORDER_LABELS.get(result.field_order, result.field_order),
+    }
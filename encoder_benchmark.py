@@ -0,0 +1,265 @@
+"""
+エンコーダーベンチマークモジュール
+lavfiの合成映像（testsrc2）をこのマシンで短時間エンコードしてエンコーダー・速度・解像度ごとのfpsを計測し、
+変換コマンドの処理時間と出力サイズの見込みに使う
+"""
+
+import json
+import os
+import subprocess
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+import numpy as np
+
+from conversion_plan import (
+    ConversionPlan,
+    EncoderTuning,
+    encoder_options,
+    video_encoder,
+    ENCODER_SPEEDS,
+)
+from video_analyzer import parse_bitrate_string, format_duration, format_file_size
+
+
+# 計測結果の保存先
+DEFAULT_BENCHMARK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "encoder_benchmark.json")
+
+BENCHMARK_ENCODERS = ('libx264', 'libx265', 'libvpx-vp9', 'libaom-av1', 'prores_ks')
+# UIで選べる速度をすべて計測する（品質優先は時間がかかるが、見込みを出さないと選べなくなる）
+BENCHMARK_SPEEDS = ENCODER_SPEEDS
+BENCHMARK_RESOLUTIONS = ((640, 360), (1280, 720), (1920, 1080))
+# 1回の計測でエンコードするフレーム数（30fpsで2秒）
+BENCHMARK_FRAMES = 60
+BENCHMARK_RATE = 30
+
+
+@dataclass
+class BenchmarkEntry:
+    """1条件の計測結果"""
+    encoder: str
+    speed: str
+    width: int
+    height: int
+    fps: float          # エンコード速度（フレーム/秒）
+    threads: int = 0
+
+
+@dataclass
+class ConversionEstimate:
+    """変換1件の見込み"""
+    seconds: Optional[float] = None     # 処理時間（秒）。計測結果がなければ None
+    size_bytes: Optional[float] = None  # 出力サイズ。ビットレートが不明なら None
+    copy_only: bool = False             # 映像をコピーするため処理時間がほぼ読み書きのみ
+    measured_speed: str = ""            # 指定の速度の計測結果がなく、代わりに使った速度（なければ空）
+
+
+@dataclass
+class EncoderBenchmark:
+    """このマシンでのエンコーダーの計測結果"""
+    entries: list = field(default_factory=list)
+
+    def save(self, path: str = DEFAULT_BENCHMARK_PATH) -> None:
+        """計測結果をJSONで保存する"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([asdict(e) for e in self.entries], f, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_BENCHMARK_PATH) -> "EncoderBenchmark":
+        """保存済みの計測結果を読み込む（ファイルがなければ空）"""
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(entries=[BenchmarkEntry(**e) for e in json.load(f)])
+        except (OSError, ValueError, TypeError):
+            return cls()
+
+    def nearest_speed(self, encoder: str, speed: str) -> Optional[str]:
+        """
+        計測結果のある速度のうち、指定した速度に最も近いもの（ENCODER_SPEEDS の並びで比べる）
+
+        Returns:
+            str: 速度。このエンコーダーの計測結果がなければ None
+        """
+        measured = {e.speed for e in self.entries if e.encoder == encoder and e.fps > 0}
+        if speed in measured:
+            return speed
+        if not measured:
+            return None
+        order = {s: i for i, s in enumerate(ENCODER_SPEEDS)}
+        position = order.get(speed, len(ENCODER_SPEEDS))
+        # 同じ距離なら遅い側の速度を使い、処理時間を少なく見積もらない
+        return min(measured, key=lambda s: (abs(order.get(s, len(ENCODER_SPEEDS)) - position),
+                                            order.get(s, len(ENCODER_SPEEDS))))
+
+    def estimate_fps(self, encoder: str, speed: str, width: int, height: int) -> Optional[float]:
+        """
+        指定した解像度でのエンコード速度（フレーム/秒）を推定する
+
+        画素数あたりの処理速度（画素/秒）を、計測した解像度の間で画素数の対数に対して線形補間する
+        （計測範囲の外では端の値を使う）。
+
+        Returns:
+            float: 推定fps。該当するエンコーダー・速度の計測結果がなければ None
+        """
+        measured = sorted((e.width * e.height, e.fps * e.width * e.height)
+                          for e in self.entries
+                          if e.encoder == encoder and e.speed == speed and e.fps > 0)
+        if not measured or width <= 0 or height <= 0:
+            return None
+        pixels = np.log([m[0] for m in measured])
+        throughput = np.log([m[1] for m in measured])
+        rate = float(np.exp(np.interp(np.log(width * height), pixels, throughput)))
+        return rate / (width * height)
+
+
+def _run_timed(cmd: list, timeout: int) -> Optional[float]:
+    """コマンドを実行して経過時間（秒）を返す（失敗したら None）"""
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+    if result.returncode != 0:
+        return None
+    return time.perf_counter() - start
+
+
+def _source_args(width: int, height: int, frames: int) -> list:
+    return ['ffmpeg', '-v', 'error', '-nostdin', '-f', 'lavfi',
+            '-i', f'testsrc2=size={width}x{height}:rate={BENCHMARK_RATE}',
+            '-frames:v', str(frames)]
+
+
+def measure_encoder(encoder: str, speed: str, width: int, height: int, threads: int,
+                    frames: int = BENCHMARK_FRAMES, baseline: float = 0.0,
+                    timeout: int = 300) -> Optional[float]:
+    """
+    合成映像を1条件でエンコードしてfpsを計測する
+
+    Args:
+        baseline: 同じ合成映像を無圧縮で捨てるだけの時間（起動と映像生成の分を差し引く）
+
+    Returns:
+        float: エンコード速度（フレーム/秒）。エンコーダーが使えなければ None
+    """
+    options = [token for group in encoder_options(encoder, EncoderTuning(speed, threads), width) for token in group]
+    elapsed = _run_timed(_source_args(width, height, frames) + ['-c:v', encoder] + options + ['-f', 'null', '-'],
+                         timeout)
+    if elapsed is None:
+        return None
+    # 差し引きが極端に小さくならないよう、経過時間の1割は残す
+    return frames / max(elapsed - baseline, elapsed * 0.1)
+
+
+def run_benchmark(encoders=BENCHMARK_ENCODERS, speeds=BENCHMARK_SPEEDS, resolutions=BENCHMARK_RESOLUTIONS,
+                  threads: Optional[int] = None, frames: int = BENCHMARK_FRAMES,
+                  on_result=None) -> EncoderBenchmark:
+    """
+    エンコーダー × 速度 × 解像度 の全条件を計測する
+
+    計測どうしがCPUを奪い合わないよう、1条件ずつ順に実行する。
+
+    Args:
+        threads: エンコーダーのスレッド数（省略時はCPUコア数。コマンド生成と同じ条件）
+        on_result: 1条件の計測が終わるたびに BenchmarkEntry（失敗時は None）とともに呼ぶ関数（省略可）
+    """
+    threads = threads or os.cpu_count() or 1
+    benchmark = EncoderBenchmark()
+    for width, height in resolutions:
+        baseline = _run_timed(_source_args(width, height, frames) + ['-c:v', 'rawvideo', '-f', 'null', '-'], 300) or 0.0
+        for encoder in encoders:
+            for speed in speeds:
+                fps = measure_encoder(encoder, speed, width, height, threads, frames, baseline)
+                entry = None
+                if fps is not None:
+                    entry = BenchmarkEntry(encoder, speed, width, height, round(fps, 2), threads)
+                    benchmark.entries.append(entry)
+                if on_result:
+                    on_result(encoder, speed, width, height, entry)
+    return benchmark
+
+
+def _bits_per_second(bit_rate: str) -> float:
+    try:
+        return parse_bitrate_string(bit_rate or "N/A")
+    except ValueError:
+        return 0.0
+
+
+def estimate_conversion(source_meta, target_meta, plan: ConversionPlan, speed: str,
+                        benchmark: Optional[EncoderBenchmark]) -> ConversionEstimate:
+    """
+    変換の処理時間と出力サイズを見積もる
+
+    処理時間は 出力フレーム数（尺 × fps）÷ 出力解像度での推定fps、
+    出力サイズは (映像 + 音声のビットレート) × 尺 とする（コピーするストリームはソースのビットレート）。
+    """
+    estimate = ConversionEstimate(copy_only=plan.has_video and plan.video_copy)
+    duration = source_meta.duration
+    if duration <= 0:
+        return estimate
+
+    sv, tv = source_meta.video, target_meta.video
+    sa, ta = source_meta.audio, target_meta.audio
+
+    rates = []
+    if plan.has_video:
+        rates.append(_bits_per_second(sv.bit_rate if plan.video_copy else tv.bit_rate))
+    if plan.has_audio:
+        rates.append(_bits_per_second(sa.bit_rate if plan.audio_copy else ta.bit_rate))
+    # ひとつでも不明なストリームがあれば、過小な見込みを出さない
+    if rates and all(r > 0 for r in rates):
+        estimate.size_bytes = sum(rates) * duration / 8
+
+    if plan.has_video and not plan.video_copy and benchmark is not None:
+        width = tv.width if tv.width > 0 else sv.width
+        height = tv.height if tv.height > 0 else sv.height
+        encoder = video_encoder(target_meta)
+        # 古い計測結果には品質優先がないなど、指定の速度がなければ最も近い速度の計測値で見積もる
+        measured_speed = benchmark.nearest_speed(encoder, speed)
+        fps = benchmark.estimate_fps(encoder, measured_speed, width, height) if measured_speed else None
+        if measured_speed != speed:
+            estimate.measured_speed = measured_speed or ""
+        try:
+            frames = duration * float(tv.fps if plan.change_fps else sv.fps)
+        except ValueError:
+            frames = 0.0
+        if fps and frames > 0:
+            estimate.seconds = frames / fps
+
+    return estimate
+
+
+def format_estimate(estimate: ConversionEstimate) -> str:
+    """見込みの表示（コマンドのコメント行に使う）"""
+    if estimate.copy_only:
+        time_text = "処理時間 短時間（映像はコピー）"
+    elif estimate.seconds is not None:
+        time_text = f"処理時間 約{format_duration(max(estimate.seconds, 0.001))}"
+        if estimate.measured_speed:
+            time_text += f"（「{estimate.measured_speed}」の計測値から推定）"
+    else:
+        time_text = "処理時間 不明（python cli.py benchmark で計測すると表示）"
+    size_text = f"出力サイズ 約{format_file_size(int(estimate.size_bytes))}" if estimate.size_bytes else "出力サイズ 不明"
+    return f"{time_text} / {size_text}"
+
+
+def format_benchmark(benchmark: EncoderBenchmark) -> str:
+    """計測結果をテキストに整形"""
+    lines = []
+    lines.append("=" * 50)
+    lines.append("【エンコーダーベンチマーク】")
+    lines.append("=" * 50)
+    if not benchmark.entries:
+        lines.append("計測結果がありません")
+        return "\n".join(lines)
+
+    for e in benchmark.entries:
+        lines.append(f"{e.encoder} / {e.speed} / {e.width}x{e.height}: {e.fps:.1f} fps（{e.threads}スレッド）")
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
@@ -0,0 +1,195 @@
+"""
+フレーム差分モジュール
+2つの動画の同じ時刻のフレームを共通サイズでデコードし、画素差分のヒートマップを生成する
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from frame_sampler import read_frame
+from video_analyzer import analyze_video, file_identity
+
+
+# 表示用の最大幅（共通サイズの上限）
+DEFAULT_MAX_WIDTH = 960
+# デコード済みフレームを保持する数（前後に行き来しても ffmpeg を起動し直さない）
+FRAME_CACHE_SIZE = 64
+# 変化ありとみなす画素差（0-255、RGBの平均絶対差）
+CHANGED_PIXEL_THRESHOLD = 16
+
+
+@dataclass
+class FrameDiffResult:
+    """フレーム差分の結果"""
+    image: Optional[np.ndarray] = None  # [基準 | 比較 | ヒートマップ] を横に並べたRGB画像
+    timestamp: float = 0.0
+    mean_diff: float = 0.0              # 平均絶対差（0-255）
+    psnr: Optional[float] = None        # このフレームのPSNR（dB、完全一致なら None）
+    changed_ratio: float = 0.0          # 変化ありの画素の割合（0-1）
+    error: Optional[str] = None
+
+
+# キー → 結果（最近使った順）。取得に成功した結果だけを保持する
+_frame_cache = OrderedDict()
+_metadata_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _lookup(cache: OrderedDict, key: tuple):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _remember(cache: OrderedDict, key: tuple, value) -> None:
+    with _cache_lock:
+        cache[key] = value
+        if len(cache) > FRAME_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _cached_frame(identity: tuple, timestamp_ms: int, width: int, height: int) -> Optional[np.ndarray]:
+    """
+    ファイル同一性・時刻・サイズごとにデコード結果を保持する（更新されたファイルは別のキーになる）
+
+    一時的な ffmpeg の失敗が残り続けないよう、取得できなかった結果は保持しない。
+    """
+    key = (identity, timestamp_ms, width, height)
+    frame = _lookup(_frame_cache, key)
+    if frame is None:
+        frame = read_frame(identity[0], timestamp_ms / 1000, width, height, pix_fmt='rgb24')
+        if frame is not None:
+            _remember(_frame_cache, key, frame)
+    return frame
+
+
+def _cached_metadata(identity: tuple):
+    """ファイル同一性ごとにメタデータを保持する（時刻を変えるたびに ffprobe を起動しない。エラーは保持しない）"""
+    meta = _lookup(_metadata_cache, identity)
+    if meta is None:
+        meta = analyze_video(identity[0])
+        if not meta.error:
+            _remember(_metadata_cache, identity, meta)
+    return meta
+
+
+def get_frame(file_path: str, timestamp: float, width: int, height: int) -> Optional[np.ndarray]:
+    """
+    指定時刻のフレームをRGB配列で取得する（LRUキャッシュ付き）
+
+    Returns:
+        np.ndarray: (height, width, 3) の読み取り専用 uint8 配列。取得できなければ None
+    """
+    if not file_path or not os.path.exists(file_path):
+        return None
+    # キャッシュのキーはミリ秒単位に丸める
+    timestamp_ms = int(round(max(timestamp, 0.0) * 1000))
+    return _cached_frame(file_identity(file_path), timestamp_ms, width, height)
+
+
+def common_size(reference_meta, other_meta, max_width: int = DEFAULT_MAX_WIDTH) -> tuple:
+    """
+    2ファイルの比較に使う共通サイズを決める
+
+    基準ファイルのアスペクト比を保ち、幅は小さい方（かつ max_width 以下）に合わせる。
+
+    Returns:
+        tuple: (幅, 高さ)。解像度が不明な場合は (0, 0)
+    """
+    rv = reference_meta.video
+    ov = other_meta.video
+    if rv is None or ov is None or rv.width <= 0 or rv.height <= 0:
+        return 0, 0
+
+    width = min(rv.width, ov.width if ov.width > 0 else rv.width, max_width)
+    width = max(2, width // 2 * 2)
+    height = max(2, int(round(width * rv.height / rv.width / 2)) * 2)
+    return width, height
+
+
+def diff_heatmap(reference: np.ndarray, other: np.ndarray) -> tuple:
+    """
+    2フレームの画素差分からヒートマップを生成する
+
+    差分は RGB の平均絶対差で、黒 → 赤 → 黄 → 白 の順に大きくなる。
+
+    Returns:
+        tuple: (ヒートマップのRGB配列, 画素ごとの差分 (height, width) の float32 配列)
+    """
+    diff = np.abs(reference.astype(np.int16) - other.astype(np.int16)).mean(axis=2).astype(np.float32)
+
+    # 小さな差も見えるよう 64 で飽和させる
+    level = np.clip(diff / 64.0, 0.0, 1.0)
+    heatmap = np.empty(diff.shape + (3,), dtype=np.uint8)
+    heatmap[..., 0] = np.interp(level, [0.0, 0.33, 1.0], [0, 255, 255])
+    heatmap[..., 1] = np.interp(level, [0.0, 0.33, 0.66, 1.0], [0, 0, 255, 255])
+    heatmap[..., 2] = np.interp(level, [0.0, 0.66, 1.0], [0, 0, 255])
+    return heatmap, diff
+
+
+def compare_frames(reference_path: str, other_path: str, timestamp: float,
+                   offset: float = 0.0, max_width: int = DEFAULT_MAX_WIDTH) -> FrameDiffResult:
+    """
+    指定時刻のフレームを2ファイルから取得し、差分を計算する
+
+    Args:
+        reference_path: 基準ファイルのパス
+        other_path: 比較ファイルのパス
+        timestamp: 基準ファイル側の時刻（秒）
+        offset: 比較ファイル側のずれ（秒。音声同期の推定値などを指定）
+        max_width: 共通サイズの最大幅
+
+    Returns:
+        FrameDiffResult: 差分の結果
+    """
+    for path in (reference_path, other_path):
+        if not path or not os.path.exists(path):
+            return FrameDiffResult(timestamp=timestamp, error="ファイルが見つかりません")
+
+    ref_meta = _cached_metadata(file_identity(reference_path))
+    other_meta = _cached_metadata(file_identity(other_path))
+    if ref_meta.error or other_meta.error:
+        return FrameDiffResult(timestamp=timestamp, error=ref_meta.error or other_meta.error)
+
+    width, height = common_size(ref_meta, other_meta, max_width)
+    if width == 0:
+        return FrameDiffResult(timestamp=timestamp, error="映像ストリームがありません")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        ref_future = executor.submit(get_frame, reference_path, timestamp, width, height)
+        other_future = executor.submit(get_frame, other_path, timestamp + offset, width, height)
+        reference, other = ref_future.result(), other_future.result()
+    if reference is None or other is None:
+        return FrameDiffResult(timestamp=timestamp, error="フレームを取得できませんでした")
+
+    heatmap, diff = diff_heatmap(reference, other)
+    mse = float(np.mean((reference.astype(np.float32) - other.astype(np.float32)) ** 2))
+
+    return FrameDiffResult(
+        image=np.concatenate([reference, other, heatmap], axis=1),
+        timestamp=timestamp,
+        mean_diff=float(diff.mean()),
+        psnr=float(10 * np.log10(255 ** 2 / mse)) if mse > 0 else None,
+        changed_ratio=float(np.mean(diff >= CHANGED_PIXEL_THRESHOLD)),
+    )
+
+
+def format_frame_diff(result: FrameDiffResult, reference_name: str, other_name: str) -> str:
+    """フレーム差分の統計をテキストに整形"""
+    header = f"{reference_name} | {other_name} | 差分  @ {result.timestamp:.3f}s"
+    if result.error:
+        return f"{header}\nエラー: {result.error}"
+
+    psnr = "∞（完全一致）" if result.psnr is None else f"{result.psnr:.2f} dB"
+    return (
+        f"{header}\n"
+        f"平均絶対差: {result.mean_diff:.2f} / PSNR: {psnr} / 変化のある画素: {result.changed_ratio * 100:.1f}%"
+    )
@@ -0,0 +1,120 @@
+"""
+フレームサンプリングモジュール
+ffmpegでデコードした生フレームをパイプ経由でNumPy配列として取得する
+（一時ファイルは作成しない）
+"""
+
+import subprocess
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+
+# pix_fmtごとのチャンネル数
+PIX_FMT_CHANNELS = {
+    'gray': 1,
+    'rgb24': 3,
+    'yuv444p': 3,
+}
+# プレーン単位で並ぶ（planar）pix_fmt
+PLANAR_PIX_FMTS = {'yuv444p'}
+
+
+def sample_timestamps(duration: float, count: int, margin: float = 0.05) -> list:
+    """
+    尺全体に均等に分散したサンプル時刻（秒）を返す
+
+    Args:
+        duration: 動画の尺（秒）
+        count: サンプル数
+        margin: 先頭・末尾から除外する割合（フェードや黒味を避けるため）
+
+    Returns:
+        list: サンプル時刻のリスト
+    """
+    if count <= 0:
+        return []
+    if duration <= 0:
+        return [0.0]
+
+    start = duration * margin
+    end = duration * (1 - margin)
+    if count == 1:
+        return [(start + end) / 2]
+
+    step = (end - start) / (count - 1)
+    return [start + step * i for i in range(count)]
+
+
+def read_frame(file_path: str, timestamp: float, width: int, height: int,
+               pix_fmt: str = 'gray', timeout: int = 15) -> Optional[np.ndarray]:
+    """
+    指定時刻のフレームを1枚デコードしてNumPy配列で返す
+
+    入力側シーク（-ss を -i の前に指定）でキーフレームへ移動してからデコードする。
+
+    Args:
+        file_path: 動画ファイルのパス
+        timestamp: 取得する時刻（秒）
+        width: 出力幅
+        height: 出力高さ
+        pix_fmt: 'gray'、'rgb24' または 'yuv444p'
+        timeout: タイムアウト（秒）
+
+    Returns:
+        np.ndarray: gray は (height, width)、rgb24 は (height, width, 3)、
+        yuv444p は (3, height, width) の uint8 配列。取得できなかった場合は None
+    """
+    channels = PIX_FMT_CHANNELS.get(pix_fmt)
+    if channels is None:
+        raise ValueError(f"未対応のpix_fmtです: {pix_fmt}")
+
+    cmd = [
+        'ffmpeg',
+        '-v', 'error',
+        '-ss', f'{max(timestamp, 0):.3f}',
+        '-i', file_path,
+        '-frames:v', '1',
+        '-an', '-sn',
+        '-vf', f'scale={width}:{height}',
+        '-pix_fmt', pix_fmt,
+        '-f', 'rawvideo',
+        '-'
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+
+    frame_size = width * height * channels
+    if result.returncode != 0 or len(result.stdout) < frame_size:
+        return None
+
+    frame = np.frombuffer(result.stdout[:frame_size], dtype=np.uint8)
+    if channels == 1:
+        return frame.reshape(height, width)
+    if pix_fmt in PLANAR_PIX_FMTS:
+        return frame.reshape(channels, height, width)
+    return frame.reshape(height, width, channels)
+
+
+def read_frames(file_path: str, timestamps: list, width: int, height: int,
+                pix_fmt: str = 'gray', max_workers: Optional[int] = None) -> list:
+    """
+    複数時刻のフレームを並列に取得する
+
+    Returns:
+        list: timestamps と同じ順序のフレーム配列（取得失敗は None）
+    """
+    if not timestamps:
+        return []
+
+    workers = max_workers or min(len(timestamps), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            lambda t: read_frame(file_path, t, width, height, pix_fmt),
+            timestamps
+        ))
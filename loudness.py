@@ -0,0 +1,160 @@
+"""
+ラウドネス解析モジュール
+ffmpegのebur128フィルターで統合ラウドネス・LRA・トゥルーピークを計測する（EBU R128）
+"""
+
+import math
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from analysis_cache import cached_analysis
+
+
+@dataclass
+class LoudnessResult:
+    """ラウドネス解析の結果"""
+    integrated: Optional[float] = None      # 統合ラウドネス（LUFS）
+    loudness_range: Optional[float] = None  # ラウドネスレンジ（LU）
+    true_peak: Optional[float] = None       # トゥルーピーク（dBTP）
+    error: Optional[str] = None
+
+
+# 解析中に100msごとに出力される進捗行
+_PROGRESS_PATTERN = re.compile(
+    r"I:\s*(?P<i>-?(?:[\d.]+|inf)) LUFS\s+LRA:\s*(?P<lra>-?(?:[\d.]+|inf)) LU.*TPK:\s*(?P<tpk>-?(?:[\d.]+|inf))"
+)
+# 終了時のSummaryブロック内の値
+_SUMMARY_PATTERN = re.compile(r"^(?P<key>I|LRA|Peak):\s*(?P<value>-?(?:[\d.]+|inf))")
+
+
+def _run_ebur128(file_path: str) -> LoudnessResult:
+    """
+    ffmpegでebur128を実行し、出力を1行ずつ読みながら値を更新する
+
+    映像はデコードせず、最初の音声ストリームだけを処理する。
+    """
+    if not file_path or not os.path.exists(file_path):
+        return LoudnessResult(error="ファイルが見つかりません")
+
+    cmd = [
+        'ffmpeg',
+        '-nostdin', '-nostats',
+        '-vn', '-sn', '-dn',
+        '-i', file_path,
+        '-map', '0:a:0',
+        '-af', 'ebur128=peak=true',
+        '-f', 'null', '-'
+    ]
+
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    except FileNotFoundError:
+        return LoudnessResult(error="ffmpegが見つかりません。ffmpegをインストールしてください。")
+
+    result = LoudnessResult()
+    in_summary = False
+    no_audio = False
+    last_line = ""
+
+    # 進捗行の値で随時更新し、Summaryがあればその値で確定させる
+    for line in process.stderr:
+        line = line.strip()
+        if not line:
+            continue
+        last_line = line
+        if 'matches no streams' in line:
+            no_audio = True
+
+        if 'Summary:' in line:
+            in_summary = True
+            continue
+
+        if in_summary:
+            match = _SUMMARY_PATTERN.match(line)
+            if match:
+                value = float(match.group('value'))
+                key = match.group('key')
+                if key == 'I':
+                    result.integrated = value
+                elif key == 'LRA':
+                    result.loudness_range = value
+                else:
+                    result.true_peak = value
+            continue
+
+        match = _PROGRESS_PATTERN.search(line)
+        if match:
+            result.integrated = float(match.group('i'))
+            result.loudness_range = float(match.group('lra'))
+            result.true_peak = float(match.group('tpk'))
+
+    if process.wait() != 0:
+        if no_audio:
+            return LoudnessResult(error="音声ストリームがありません")
+        return LoudnessResult(error=f"ffmpegエラー: {last_line}")
+    if result.integrated is None:
+        return LoudnessResult(error="ラウドネスを計測できませんでした")
+
+    return result
+
+
+def analyze_loudness(file_path: str) -> LoudnessResult:
+    """
+    動画ファイルの音声ラウドネスを解析する（ファイル同一性ごとにキャッシュ）
+
+    Args:
+        file_path: 動画ファイルのパス
+
+    Returns:
+        LoudnessResult: 解析結果
+    """
+    return cached_analysis("loudness-v1", file_path, _run_ebur128, LoudnessResult)
+
+
+def analyze_loudness_batch(file_paths: list, max_workers: Optional[int] = None) -> list:
+    """
+    複数ファイルのラウドネスを並列に解析する
+
+    Returns:
+        list: file_paths と同じ順序の LoudnessResult
+    """
+    if not file_paths:
+        return []
+
+    workers = max_workers or min(len(file_paths), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze_loudness, file_paths))
+
+
+def _format_level(value: Optional[float], unit: str) -> str:
+    """ラウドネス値を表示用に整形"""
+    if value is None:
+        return "N/A"
+    if math.isinf(value):
+        return f"-inf {unit}"
+    return f"{value:.1f} {unit}"
+
+
+def loudness_to_dict(result: LoudnessResult) -> dict:
+    """
+    LoudnessResultを比較テーブル用の辞書に変換
+
+    Returns:
+        dict: キーが項目名、値が表示文字列の辞書
+    """
+    if result.error:
+        return {
+            "統合ラウドネス": "N/A",
+            "ラウドネスレンジ（LRA）": "N/A",
+            "トゥルーピーク": "N/A",
+        }
+
+    return {
+        "統合ラウドネス": _format_level(result.integrated, "LUFS"),
+        "ラウドネスレンジ（LRA）": _format_level(result.loudness_range, "LU"),
+        "トゥルーピーク": _format_level(result.true_peak, "dBTP"),
+    }
@@ -0,0 +1,366 @@
+"""
+知覚ハッシュ（pHash/dHash）インデックスモジュール
+サンプリングしたフレームの知覚ハッシュで、コーデックやビットレートだけが
+異なる同一素材（再エンコード）をライブラリから検索する
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from video_analyzer import analyze_video, file_identity
+from frame_sampler import sample_timestamps, read_frames
+
+
+# 1ファイルあたりのサンプルフレーム数
+FRAMES_PER_FILE = 8
+
+# マルチインデックスハッシュのチャンク幅
+# 64bitハッシュを16bitずつに分割し、フレーム位置×チャンク位置ごとにテーブルを持つ。
+# 合計ハミング距離が「チャンク総数 - 1」以下（8フレームなら31bit）のときだけ、鳩の巣原理で
+# 少なくとも1つのチャンクが完全一致するため、必ず候補として拾える。
+# それより大きいしきい値では取りこぼしがありうるため、全件をベクトル化したハミング距離で走査する。
+CHUNK_BITS = 16
+CHUNKS_PER_HASH = 64 // CHUNK_BITS
+_CHUNK_MASK = np.uint64((1 << CHUNK_BITS) - 1)
+_CHUNK_SHIFTS = np.array([CHUNK_BITS * i for i in range(CHUNKS_PER_HASH)], dtype=np.uint64)
+
+# 類似と判定する1フレームあたりの平均ハミング距離（64bit中）
+DEFAULT_MAX_DISTANCE = 10.0
+
+# インデックスの保存先
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "phash_index.npz")
+
+# インデックス対象の拡張子
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.m4v', '.mkv', '.webm', '.avi', '.mxf', '.ts', '.mts', '.wmv', '.flv'}
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """DCT-II の変換行列を生成"""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.sqrt(2 / size) * np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+
+# 8bit値ごとの立っているビット数
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    """64個のbool配列を64bit整数に詰める"""
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def phash(frame: np.ndarray) -> int:
+    """32x32グレースケールフレームのDCT低周波成分からpHash（64bit）を計算"""
+    dct = _DCT_32 @ frame.astype(np.float64) @ _DCT_32.T
+    low = dct[:8, :8].ravel()
+    # DC成分は平均輝度なので中央値の計算から除外する
+    return _bits_to_int(low > np.median(low[1:]))
+
+
+def dhash(frame: np.ndarray) -> int:
+    """9x8グレースケールフレームの横方向の輝度勾配からdHash（64bit）を計算"""
+    pixels = frame.astype(np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+# 方式ごとの (ハッシュ関数, 縮小サイズ(幅, 高さ))
+HASH_METHODS = {
+    'phash': (phash, (32, 32)),
+    'dhash': (dhash, (9, 8)),
+}
+
+
+def compute_signature(file_path: str, method: str = 'phash',
+                      frames_per_file: int = FRAMES_PER_FILE,
+                      max_workers: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    動画ファイルの知覚ハッシュシグネチャを計算する
+
+    尺に対する相対位置でフレームをサンプリングするため、
+    同じ素材の再エンコード同士は同じ位置のフレーム同士で比較される。
+
+    Args:
+        file_path: 動画ファイルのパス
+        method: 'phash' または 'dhash'
+        frames_per_file: サンプルフレーム数
+        max_workers: フレーム取得の並列数
+
+    Returns:
+        np.ndarray: (frames_per_file,) の uint64 配列。解析できない場合は None
+    """
+    hash_func, (width, height) = HASH_METHODS[method]
+
+    meta = analyze_video(file_path)
+    if meta.error or meta.video is None:
+        return None
+
+    timestamps = sample_timestamps(meta.duration, frames_per_file)
+    frames = read_frames(file_path, timestamps, width, height, 'gray', max_workers=max_workers)
+    if any(frame is None for frame in frames):
+        return None
+
+    return np.array([hash_func(frame) for frame in frames], dtype=np.uint64)
+
+
+def hamming_distances(signatures: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    シグネチャ行列とクエリの合計ハミング距離をまとめて計算する
+
+    Args:
+        signatures: (N, K) の uint64 配列
+        query: (K,) の uint64 配列
+
+    Returns:
+        np.ndarray: (N,) の合計ハミング距離
+    """
+    xor = np.ascontiguousarray(np.bitwise_xor(signatures, query))
+    return _POPCOUNT_TABLE[xor.view(np.uint8)].reshape(len(signatures), -1).sum(axis=1, dtype=np.int64)
+
+
+def _chunk_keys(signatures: np.ndarray) -> np.ndarray:
+    """シグネチャをチャンクに分割する（(..., K) → (..., K * CHUNKS_PER_HASH)）"""
+    chunks = (signatures[..., None] >> _CHUNK_SHIFTS) & _CHUNK_MASK
+    return chunks.reshape(*signatures.shape[:-1], -1).astype(np.uint16)
+
+
+class PerceptualHashIndex:
+    """
+    知覚ハッシュのマルチインデックスハッシュテーブル
+
+    チャンク列ごとにソート済みのキー配列を持ち、二分探索によるチャンク完全一致で候補を絞り込む。
+    候補だけをベクトル化したハミング距離で検証するため、しきい値が小さければ全件走査は不要。
+    しきい値が鳩の巣原理の保証範囲を超える場合は、全件のハミング距離をまとめて計算する。
+    """
+
+    def __init__(self, method: str = 'phash', frames_per_file: int = FRAMES_PER_FILE):
+        if method not in HASH_METHODS:
+            raise ValueError(f"未対応のハッシュ方式です: {method}")
+        self.method = method
+        self.frames_per_file = frames_per_file
+        self.paths = []
+        self.identities = []
+        self._row_by_path = {}
+        self._rows = []
+        self._matrix_cache = None
+        self._sorted_keys = None
+        self._sorted_rows = None
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _matrix(self) -> np.ndarray:
+        """全シグネチャを (N, K) 行列として返す（変更があるまでキャッシュ）"""
+        if self._matrix_cache is None:
+            if self._rows:
+                self._matrix_cache = np.vstack(self._rows)
+            else:
+                self._matrix_cache = np.zeros((0, self.frames_per_file), dtype=np.uint64)
+        return self._matrix_cache
+
+    def _ensure_tables(self):
+        """チャンク列ごとのソート済みキー配列を構築する（変更があるまでキャッシュ）"""
+        if self._sorted_keys is not None:
+            return
+        keys = _chunk_keys(self._matrix())
+        order = np.argsort(keys, axis=0, kind='stable')
+        self._sorted_rows = order.T.copy()
+        self._sorted_keys = np.take_along_axis(keys, order, axis=0).T.copy()
+
+    def _invalidate(self):
+        self._matrix_cache = None
+        self._sorted_keys = None
+        self._sorted_rows = None
+
+    def is_current(self, identity: tuple) -> bool:
+        """ファイルが更新されずにインデックス済みかどうか"""
+        path, size, mtime_ns = identity
+        row = self._row_by_path.get(path)
+        return row is not None and self.identities[row] == (size, mtime_ns)
+
+    def get_signature(self, path: str) -> Optional[np.ndarray]:
+        """インデックス済みファイルのシグネチャを返す"""
+        row = self._row_by_path.get(os.path.abspath(path))
+        return self._rows[row] if row is not None else None
+
+    def add(self, identity: tuple, signature: np.ndarray):
+        """
+        ファイルのシグネチャを登録する（同じパスが登録済みなら置き換える）
+
+        Args:
+            identity: file_identity() の戻り値
+            signature: compute_signature() の戻り値
+        """
+        path, size, mtime_ns = identity
+        row = self._row_by_path.get(path)
+
+        if row is None:
+            self._row_by_path[path] = len(self.paths)
+            self.paths.append(path)
+            self.identities.append((size, mtime_ns))
+            self._rows.append(signature)
+        else:
+            self.identities[row] = (size, mtime_ns)
+            self._rows[row] = signature
+
+        self._invalidate()
+
+    def query(self, signature: np.ndarray, max_distance: float = DEFAULT_MAX_DISTANCE,
+              limit: int = 20, exclude_path: Optional[str] = None) -> list:
+        """
+        類似ファイルを検索する
+
+        Args:
+            signature: クエリのシグネチャ
+            max_distance: 1フレームあたりの平均ハミング距離の上限
+            limit: 最大件数
+            exclude_path: 結果から除外するパス（クエリ自身など）
+
+        Returns:
+            list: (パス, 平均ハミング距離) のリスト（距離の昇順）
+        """
+        if not self.paths:
+            return []
+
+        # チャンクの完全一致で取りこぼさないのは、合計距離がチャンク総数未満の場合に限る
+        chunk_count = self.frames_per_file * CHUNKS_PER_HASH
+        if max_distance * self.frames_per_file < chunk_count:
+            self._ensure_tables()
+            groups = []
+            for sorted_keys, sorted_rows, key in zip(self._sorted_keys, self._sorted_rows, _chunk_keys(signature)):
+                left = np.searchsorted(sorted_keys, key, side='left')
+                right = np.searchsorted(sorted_keys, key, side='right')
+                if right > left:
+                    groups.append(sorted_rows[left:right])
+            if not groups:
+                return []
+            rows = np.unique(np.concatenate(groups))
+        else:
+            rows = np.arange(len(self.paths))
+
+        if exclude_path:
+            exclude_row = self._row_by_path.get(os.path.abspath(exclude_path))
+            if exclude_row is not None:
+                rows = rows[rows != exclude_row]
+        if len(rows) == 0:
+            return []
+
+        distances = hamming_distances(self._matrix()[rows], signature) / self.frames_per_file
+
+        matched = distances <= max_distance
+        rows, distances = rows[matched], distances[matched]
+        order = np.argsort(distances, kind='stable')[:limit]
+
+        return [(self.paths[rows[i]], float(distances[i])) for i in order]
+
+    def save(self, index_path: str = DEFAULT_INDEX_PATH):
+        """インデックスをnpz形式で保存する"""
+        sizes = [size for size, _ in self.identities]
+        mtimes = [mtime for _, mtime in self.identities]
+        np.savez_compressed(
+            index_path,
+            method=np.array(self.method),
+            paths=np.array(self.paths, dtype=str),
+            sizes=np.array(sizes, dtype=np.int64),
+            mtimes=np.array(mtimes, dtype=np.int64),
+            signatures=self._matrix(),
+        )
+
+    @classmethod
+    def load(cls, index_path: str = DEFAULT_INDEX_PATH) -> "PerceptualHashIndex":
+        """保存済みインデックスを読み込む（ファイルがなければ空のインデックス）"""
+        if not os.path.exists(index_path):
+            return cls()
+
+        with np.load(index_path, allow_pickle=False) as data:
+            signatures = data['signatures']
+            index = cls(method=str(data['method']), frames_per_file=signatures.shape[1])
+            index.paths = data['paths'].tolist()
+            index.identities = list(zip(data['sizes'].tolist(), data['mtimes'].tolist()))
+
+        index._row_by_path = {path: row for row, path in enumerate(index.paths)}
+        index._rows = list(signatures)
+        index._matrix_cache = signatures
+        return index
+
+
+def collect_video_files(directory: str) -> list:
+    """ディレクトリ以下の動画ファイルを再帰的に列挙する"""
+    found = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS:
+                found.append(os.path.join(root, name))
+    return found
+
+
+def build_index(paths: list, index: Optional[PerceptualHashIndex] = None,
+                max_workers: Optional[int] = None) -> tuple:
+    """
+    ファイル群をインデックスに登録する（未変更のファイルはスキップ）
+
+    Args:
+        paths: 動画ファイルのパスリスト
+        index: 追記先のインデックス（省略時は新規作成）
+        max_workers: 並列数（省略時はCPUコア数）
+
+    Returns:
+        tuple: (インデックス, 追加・更新件数, 失敗件数)
+    """
+    if index is None:
+        index = PerceptualHashIndex()
+
+    targets = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        identity = file_identity(path)
+        if not index.is_current(identity):
+            targets.append(identity)
+
+    added = 0
+    failed = 0
+    workers = max_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        signatures = executor.map(
+            lambda identity: compute_signature(identity[0], index.method, index.frames_per_file, max_workers=1),
+            targets
+        )
+        for identity, signature in zip(targets, signatures):
+            if signature is None:
+                failed += 1
+                continue
+            index.add(identity, signature)
+            added += 1
+
+    return index, added, failed
+
+
+def find_similar(file_path: str, index: PerceptualHashIndex,
+                 max_distance: float = DEFAULT_MAX_DISTANCE, limit: int = 20) -> Optional[list]:
+    """
+    指定ファイルに類似したファイルをインデックスから検索する
+
+    インデックス済みで未変更のファイルは保存済みのシグネチャを使い、デコードを省略する。
+
+    Returns:
+        list: (パス, 平均ハミング距離) のリスト。シグネチャを計算できない場合は None
+    """
+    if not file_path or not os.path.exists(file_path):
+        return None
+
+    if index.is_current(file_identity(file_path)):
+        signature = index.get_signature(file_path)
+    else:
+        signature = compute_signature(file_path, index.method, index.frames_per_file)
+    if signature is None:
+        return None
+
+    return index.query(signature, max_distance=max_distance, limit=limit, exclude_path=file_path)
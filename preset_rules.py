@@ -0,0 +1,324 @@
+"""
+プリセット適合判定モジュール
+数値の範囲・許容誤差と許可値で定義したプリセットのルールを、
+多数のファイル×多数のプリセットに対してまとめて判定する
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from spec_distance import parse_spec_number
+from spec_groups import normalize_value
+from video_analyzer import format_bitrate
+
+
+@dataclass
+class PresetRule:
+    """
+    プリセットの1項目のルール
+
+    数値項目は minimum〜maximum の範囲（片側だけでも可）に tolerance（相対値）の余裕を持たせて判定し、
+    カテゴリ項目は allowed のいずれかと一致すれば適合とする（カンマ区切りの値はいずれかの要素と一致すれば可）。
+    """
+    key: str                                      # metadata_to_dict の項目名
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    tolerance: float = 0.0                        # 範囲の外側に許容する相対誤差（0.01 なら 1%）
+    allowed: list = field(default_factory=list)   # カテゴリ項目の許可値
+
+    @property
+    def is_numeric(self) -> bool:
+        return not self.allowed
+
+    def _format(self, number: float) -> str:
+        if "ビットレート" in self.key:
+            return format_bitrate(str(int(number)))
+        return f"{number:g}"
+
+    def describe(self) -> str:
+        """許容範囲の表示"""
+        if self.allowed:
+            return " / ".join(self.allowed)
+        if self.minimum is not None and self.maximum is not None:
+            if self.minimum == self.maximum:
+                return self._format(self.minimum)
+            return f"{self._format(self.minimum)}〜{self._format(self.maximum)}"
+        if self.maximum is not None:
+            return f"{self._format(self.maximum)}以下"
+        return f"{self._format(self.minimum)}以上"
+
+
+# 配信先ごとのルール（PRESETS の表示値に、実運用で許容する範囲を持たせたもの）
+PRESET_RULES = {
+    "YouTube HD (1080p)": [
+        PresetRule("コンテナフォーマット", allowed=["mp4"]),
+        PresetRule("映像コーデック", allowed=["h264"]),
+        PresetRule("解像度（幅）", 1920, 1920),
+        PresetRule("解像度（高さ）", 1080, 1080),
+        PresetRule("フレームレート（fps）", 29.97, 30.0, tolerance=0.001),
+        PresetRule("映像ビットレート", maximum=8_000_000, tolerance=0.1),
+        PresetRule("ピクセルフォーマット", allowed=["yuv420p"]),
+        PresetRule("音声コーデック", allowed=["aac"]),
+        PresetRule("サンプルレート", 48000, 48000),
+        PresetRule("チャンネル数", 2, 2),
+    ],
+    "YouTube 4K": [
+        PresetRule("コンテナフォーマット", allowed=["mp4"]),
+        PresetRule("映像コーデック", allowed=["h264"]),
+        PresetRule("解像度（幅）", 3840, 3840),
+        PresetRule("解像度（高さ）", 2160, 2160),
+        PresetRule("フレームレート（fps）", 59.94, 60.0, tolerance=0.001),
+        PresetRule("映像ビットレート", maximum=35_000_000, tolerance=0.1),
+        PresetRule("ピクセルフォーマット", allowed=["yuv420p"]),
+        PresetRule("音声コーデック", allowed=["aac"]),
+        PresetRule("サンプルレート", 48000, 48000),
+        PresetRule("チャンネル数", 2, 2),
+    ],
+    "Twitter/X": [
+        PresetRule("コンテナフォーマット", allowed=["mp4"]),
+        PresetRule("映像コーデック", allowed=["h264"]),
+        PresetRule("解像度（幅）", maximum=1280),
+        PresetRule("解像度（高さ）", maximum=720),
+        PresetRule("フレームレート（fps）", maximum=30.0, tolerance=0.001),
+        PresetRule("映像ビットレート", maximum=5_000_000, tolerance=0.1),
+        PresetRule("ピクセルフォーマット", allowed=["yuv420p"]),
+        PresetRule("音声コーデック", allowed=["aac"]),
+        PresetRule("サンプルレート", 44100, 48000),
+        PresetRule("チャンネル数", 1, 2),
+    ],
+    "Instagram Reels": [
+        PresetRule("コンテナフォーマット", allowed=["mp4"]),
+        PresetRule("映像コーデック", allowed=["h264"]),
+        PresetRule("解像度（幅）", 1080, 1080),
+        PresetRule("解像度（高さ）", 1920, 1920),
+        PresetRule("フレームレート（fps）", 23.976, 30.0, tolerance=0.001),
+        PresetRule("映像ビットレート", maximum=3_500_000, tolerance=0.1),
+        PresetRule("ピクセルフォーマット", allowed=["yuv420p"]),
+        PresetRule("音声コーデック", allowed=["aac"]),
+        PresetRule("サンプルレート", 44100, 48000),
+        PresetRule("チャンネル数", 1, 2),
+    ],
+    "TikTok": [
+        PresetRule("コンテナフォーマット", allowed=["mp4"]),
+        PresetRule("映像コーデック", allowed=["h264", "hevc"]),
+        PresetRule("解像度（幅）", 1080, 1080),
+        PresetRule("解像度（高さ）", 1920, 1920),
+        PresetRule("フレームレート（fps）", 23.976, 60.0, tolerance=0.001),
+        PresetRule("映像ビットレート", maximum=4_000_000, tolerance=0.1),
+        PresetRule("ピクセルフォーマット", allowed=["yuv420p"]),
+        PresetRule("音声コーデック", allowed=["aac"]),
+        PresetRule("サンプルレート", 44100, 48000),
+        PresetRule("チャンネル数", 1, 2),
+    ],
+    "Apple ProRes 422": [
+        PresetRule("コンテナフォーマット", allowed=["mov"]),
+        PresetRule("映像コーデック", allowed=["prores"]),
+        PresetRule("解像度（幅）", 1920, 1920),
+        PresetRule("解像度（高さ）", 1080, 1080),
+        PresetRule("フレームレート（fps）", 29.97, 29.97, tolerance=0.001),
+        PresetRule("ピクセルフォーマット", allowed=["yuv422p10le"]),
+        PresetRule("音声コーデック", allowed=["pcm_s24le"]),
+        PresetRule("サンプルレート", 48000, 48000),
+        PresetRule("チャンネル数", 2, 2),
+    ],
+}
+
+
+# ストリームの値がないときに代わりに使う項目（総ビットレートは映像ビットレートの上限になるため、
+# 上限だけのルールを満たすかどうかの判定に使える）
+NUMERIC_FALLBACKS = {
+    "映像ビットレート": "総ビットレート",
+}
+
+
+def _may_be_unknown(key: str) -> bool:
+    """値がなくても不適合とせず判定不能とする項目（MKV/WebMなどはストリームごとのビットレートを持たない）"""
+    return "ビットレート" in key
+
+
+@dataclass
+class CompiledRules:
+    """
+    全プリセットのルールを項目ごとに並べ直したもの
+
+    数値項目は (項目数, プリセット数) の下限・上限（制約なしは -inf / inf、項目を見ないプリセットは NaN）、
+    カテゴリ項目は項目ごとにプリセットの許可値の集合を持つ。
+    """
+    presets: list = field(default_factory=list)
+    numeric_keys: list = field(default_factory=list)
+    lower: np.ndarray = None
+    upper: np.ndarray = None
+    rules: dict = field(default_factory=dict)              # (項目名, プリセット番号) → PresetRule
+    categorical_keys: list = field(default_factory=list)
+    allowed: dict = field(default_factory=dict)            # 項目名 → [許可値の集合 or None]（プリセットごと）
+
+
+def compile_rules(preset_rules: dict = None) -> CompiledRules:
+    """
+    プリセットのルールを項目×プリセットの配列にまとめる
+
+    Args:
+        preset_rules: プリセット名 → PresetRule のリスト（省略時は PRESET_RULES）
+    """
+    preset_rules = PRESET_RULES if preset_rules is None else preset_rules
+    presets = list(preset_rules)
+    compiled = CompiledRules(presets=presets)
+
+    for p, name in enumerate(presets):
+        for rule in preset_rules[name]:
+            compiled.rules[(rule.key, p)] = rule
+            keys = compiled.numeric_keys if rule.is_numeric else compiled.categorical_keys
+            if rule.key not in keys:
+                keys.append(rule.key)
+
+    compiled.lower = np.full((len(compiled.numeric_keys), len(presets)), np.nan)
+    compiled.upper = np.full((len(compiled.numeric_keys), len(presets)), np.nan)
+    for k, key in enumerate(compiled.numeric_keys):
+        for p in range(len(presets)):
+            rule = compiled.rules.get((key, p))
+            if rule is None:
+                continue
+            compiled.lower[k, p] = -np.inf if rule.minimum is None else rule.minimum * (1 - rule.tolerance)
+            compiled.upper[k, p] = np.inf if rule.maximum is None else rule.maximum * (1 + rule.tolerance)
+
+    for key in compiled.categorical_keys:
+        compiled.allowed[key] = [
+            {normalize_value(v) for v in compiled.rules[(key, p)].allowed} if (key, p) in compiled.rules else None
+            for p in range(len(presets))
+        ]
+    return compiled
+
+
+@dataclass
+class ConformanceResult:
+    """プリセット適合判定の結果"""
+    presets: list = field(default_factory=list)
+    passed: np.ndarray = None                      # (ファイル数, プリセット数) の bool
+    rule_keys: list = field(default_factory=list)  # failures の1次元目に対応する項目名
+    failures: np.ndarray = None                    # (項目数, ファイル数, プリセット数) の bool（不適合の項目）
+    unknown: np.ndarray = None                     # failures と同じ形の bool（値がなく判定できない項目）
+    values: list = field(default_factory=list)     # 各ファイルの項目の表示値（理由の表示用）
+    compiled: CompiledRules = None
+
+    def reasons(self, file_index: int, preset_index: int) -> list:
+        """不適合の理由（項目・実際の値・許容範囲）"""
+        lines = []
+        for k in np.flatnonzero(self.failures[:, file_index, preset_index]):
+            key = self.rule_keys[k]
+            rule = self.compiled.rules[(key, preset_index)]
+            value = self.values[file_index].get(key, "N/A")
+            lines.append(f"{key}: {value}（許容: {rule.describe()}）")
+        return lines
+
+    def unknown_keys(self, file_index: int, preset_index: int) -> list:
+        """値がなく判定できなかった項目"""
+        if self.unknown is None:
+            return []
+        return [self.rule_keys[k] for k in np.flatnonzero(self.unknown[:, file_index, preset_index])]
+
+
+def _categorical_match(value: str, allowed: set) -> bool:
+    """カンマ区切りの値（例: mov,mp4,m4a）はいずれかの要素が許可値と一致すれば適合"""
+    return value in allowed or any(part.strip() in allowed for part in value.split(","))
+
+
+def check_conformance(all_metadata: list, compiled: CompiledRules = None) -> ConformanceResult:
+    """
+    全ファイル×全プリセットの適合をまとめて判定する
+
+    数値項目は (ファイル数, 項目数) の値を下限・上限とブロードキャストで比較し、
+    カテゴリ項目は項目ごとの値の種類に対して一度だけ判定してから各ファイルに展開する。
+
+    Args:
+        all_metadata: metadata_to_dict の結果のリスト
+        compiled: compile_rules の結果（省略時は PRESET_RULES をコンパイル）
+
+    Returns:
+        ConformanceResult: 判定結果
+    """
+    compiled = compiled or compile_rules()
+    n, p = len(all_metadata), len(compiled.presets)
+
+    # 数値項目: 値なし（NaN）は比較が False になるため、ルールがあれば不適合になる
+    # （ただしビットレートはコンテナによって値がないため、代わりの項目でも判定できなければ判定不能とする）
+    numbers = np.array(
+        [[parse_spec_number(key, meta_dict.get(key, "")) for key in compiled.numeric_keys]
+         for meta_dict in all_metadata],
+        dtype=np.float64,
+    ).reshape(n, len(compiled.numeric_keys))
+    fallbacks = np.array(
+        [[parse_spec_number(NUMERIC_FALLBACKS[key], meta_dict.get(NUMERIC_FALLBACKS[key], ""))
+          if key in NUMERIC_FALLBACKS else np.nan for key in compiled.numeric_keys]
+         for meta_dict in all_metadata],
+        dtype=np.float64,
+    ).reshape(n, len(compiled.numeric_keys))
+    values = numbers.T[:, :, None]
+    lower, upper = compiled.lower[:, None, :], compiled.upper[:, None, :]
+    has_rule = ~np.isnan(compiled.lower)[:, None, :]
+    missing = np.isnan(values)
+    in_range = (values >= lower) & (values <= upper)
+    # 代わりの値は上限だけのルールを満たす場合に適合とする（超えていても本来の値は分からない）
+    fallback_pass = (fallbacks.T[:, :, None] <= upper) & np.isneginf(lower)
+    optional = np.array([_may_be_unknown(key) for key in compiled.numeric_keys], dtype=bool)[:, None, None]
+    numeric_unknown = has_rule & missing & optional & ~fallback_pass
+    numeric_fail = has_rule & ~in_range & ~(missing & optional)
+
+    # カテゴリ項目: 値の種類ごとに判定し、コードで各ファイルに展開する
+    categorical_fail = np.zeros((len(compiled.categorical_keys), n, p), dtype=bool)
+    for k, key in enumerate(compiled.categorical_keys):
+        vocabulary = {}
+        codes = np.array([vocabulary.setdefault(normalize_value(meta_dict.get(key, "N/A")), len(vocabulary))
+                          for meta_dict in all_metadata], dtype=np.int64)
+        table = np.zeros((len(vocabulary), p), dtype=bool)
+        for value, code in vocabulary.items():
+            for preset_index, allowed in enumerate(compiled.allowed[key]):
+                table[code, preset_index] = allowed is not None and not _categorical_match(value, allowed)
+        categorical_fail[k] = table[codes]
+
+    failures = np.concatenate([numeric_fail, categorical_fail], axis=0)
+    unknown = np.concatenate([numeric_unknown, np.zeros_like(categorical_fail)], axis=0)
+    return ConformanceResult(
+        presets=compiled.presets,
+        passed=~failures.any(axis=0),
+        rule_keys=compiled.numeric_keys + compiled.categorical_keys,
+        failures=failures,
+        unknown=unknown,
+        values=all_metadata,
+        compiled=compiled,
+    )
+
+
+def format_conformance_report(result: ConformanceResult, filenames: list, max_reasons: int = 3) -> str:
+    """
+    適合判定の結果をテキストに整形（プリセットごとに適合数と不適合の理由）
+
+    Args:
+        result: 判定結果
+        filenames: ファイル名リスト
+        max_reasons: 1ファイルあたりに表示する理由の最大数
+    """
+    names = [os.path.basename(f) for f in filenames]
+    lines = []
+    lines.append("=" * 50)
+    lines.append("【プリセット適合判定】")
+    lines.append("=" * 50)
+
+    for p, preset in enumerate(result.presets):
+        passed = int(result.passed[:, p].sum())
+        lines.append("")
+        lines.append(f"--- {preset}: 適合 {passed}/{len(names)} ---")
+        for i in np.flatnonzero(~result.passed[:, p]):
+            reasons = result.reasons(i, p)
+            more = f" ほか{len(reasons) - max_reasons}件" if len(reasons) > max_reasons else ""
+            lines.append(f"[不適合] {names[i]}: {' / '.join(reasons[:max_reasons])}{more}")
+        for i in np.flatnonzero(result.passed[:, p]):
+            keys = result.unknown_keys(i, p)
+            if keys:
+                lines.append(f"[判定不能] {names[i]}: {' / '.join(keys)} の値がありません（他の項目は適合）")
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
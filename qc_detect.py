@@ -0,0 +1,268 @@
+"""
+QC検出モジュール
+ffmpegのblackdetect・freezedetect・silencedetectで黒フレーム・フリーズ・無音の区間を検出する
+"""
+
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from analysis_cache import cached_analysis
+from segments import keyframe_segments
+from video_analyzer import analyze_video, format_duration
+
+
+# 報告する区間の最小の長さ（秒）
+BLACK_MIN_DURATION = 0.5
+FREEZE_MIN_DURATION = 2.0
+SILENCE_MIN_DURATION = 1.0
+# 判定しきい値
+BLACK_PIXEL_THRESHOLD = 0.10
+FREEZE_NOISE = "-60dB"
+SILENCE_NOISE = "-50dB"
+
+# 区間ごとの検出では短い区間も拾い、境界で結合してから最小の長さで絞り込む
+# （境界をまたぐ区間が分割されて最小の長さを下回り、見落とされるのを防ぐ）
+SEGMENT_MIN_DURATION = 0.1
+# 結合する区間同士の隙間の許容値（秒）
+MERGE_TOLERANCE = 0.1
+# 検出用に縮小する映像の幅（デコード後の処理を軽くする）
+DETECT_WIDTH = 320
+# 比較テーブルに表示する区間数の上限
+MAX_LISTED_INTERVALS = 5
+
+
+@dataclass
+class QCResult:
+    """QC検出の結果（各区間は [開始秒, 終了秒]）"""
+    black: list = field(default_factory=list)
+    freeze: list = field(default_factory=list)
+    silence: list = field(default_factory=list)
+    error: Optional[str] = None
+
+
+_BLACK_PATTERN = re.compile(r"black_start:\s*(?P<start>[\d.]+)\s+black_end:\s*(?P<end>[\d.]+)")
+_FREEZE_PATTERN = re.compile(r"lavfi\.freezedetect\.freeze_(?P<kind>start|end):\s*(?P<time>[\d.]+)")
+_SILENCE_PATTERN = re.compile(r"silence_(?P<kind>start|end):\s*(?P<time>-?[\d.]+)")
+
+
+def _build_filtergraph(has_video: bool, has_audio: bool) -> tuple:
+    """
+    検出用のフィルターグラフと -map 引数を組み立てる
+
+    Returns:
+        tuple: (filter_complex文字列, mapするラベルのリスト)
+    """
+    chains = []
+    labels = []
+    if has_video:
+        chains.append(
+            f"[0:v:0]scale={DETECT_WIDTH}:-2,"
+            f"blackdetect=d={SEGMENT_MIN_DURATION}:pix_th={BLACK_PIXEL_THRESHOLD},"
+            f"freezedetect=n={FREEZE_NOISE}:d={SEGMENT_MIN_DURATION}[vout]"
+        )
+        labels.append('[vout]')
+    if has_audio:
+        chains.append(f"[0:a:0]silencedetect=n={SILENCE_NOISE}:d={SEGMENT_MIN_DURATION}[aout]")
+        labels.append('[aout]')
+    return ";".join(chains), labels
+
+
+def _scan_segment(file_path: str, start: float, length: Optional[float],
+                  has_video: bool, has_audio: bool) -> Optional[QCResult]:
+    """
+    1区間を検出し、ファイル先頭からの時刻で区間を返す
+
+    ffmpegの出力を1行ずつ読み、終了が出力されないまま区間の終わりに達したものは区間末尾で閉じる。
+    """
+    filtergraph, labels = _build_filtergraph(has_video, has_audio)
+    cmd = ['ffmpeg', '-hide_banner', '-nostdin', '-nostats']
+    if start > 0:
+        cmd += ['-ss', f'{start:.3f}']
+    if length is not None:
+        cmd += ['-t', f'{length:.3f}']
+    cmd += ['-sn', '-dn', '-i', file_path, '-filter_complex', filtergraph]
+    for label in labels:
+        cmd += ['-map', label]
+    cmd += ['-f', 'null', '-']
+
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    except FileNotFoundError:
+        return None
+
+    result = QCResult()
+    freeze_start = None
+    silence_start = None
+
+    for line in process.stderr:
+        if 'blackdetect' in line:
+            match = _BLACK_PATTERN.search(line)
+            if match:
+                result.black.append([float(match.group('start')), float(match.group('end'))])
+        elif 'freezedetect' in line:
+            match = _FREEZE_PATTERN.search(line)
+            if match:
+                if match.group('kind') == 'start':
+                    freeze_start = float(match.group('time'))
+                elif freeze_start is not None:
+                    result.freeze.append([freeze_start, float(match.group('time'))])
+                    freeze_start = None
+        elif 'silencedetect' in line:
+            match = _SILENCE_PATTERN.search(line)
+            if match:
+                if match.group('kind') == 'start':
+                    silence_start = max(float(match.group('time')), 0.0)
+                elif silence_start is not None:
+                    result.silence.append([silence_start, float(match.group('time'))])
+                    silence_start = None
+
+    if process.wait() != 0:
+        return None
+
+    # 尺が不明な場合は閉じていない区間を捨てる
+    if length is not None:
+        if freeze_start is not None:
+            result.freeze.append([freeze_start, length])
+        if silence_start is not None:
+            result.silence.append([silence_start, length])
+
+    # 区間内の時刻をファイル先頭からの時刻に変換する
+    for intervals in (result.black, result.freeze, result.silence):
+        for interval in intervals:
+            interval[0] = start + interval[0]
+            interval[1] = start + (min(interval[1], length) if length is not None else interval[1])
+    return result
+
+
+def merge_intervals(intervals: list, min_duration: float,
+                    tolerance: float = MERGE_TOLERANCE) -> list:
+    """
+    重なる・隣接する区間を結合し、最小の長さ未満のものを除く
+
+    Args:
+        intervals: [開始秒, 終了秒] のリスト（順不同）
+        min_duration: 残す区間の最小の長さ（秒）
+        tolerance: 結合する隙間の許容値（秒）
+
+    Returns:
+        list: 結合後の [開始秒, 終了秒] のリスト（昇順）
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + tolerance:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [[round(start, 3), round(end, 3)] for start, end in merged if end - start >= min_duration]
+
+
+def _run_qc(file_path: str, max_workers: Optional[int] = None) -> QCResult:
+    """キーフレーム境界で分割した区間を並列に検出し、境界の区間を結合する"""
+    if not file_path or not os.path.exists(file_path):
+        return QCResult(error="ファイルが見つかりません")
+
+    meta = analyze_video(file_path)
+    if meta.error:
+        return QCResult(error=meta.error)
+    has_video = meta.video is not None
+    has_audio = meta.audio is not None
+    if not has_video and not has_audio:
+        return QCResult(error="映像・音声ストリームがありません")
+
+    workers = max_workers or os.cpu_count() or 1
+    start_time = meta.video.start_time if has_video else 0.0
+    segments = keyframe_segments(file_path, meta.duration, workers, start_time=start_time)
+    if not segments:
+        # 尺が不明な場合は全体を1区間として処理する
+        segments = [(0.0, meta.duration if meta.duration > 0 else None)]
+
+    def scan(segment):
+        return _scan_segment(file_path, segment[0], segment[1], has_video, has_audio)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(segments))) as executor:
+        parts = list(executor.map(scan, segments))
+
+    if any(part is None for part in parts):
+        return QCResult(error="ffmpegでの検出に失敗しました")
+
+    return QCResult(
+        black=merge_intervals([i for p in parts for i in p.black], BLACK_MIN_DURATION),
+        freeze=merge_intervals([i for p in parts for i in p.freeze], FREEZE_MIN_DURATION),
+        silence=merge_intervals([i for p in parts for i in p.silence], SILENCE_MIN_DURATION),
+    )
+
+
+def analyze_qc(file_path: str) -> QCResult:
+    """
+    黒フレーム・フリーズ・無音の区間を検出する（ファイル同一性ごとにキャッシュ）
+
+    Args:
+        file_path: 動画ファイルのパス
+
+    Returns:
+        QCResult: 検出結果
+    """
+    return cached_analysis("qc-v1", file_path, _run_qc, QCResult)
+
+
+def _format_time(seconds: float) -> str:
+    """区間表示用の時刻（先頭は N/A ではなく 00:00.000 とする）"""
+    return format_duration(seconds) if seconds > 0 else "00:00.000"
+
+
+def format_intervals(intervals: list, limit: int = MAX_LISTED_INTERVALS) -> str:
+    """区間リストを表示用の文字列に整形"""
+    if not intervals:
+        return "なし"
+    items = [f"{_format_time(start)}-{_format_time(end)}" for start, end in intervals[:limit]]
+    if len(intervals) > limit:
+        items.append(f"他{len(intervals) - limit}件")
+    return ", ".join(items)
+
+
+def _summarize(intervals: list) -> str:
+    """件数と合計時間"""
+    total = sum(end - start for start, end in intervals)
+    return f"{len(intervals)}件 / 合計 {total:.1f}秒"
+
+
+def qc_to_dict(result: QCResult) -> dict:
+    """
+    QCResultを比較テーブル用の辞書に変換
+
+    Returns:
+        dict: キーが項目名、値が表示文字列の辞書
+    """
+    labels = [("黒フレーム", result.black), ("フリーズ", result.freeze), ("無音", result.silence)]
+    if result.error:
+        rows = {f"{label}区間": "N/A" for label, _ in labels}
+        rows.update({f"{label}区間（詳細）": "N/A" for label, _ in labels})
+        return rows
+
+    rows = {f"{label}区間": _summarize(intervals) for label, intervals in labels}
+    rows.update({f"{label}区間（詳細）": format_intervals(intervals) for label, intervals in labels})
+    return rows
+
+
+def format_qc_report(result: QCResult, file_name: str) -> str:
+    """QC検出の結果をテキストに整形（区間は全件）"""
+    lines = []
+    lines.append("=" * 50)
+    lines.append(f"【QC検出】{file_name}")
+    lines.append("=" * 50)
+
+    if result.error:
+        lines.append(f"エラー: {result.error}")
+    else:
+        for label, intervals in (("黒フレーム", result.black), ("フリーズ", result.freeze), ("無音", result.silence)):
+            lines.append(f"[{label}] {_summarize(intervals)}")
+            for start, end in intervals:
+                lines.append(f"  {_format_time(start)} - {_format_time(end)}  ({end - start:.2f}秒)")
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
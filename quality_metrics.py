@@ -0,0 +1,443 @@
+"""
+画質評価モジュール
+ffmpegのpsnr/ssimフィルターで2つの動画のフルリファレンス画質指標を計測する
+"""
+
+import math
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from video_analyzer import analyze_video, format_duration
+from segments import spread_windows
+
+
+# ワースト区間の集計単位（秒）
+DEFAULT_SEGMENT_LENGTH = 2.0
+# サンプリングモードの区間数と1区間の長さ（秒）
+DEFAULT_SAMPLE_COUNT = 8
+DEFAULT_SAMPLE_LENGTH = 2.0
+# 区間評価で粗くシークする際の余裕（秒）
+SEEK_PREROLL = 1.0
+# 完全一致フレーム（MSE=0）のPSNRは無限大になるため上限を設ける
+PSNR_CAP = 100.0
+# 両入力のフレーム数がこれより多く違えば長さの不一致として報告する（時刻の丸めによる1フレームの差は許容）
+FRAME_COUNT_TOLERANCE = 1
+
+
+@dataclass
+class QualitySegment:
+    """区間ごとの画質"""
+    start: float = 0.0
+    end: float = 0.0
+    psnr: float = 0.0
+    ssim: float = 0.0
+
+
+@dataclass
+class QualityResult:
+    """画質評価の結果"""
+    frames: int = 0
+    psnr_mean: float = 0.0
+    psnr_min: float = 0.0
+    ssim_mean: float = 0.0
+    ssim_min: float = 0.0
+    worst_segments: list = field(default_factory=list)
+    sampled: bool = False
+    reference_frames: int = 0    # 比較範囲の基準ファイルのフレーム数（0 は不明）
+    distorted_frames: int = 0    # 比較範囲の比較ファイルのフレーム数（0 は不明）
+    error: Optional[str] = None
+
+    @property
+    def length_mismatch(self) -> bool:
+        """両入力の長さ（フレーム数）が違うか（短い方の長さまでしか評価していない）"""
+        return (self.reference_frames > 0 and self.distorted_frames > 0
+                and abs(self.reference_frames - self.distorted_frames) > FRAME_COUNT_TOLERANCE)
+
+
+def _psnr_from_mse(mse: float) -> float:
+    """8bit画素のMSEからPSNR（dB）を計算"""
+    if mse <= 0:
+        return PSNR_CAP
+    return min(10 * math.log10(255 ** 2 / mse), PSNR_CAP)
+
+
+class _QualityAccumulator:
+    """フレームごとの指標を逐次集計する（フレーム数に比例したメモリを使わない）"""
+
+    def __init__(self, segment_length: float):
+        self.segment_length = segment_length
+        self.frames = 0
+        self.mse_sum = 0.0
+        self.ssim_sum = 0.0
+        self.psnr_min = math.inf
+        self.ssim_min = math.inf
+        # 区間番号 -> [MSE合計, SSIM合計, フレーム数]
+        self.segments = {}
+
+    def add(self, time: float, mse: float, ssim: float):
+        self.frames += 1
+        self.mse_sum += mse
+        self.ssim_sum += ssim
+        self.psnr_min = min(self.psnr_min, _psnr_from_mse(mse))
+        self.ssim_min = min(self.ssim_min, ssim)
+
+        segment = self.segments.setdefault(int(time // self.segment_length), [0.0, 0.0, 0])
+        segment[0] += mse
+        segment[1] += ssim
+        segment[2] += 1
+
+    def merge(self, other: "_QualityAccumulator"):
+        self.frames += other.frames
+        self.mse_sum += other.mse_sum
+        self.ssim_sum += other.ssim_sum
+        self.psnr_min = min(self.psnr_min, other.psnr_min)
+        self.ssim_min = min(self.ssim_min, other.ssim_min)
+        for key, (mse_sum, ssim_sum, count) in other.segments.items():
+            segment = self.segments.setdefault(key, [0.0, 0.0, 0])
+            segment[0] += mse_sum
+            segment[1] += ssim_sum
+            segment[2] += count
+
+    def result(self, worst_count: int) -> QualityResult:
+        if self.frames == 0:
+            return QualityResult(error="比較できるフレームがありませんでした")
+
+        segments = [
+            QualitySegment(
+                start=key * self.segment_length,
+                end=(key + 1) * self.segment_length,
+                psnr=_psnr_from_mse(mse_sum / count),
+                ssim=ssim_sum / count,
+            )
+            for key, (mse_sum, ssim_sum, count) in self.segments.items()
+        ]
+        segments.sort(key=lambda s: s.ssim)
+
+        return QualityResult(
+            frames=self.frames,
+            psnr_mean=_psnr_from_mse(self.mse_sum / self.frames),
+            psnr_min=self.psnr_min,
+            ssim_mean=self.ssim_sum / self.frames,
+            ssim_min=self.ssim_min,
+            worst_segments=segments[:worst_count],
+        )
+
+
+def _format_time(seconds: float) -> str:
+    """区間の時刻表示（0秒も MM:SS.ms 形式で表示）"""
+    return format_duration(seconds) if seconds > 0 else "00:00.000"
+
+
+def _snap_to_frame(seconds: float, fps: str) -> float:
+    """
+    区間の開始位置をフレーム間の中点に揃える
+
+    フレーム時刻ちょうどで切り出すと、タイムスタンプの丸め誤差で入力によって
+    開始フレームが1つずれることがあるため、両入力で同じフレームから始まる位置に補正する。
+    """
+    try:
+        fps_value = float(fps)
+    except ValueError:
+        return seconds
+    if seconds <= 0 or fps_value <= 0:
+        return seconds
+    return max((round(seconds * fps_value) - 0.5) / fps_value, 0.0)
+
+
+def _trim_filter(start: Optional[float], length: Optional[float]) -> str:
+    """入力の実タイムスタンプで区間を切り出す trim フィルター（先頭に付ける形）"""
+    if start is None:
+        return ""
+    trim = f"trim=start={start:.6f}"
+    if length is not None:
+        trim += f":duration={length:.6f}"
+    return trim + ","
+
+
+def _build_filtergraph(width: int, height: int, fps: str,
+                       reference_trim: str = "", distorted_trim: str = "") -> str:
+    """
+    比較用のフィルターグラフを構築する
+
+    両入力のタイムスタンプを0始まりにしてから基準ファイルの解像度・フレームレートに揃え、
+    psnr → ssim の順に通し、フレームごとの指標を metadata フィルターで標準出力に書き出す。
+    短い方の入力が終わったところで評価を終える（既定では最後のフレームを繰り返して残りと比べてしまい、
+    平均・最小とワースト区間が実際の画質と関係なく悪くなる）。
+    """
+    align = f"scale={width}:{height}:flags=bicubic,settb=AVTB,setpts=PTS-STARTPTS"
+    if fps != "N/A":
+        align += f",fps={fps}"
+    align += ",format=yuv420p"
+
+    return (
+        f"[0:v]{reference_trim}{align},split[ref1][ref2];"
+        f"[1:v]{distorted_trim}{align}[dist];"
+        f"[dist][ref1]psnr=shortest=1[scored];"
+        f"[scored][ref2]ssim=shortest=1,metadata=mode=print:file=-"
+    )
+
+
+def _input_args(path: str, start: Optional[float], length: Optional[float]) -> list:
+    """
+    入力オプションを構築する
+
+    シーク位置の解釈はコンテナの開始時刻に左右されるため、少し手前に粗くシークしておき、
+    正確な切り出しは -copyts で保持した実タイムスタンプに対する trim フィルターで行う。
+    """
+    if start is None:
+        return ['-i', path]
+
+    seek = max(start - SEEK_PREROLL, 0.0)
+    args = ['-ss', f'{seek:.3f}'] if seek > 0 else []
+    if length is not None:
+        args += ['-t', f'{start - seek + length + SEEK_PREROLL:.3f}']
+    return args + ['-i', path]
+
+
+def _video_duration(path: str) -> Optional[float]:
+    """
+    映像ストリームの長さ（秒）を、デコードせずにパケットを読み通して求める
+
+    コンテナの尺は音声を含むため、映像だけが途中で切れたファイルでも長さの違いが分かるようにする。
+
+    Returns:
+        float: 映像の長さ。取得できなければ None
+    """
+    cmd = ['ffmpeg', '-v', 'error', '-nostdin', '-i', path, '-map', '0:v:0', '-c', 'copy',
+           '-f', 'null', '-progress', 'pipe:1', '-']
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+    if result.returncode != 0:
+        return None
+    duration = None
+    for line in result.stdout.splitlines():
+        key, _, value = line.strip().partition('=')
+        if key == 'out_time_us':
+            try:
+                duration = int(value) / 1_000_000
+            except ValueError:
+                pass
+    return duration if duration and duration > 0 else None
+
+
+def _frame_count(duration: Optional[float], shift: float, fps: str) -> int:
+    """先頭を shift 秒飛ばしたときの、揃える先のフレームレートでのフレーム数（不明なら0）"""
+    try:
+        fps_value = float(fps)
+    except ValueError:
+        return 0
+    if duration is None or fps_value <= 0:
+        return 0
+    return max(round((duration - shift) * fps_value), 0)
+
+
+def _run_metrics(reference_path: str, distorted_path: str, geometry: tuple,
+                 accumulator: _QualityAccumulator, start: float = 0.0,
+                 length: Optional[float] = None,
+                 reference_start: Optional[float] = None,
+                 distorted_start: Optional[float] = None) -> Optional[str]:
+    """
+    ffmpegを実行し、出力されるフレームごとの指標を逐次パースして集計する
+
+    Args:
+        geometry: 揃える先の (幅, 高さ, fps)
+        start: 集計上の区間開始時刻（秒）
+        length: 評価する長さ（秒、省略時は最後まで）
+        reference_start / distorted_start: 各入力の実タイムスタンプでの開始位置（省略時は先頭から）
+
+    Returns:
+        str: エラーメッセージ（成功時は None）
+    """
+    width, height, fps = geometry
+    filtergraph = _build_filtergraph(
+        width, height, fps,
+        reference_trim=_trim_filter(reference_start, length),
+        distorted_trim=_trim_filter(distorted_start, length),
+    )
+
+    cmd = ['ffmpeg', '-v', 'error', '-nostdin']
+    if reference_start is not None or distorted_start is not None:
+        cmd.append('-copyts')
+    cmd += (
+        _input_args(reference_path, reference_start, length)
+        + _input_args(distorted_path, distorted_start, length)
+        + ['-filter_complex', filtergraph, '-an', '-f', 'null', '-']
+    )
+
+    # 壊れた入力でデコードエラーが大量に出てもパイプが詰まらないよう、stderr は一時ファイルに書く
+    stderr_file = tempfile.TemporaryFile(mode='w+', encoding='utf-8', errors='replace')
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+    except FileNotFoundError:
+        stderr_file.close()
+        return "ffmpegが見つかりません。ffmpegをインストールしてください。"
+
+    # metadata=print の出力は "frame:N pts:... pts_time:T" の後に key=value 行が続く
+    time = None
+    mse = None
+    ssim = None
+    for line in process.stdout:
+        line = line.strip()
+        if line.startswith('frame:'):
+            if time is not None and mse is not None and ssim is not None:
+                accumulator.add(start + time, mse, ssim)
+            time, mse, ssim = None, None, None
+            for token in line.split():
+                if token.startswith('pts_time:'):
+                    try:
+                        time = float(token[len('pts_time:'):])
+                    except ValueError:
+                        time = None
+        elif line.startswith('lavfi.psnr.mse_avg='):
+            mse = float(line.split('=', 1)[1])
+        elif line.startswith('lavfi.ssim.All='):
+            ssim = float(line.split('=', 1)[1])
+    if time is not None and mse is not None and ssim is not None:
+        accumulator.add(start + time, mse, ssim)
+
+    returncode = process.wait()
+    stderr_file.seek(0)
+    stderr = stderr_file.read()
+    stderr_file.close()
+    if returncode != 0:
+        return f"ffmpegエラー: {stderr.strip()}"
+    return None
+
+
+def measure_quality(reference_path: str, distorted_path: str, sampled: bool = False,
+                    sample_count: int = DEFAULT_SAMPLE_COUNT,
+                    sample_length: float = DEFAULT_SAMPLE_LENGTH,
+                    segment_length: float = DEFAULT_SEGMENT_LENGTH,
+                    worst_count: int = 3, offset: float = 0.0,
+                    max_workers: Optional[int] = None) -> QualityResult:
+    """
+    基準ファイルに対する比較ファイルのPSNR/SSIMを計測する
+
+    両ファイルは映像ストリームの先頭フレーム同士で揃え（offset が正なら比較ファイル側、
+    負なら基準ファイル側の先頭を飛ばしてずらす）、
+    比較ファイルを基準ファイルの解像度・フレームレートに合わせて評価する。
+
+    Args:
+        reference_path: 基準（高画質側）のファイルパス
+        distorted_path: 比較（変換後）のファイルパス
+        sampled: True の場合、尺全体に分散した sample_count 個の区間だけを並列に評価する
+        sample_count: サンプリングモードの区間数
+        sample_length: サンプリングモードの1区間の長さ（秒）
+        segment_length: ワースト区間の集計単位（秒）
+        worst_count: 報告するワースト区間の数
+        offset: 比較ファイル側の開始オフセット（秒。負の値は基準ファイル側を -offset 秒ずらす）
+        max_workers: サンプリングモードの並列数
+
+    Returns:
+        QualityResult: 計測結果
+    """
+    for path in (reference_path, distorted_path):
+        if not path or not os.path.exists(path):
+            return QualityResult(error="ファイルが見つかりません")
+
+    ref_meta = analyze_video(reference_path)
+    dist_meta = analyze_video(distorted_path)
+    if ref_meta.error or dist_meta.error:
+        return QualityResult(error=ref_meta.error or dist_meta.error)
+    if ref_meta.video is None or dist_meta.video is None:
+        return QualityResult(error="映像ストリームがありません")
+
+    rv, dv = ref_meta.video, dist_meta.video
+    geometry = (rv.width, rv.height, rv.fps)
+    accumulator = _QualityAccumulator(segment_length)
+    # 先頭を飛ばす側だけをずらす（各ファイルの先頭より前にはシークできないため）
+    reference_shift = max(-offset, 0.0)
+    distorted_shift = max(offset, 0.0)
+    # 短い方の入力までしか評価しないため、長さの違いは指標とは別に報告する
+    reference_duration = _video_duration(reference_path)
+    distorted_duration = _video_duration(distorted_path)
+    frame_counts = (_frame_count(reference_duration, reference_shift, rv.fps),
+                    _frame_count(distorted_duration, distorted_shift, rv.fps))
+
+    if not sampled:
+        error = _run_metrics(
+            reference_path, distorted_path, geometry, accumulator,
+            reference_start=rv.start_time + reference_shift if reference_shift else None,
+            distorted_start=dv.start_time + distorted_shift if distorted_shift else None
+        )
+        if error:
+            return QualityResult(error=error)
+        result = accumulator.result(worst_count)
+        if not result.error:
+            result.reference_frames, result.distorted_frames = frame_counts
+        return result
+
+    # サンプリング区間は両方の映像がある範囲に置く（映像の長さが分からなければコンテナの尺を使う）
+    duration = min((reference_duration or ref_meta.duration) - reference_shift,
+                   (distorted_duration or dist_meta.duration) - distorted_shift)
+    windows = [
+        (_snap_to_frame(start, rv.fps), length)
+        for start, length in spread_windows(duration, sample_count, sample_length)
+    ]
+    if not windows:
+        return QualityResult(error="尺を取得できませんでした")
+
+    def run_window(window):
+        start, length = window
+        window_accumulator = _QualityAccumulator(segment_length)
+        error = _run_metrics(
+            reference_path, distorted_path, geometry, window_accumulator,
+            start=start, length=length,
+            reference_start=rv.start_time + reference_shift + start,
+            distorted_start=dv.start_time + distorted_shift + start
+        )
+        return window_accumulator, error
+
+    workers = max_workers or min(len(windows), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for window_accumulator, error in executor.map(run_window, windows):
+            if error:
+                return QualityResult(error=error)
+            accumulator.merge(window_accumulator)
+
+    result = accumulator.result(worst_count)
+    result.sampled = True
+    if not result.error:
+        result.reference_frames, result.distorted_frames = frame_counts
+    return result
+
+
+def format_quality_report(result: QualityResult, reference_name: str, distorted_name: str) -> str:
+    """画質評価の結果をテキストに整形"""
+    lines = []
+    lines.append("=" * 50)
+    lines.append("【画質比較】PSNR / SSIM")
+    lines.append(f"基準: {reference_name}")
+    lines.append(f"比較: {distorted_name}")
+    lines.append("=" * 50)
+
+    if result.error:
+        lines.append(f"エラー: {result.error}")
+        return "\n".join(lines)
+
+    mode = "サンプリング（推定値）" if result.sampled else "全フレーム"
+    lines.append(f"[評価方式] {mode} / {result.frames}フレーム")
+    lines.append(f"[PSNR] 平均 {result.psnr_mean:.2f} dB / 最小 {result.psnr_min:.2f} dB")
+    lines.append(f"[SSIM] 平均 {result.ssim_mean:.4f} / 最小 {result.ssim_min:.4f}")
+    if result.length_mismatch:
+        lines.append(f"[長さの不一致] 基準 {result.reference_frames}フレーム / 比較 {result.distorted_frames}フレーム"
+                     "（短い方の長さまでを評価）")
+
+    if result.worst_segments:
+        lines.append("")
+        lines.append("ワースト区間:")
+        for segment in result.worst_segments:
+            lines.append(
+                f"  {_format_time(segment.start)} - {_format_time(segment.end)}"
+                f"  SSIM {segment.ssim:.4f} / PSNR {segment.psnr:.2f} dB"
+            )
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
@@ -0,0 +1,66 @@
+"""
+描画キャッシュモジュール
+比較テーブル・変換サマリー・ffmpegコマンドの生成結果を (ファイル集合, 基準, フィルター) ごとに保持する
+"""
+
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+# 保持する描画結果の数は現在のファイル数に合わせる（ペアごとのサマリーは1組1件のため、
+# 基準を数回切り替えても収まる数にする）
+RENDER_CACHE_PER_FILE = 8
+RENDER_CACHE_MIN_SIZE = 256
+_render_cache_size = {'size': RENDER_CACHE_MIN_SIZE}
+
+# (種類, 元データのid, 元データの要素数, パラメータ) → (元データ, 描画結果)
+# 元データを保持しておき、解放されたオブジェクトのidが再利用されて誤ってヒットするのを防ぐ
+_render_cache = OrderedDict()
+
+
+def _source_key(source) -> tuple:
+    """元データ（リストまたは None）の識別子"""
+    if source is None:
+        return (None, 0)
+    return (id(source), len(source))
+
+
+def memoize_render(kind: str, sources: tuple, params: tuple, compute: Callable):
+    """
+    描画結果をキャッシュから取得し、なければ作成する
+
+    解析結果のリストは作成後に書き換えない（プリセット追加などでは新しいリストを作る）前提で、
+    リストのidと要素数で同じファイル集合かを判定する。
+
+    Args:
+        kind: 描画の種類（"table", "summary" など）
+        sources: 描画の元になるリスト（all_metadata, filenames など。None も可）
+        params: 元データ以外の条件（基準のインデックス、差分フィルターなど）
+        compute: キャッシュにない場合に呼び出す、引数なしの関数
+
+    Returns:
+        compute の戻り値
+    """
+    cache_key = (kind, tuple(_source_key(s) for s in sources), params)
+    cached = _render_cache.get(cache_key)
+    if cached is not None:
+        _render_cache.move_to_end(cache_key)
+        return cached[1]
+
+    result = compute()
+    _render_cache[cache_key] = (sources, result)
+    while len(_render_cache) > _render_cache_size['size']:
+        _render_cache.popitem(last=False)
+    return result
+
+
+def clear_render_cache(file_count: Optional[int] = None) -> None:
+    """
+    保持している描画結果をすべて破棄する
+
+    新しい解析で結果を置き換えるときに呼び、以前の解析の元データと描画結果を解放する。
+    file_count を指定すると、保持する数をそのファイル数に合わせる。
+    """
+    _render_cache.clear()
+    if file_count is not None:
+        _render_cache_size['size'] = max(RENDER_CACHE_MIN_SIZE, file_count * RENDER_CACHE_PER_FILE)
@@ -0,0 +1,286 @@
+"""
+レポート画像モジュール
+サムネイル・比較テーブル・変換サマリーを Pillow で直接PNGに描画する（外部コマンドを使わない）。
+同じ内容のレポートは描画済みのPNGを再利用する
+"""
+
+import base64
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from diff_engine import get_diff_matrix
+
+
+# 日本語を表示できるフォントの候補（環境変数 DIFFMOVIE_REPORT_FONT で指定したものを優先）
+FONT_CANDIDATES = (
+    "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
+    "/System/Library/Fonts/Hiragino Sans GB.ttc",
+    "C:/Windows/Fonts/meiryo.ttc",
+    "C:/Windows/Fonts/msgothic.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/opentype/ipaexfont-gothic/ipaexg.ttf",
+    "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
+# 色（HTMLレポートと同じ配色）
+COLOR_BACKGROUND = (10, 10, 10)
+COLOR_ACCENT = (238, 255, 0)
+COLOR_TEXT = (255, 255, 255)
+COLOR_MUTED = (136, 136, 136)
+COLOR_LABEL = (204, 204, 204)
+COLOR_LABEL_BACKGROUND = (18, 18, 18)
+COLOR_DIFF_BACKGROUND = (33, 35, 9)
+COLOR_BORDER = (51, 51, 51)
+COLOR_SUMMARY_BACKGROUND = (26, 26, 26)
+
+# レイアウト（ピクセル）
+MARGIN = 24
+LABEL_WIDTH = 220
+COLUMN_WIDTH = 200
+ROW_HEIGHT = 28
+THUMB_WIDTH = 180
+THUMB_HEIGHT = 120
+LINE_HEIGHT = 20
+MIN_WIDTH = 1000
+# 画像に描画するファイル列の上限（超えた分はHTMLレポートで確認する）
+REPORT_MAX_FILES = 40
+# 画像に描画する変換サマリーの行数の上限（超えた分はHTMLレポートで確認する）
+REPORT_MAX_SUMMARY_LINES = 120
+# 描画済みのPNGを保持する数
+REPORT_CACHE_SIZE = 8
+
+# (フォントの種類, サイズ) → フォント
+_fonts = {}
+# 内容のハッシュ → PNGのバイト列
+_png_cache = OrderedDict()
+
+
+def _font(size: int):
+    """日本語を表示できるフォントを取得（見つからなければ Pillow の既定フォント）"""
+    cached = _fonts.get(size)
+    if cached is not None:
+        return cached
+
+    font = None
+    for path in (os.environ.get('DIFFMOVIE_REPORT_FONT'),) + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            try:
+                font = ImageFont.truetype(path, size)
+                break
+            except OSError:
+                continue
+    if font is None:
+        font = ImageFont.load_default(size)
+    _fonts[size] = font
+    return font
+
+
+def _fit(text: str, font, width: int) -> str:
+    """幅に収まらない文字列を末尾を省略して切り詰める"""
+    if font.getlength(text) <= width:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if font.getlength(text[:mid] + "…") <= width:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + "…"
+
+
+def _wrap(text: str, font, width: int, max_lines: Optional[int] = None) -> list:
+    """
+    文字単位で折り返した行のリスト（日本語は単語の区切りがないため）
+
+    max_lines を指定すると、その行数を超えたところで折り返しをやめる（超えたかは max_lines + 1 行目の有無で分かる）
+    """
+    lines = []
+    for line in text.splitlines() or [""]:
+        if max_lines is not None and len(lines) > max_lines:
+            break
+        while line and font.getlength(line) > width:
+            low, high = 1, len(line)
+            while low < high:
+                mid = (low + high + 1) // 2
+                if font.getlength(line[:mid]) <= width:
+                    low = mid
+                else:
+                    high = mid - 1
+            lines.append(line[:low])
+            line = line[low:]
+        lines.append(line)
+    return lines
+
+
+def _decode_thumbnail(data: str) -> Optional[Image.Image]:
+    """data:image/jpeg;base64,... 形式のサムネイルを画像に戻す"""
+    if not data or ',' not in data:
+        return None
+    try:
+        image = Image.open(io.BytesIO(base64.b64decode(data.split(',', 1)[1])))
+        image = image.convert('RGB')
+    except (ValueError, OSError):
+        return None
+    image.thumbnail((THUMB_WIDTH, THUMB_HEIGHT))
+    return image
+
+
+def report_content_key(all_metadata: list, filenames: list, thumbnails: list, summary_text: str) -> str:
+    """レポートの内容のハッシュ（同じ解析結果なら同じ値）"""
+    digest = hashlib.sha1()
+    for name in filenames:
+        digest.update(os.path.basename(name).encode('utf-8') + b'\0')
+    for meta_dict in all_metadata:
+        for key, value in meta_dict.items():
+            digest.update(f"{key}\0{value}\0".encode('utf-8'))
+        digest.update(b'\1')
+    for thumb in thumbnails or []:
+        digest.update((thumb or "").encode('ascii', 'ignore') + b'\0')
+    digest.update((summary_text or "").encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _draw_section_title(draw, y: int, title: str) -> int:
+    draw.rectangle((MARGIN, y, MARGIN + 3, y + 22), fill=COLOR_ACCENT)
+    draw.text((MARGIN + 14, y), title, font=_font(18), fill=COLOR_ACCENT)
+    return y + 38
+
+
+def render_report_image(all_metadata: list, filenames: list, thumbnails: list, summary_text: str) -> Image.Image:
+    """
+    レポートを1枚の画像に描画する
+
+    Args:
+        all_metadata: metadata_to_dict の結果のリスト（比較テーブルの列）
+        filenames: ファイル名リスト
+        thumbnails: サムネイル（data URI）のリスト。プリセット列の分はなくてもよい
+        summary_text: 変換サマリー
+
+    Returns:
+        Image.Image: 描画したレポート
+    """
+    matrix = get_diff_matrix(all_metadata)
+    shown = min(len(all_metadata), REPORT_MAX_FILES)
+    width = max(MIN_WIDTH, MARGIN * 2 + LABEL_WIDTH + COLUMN_WIDTH * shown)
+    inner = width - MARGIN * 2
+
+    # サムネイルも表の列と同じ数までにして、ファイル数が多くても画像の大きさを抑える
+    thumbs = [_decode_thumbnail(t) for t in (thumbnails or [])[:shown]]
+    per_row = max(1, inner // (THUMB_WIDTH + 16))
+    thumb_rows = (len(thumbs) + per_row - 1) // per_row
+    summary_lines = _wrap(summary_text or "変換サマリーなし", _font(13), inner - 40, REPORT_MAX_SUMMARY_LINES)
+    if len(summary_lines) > REPORT_MAX_SUMMARY_LINES:
+        summary_lines = summary_lines[:REPORT_MAX_SUMMARY_LINES] + ["…（以降はHTMLレポートを参照してください）"]
+
+    # 高さを先に求めてから1回で描画する
+    height = MARGIN + 90
+    height += 38 + max(thumb_rows, 1) * (THUMB_HEIGHT + 40) + 10
+    height += 38 + ROW_HEIGHT * (len(matrix.keys) + 1) + 30
+    if shown < len(all_metadata):
+        height += LINE_HEIGHT
+    height += 38 + len(summary_lines) * LINE_HEIGHT + 40 + MARGIN
+
+    image = Image.new('RGB', (width, height), COLOR_BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    # 見出し
+    y = MARGIN
+    title_font = _font(36)
+    title_width = title_font.getlength("DiffMovie")
+    draw.text(((width - title_width) / 2, y), "DiffMovie", font=title_font, fill=COLOR_ACCENT)
+    subtitle = f"動画メタデータ比較レポート（{len(all_metadata)}ファイル / 差分 {matrix.diff_count}/{matrix.total_count}項目）"
+    draw.text(((width - _font(14).getlength(subtitle)) / 2, y + 48), subtitle, font=_font(14), fill=COLOR_MUTED)
+    y += 80
+    draw.line((MARGIN, y, width - MARGIN, y), fill=COLOR_ACCENT, width=2)
+    y += 10
+
+    # サムネイル
+    y = _draw_section_title(draw, y, "プレビュー")
+    if not thumbs:
+        draw.text((MARGIN, y), "サムネイルなし", font=_font(14), fill=COLOR_MUTED)
+    for i, (thumb, name) in enumerate(zip(thumbs, filenames)):
+        x = MARGIN + (i % per_row) * (THUMB_WIDTH + 16)
+        top = y + (i // per_row) * (THUMB_HEIGHT + 40)
+        if thumb is None:
+            draw.rectangle((x, top, x + THUMB_WIDTH, top + THUMB_HEIGHT), fill=(51, 51, 51))
+            draw.text((x + 50, top + 50), "No Preview", font=_font(14), fill=(102, 102, 102))
+        else:
+            image.paste(thumb, (x + (THUMB_WIDTH - thumb.width) // 2, top + (THUMB_HEIGHT - thumb.height) // 2))
+        draw.text((x, top + THUMB_HEIGHT + 6), _fit(os.path.basename(name), _font(12), THUMB_WIDTH),
+                  font=_font(12), fill=COLOR_LABEL)
+    y += max(thumb_rows, 1) * (THUMB_HEIGHT + 40) + 10
+
+    # 比較テーブル（ファイル間で値が異なる項目を強調）
+    y = _draw_section_title(draw, y, "比較結果")
+    cell_font = _font(13)
+    table_right = MARGIN + LABEL_WIDTH + COLUMN_WIDTH * shown
+    draw.rectangle((MARGIN, y, table_right, y + ROW_HEIGHT), fill=COLOR_ACCENT)
+    draw.text((MARGIN + 8, y + 6), "項目", font=cell_font, fill=(0, 0, 0))
+    for col in range(shown):
+        x = MARGIN + LABEL_WIDTH + COLUMN_WIDTH * col
+        draw.text((x + 8, y + 6), _fit(os.path.basename(filenames[col]), cell_font, COLUMN_WIDTH - 16),
+                  font=cell_font, fill=(0, 0, 0))
+    y += ROW_HEIGHT
+
+    for row, (key, differs) in enumerate(zip(matrix.keys, matrix.diff_mask)):
+        top = y + ROW_HEIGHT * row
+        if differs:
+            draw.rectangle((MARGIN, top, table_right, top + ROW_HEIGHT), fill=COLOR_DIFF_BACKGROUND)
+        else:
+            draw.rectangle((MARGIN, top, MARGIN + LABEL_WIDTH, top + ROW_HEIGHT), fill=COLOR_LABEL_BACKGROUND)
+        draw.text((MARGIN + 8, top + 6), _fit(key, cell_font, LABEL_WIDTH - 16), font=cell_font, fill=COLOR_LABEL)
+        color = COLOR_ACCENT if differs else COLOR_TEXT
+        for col in range(shown):
+            x = MARGIN + LABEL_WIDTH + COLUMN_WIDTH * col
+            draw.text((x + 8, top + 6), _fit(matrix.values[row, col], cell_font, COLUMN_WIDTH - 16),
+                      font=cell_font, fill=color)
+        draw.line((MARGIN, top + ROW_HEIGHT - 1, table_right, top + ROW_HEIGHT - 1), fill=COLOR_BORDER)
+    y += ROW_HEIGHT * len(matrix.keys) + 10
+    if shown < len(all_metadata):
+        draw.text((MARGIN, y), f"他 {len(all_metadata) - shown} ファイルはHTMLレポートを参照してください",
+                  font=_font(13), fill=COLOR_MUTED)
+        y += LINE_HEIGHT
+    y += 20
+
+    # 変換サマリー
+    y = _draw_section_title(draw, y, "変換サマリー")
+    box_bottom = y + len(summary_lines) * LINE_HEIGHT + 30
+    draw.rounded_rectangle((MARGIN, y, width - MARGIN, box_bottom), radius=8,
+                           fill=COLOR_SUMMARY_BACKGROUND, outline=COLOR_ACCENT)
+    for i, line in enumerate(summary_lines):
+        draw.text((MARGIN + 20, y + 15 + i * LINE_HEIGHT), line, font=_font(13), fill=COLOR_ACCENT)
+
+    return image
+
+
+def render_report_png(all_metadata: list, filenames: list, thumbnails: list, summary_text: str) -> bytes:
+    """
+    レポートをPNGのバイト列として描画する（同じ内容なら描画済みの結果を返す）
+
+    Returns:
+        bytes: PNGデータ
+    """
+    key = report_content_key(all_metadata, filenames, thumbnails, summary_text)
+    cached = _png_cache.get(key)
+    if cached is not None:
+        _png_cache.move_to_end(key)
+        return cached
+
+    buffer = io.BytesIO()
+    # 圧縮レベルを下げて保存を速くする（単色の背景が大半のため、サイズはほとんど変わらない）
+    render_report_image(all_metadata, filenames, thumbnails, summary_text).save(buffer, 'PNG', compress_level=1)
+    png = buffer.getvalue()
+
+    _png_cache[key] = png
+    if len(_png_cache) > REPORT_CACHE_SIZE:
+        _png_cache.popitem(last=False)
+    return png
@@ -0,0 +1,373 @@
+"""
+レポート保存先の管理モジュール
+レポート・書き出したファイルを内容のハッシュ付きの名前で reports に保存して重複を作らず、
+保存期間・件数・合計サイズの上限を超えた古いファイルを削除する。
+一覧は index.json から読むため、ディレクトリを走査しない。
+index.json は他のプロセス（CLIや別に起動したアプリ）も更新するため、変更するたびに読み直してから書き込む
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス間のロックを取らない
+    fcntl = None
+
+from video_analyzer import parse_size_string, format_file_size
+
+
+DEFAULT_REPORTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports")
+INDEX_FILENAME = "index.json"
+INDEX_LOCK_FILENAME = ".index.lock"
+# 書き込み途中の一時ファイルの名前の先頭
+TEMP_PREFIX = ".tmp_"
+# これより古い一時ファイルは書き込み中に終了したプロセスの残りとして削除する（秒）
+TEMP_MAX_AGE = 3600
+# ファイル名に使うハッシュの桁数
+KEY_LENGTH = 16
+
+# 保存期間・件数・合計サイズの既定の上限（環境変数で変更でき、0 で無制限）
+DEFAULT_MAX_AGE_DAYS = 30.0
+DEFAULT_MAX_COUNT = 500
+DEFAULT_MAX_TOTAL_BYTES = 1024 ** 3
+
+
+@dataclass
+class RetentionPolicy:
+    """保存ポリシー（None の項目は制限しない）"""
+    max_age_days: Optional[float] = DEFAULT_MAX_AGE_DAYS  # 最後に保存・再利用してからの日数
+    max_count: Optional[int] = DEFAULT_MAX_COUNT          # ファイル数
+    max_total_bytes: Optional[int] = DEFAULT_MAX_TOTAL_BYTES  # 合計サイズ
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        """
+        環境変数から保存ポリシーを作成する
+
+        DIFFMOVIE_REPORT_MAX_AGE_DAYS（日数）、DIFFMOVIE_REPORT_MAX_COUNT（件数）、
+        DIFFMOVIE_REPORT_MAX_SIZE（バイト数または "500 MB" 形式）。0 を指定するとその項目は制限しない。
+        """
+        def read(name: str, default, parse):
+            value = os.environ.get(name)
+            if not value:
+                return default
+            try:
+                parsed = parse(value)
+            except ValueError:
+                return default
+            return parsed if parsed > 0 else None
+
+        def parse_size(value: str) -> int:
+            try:
+                return int(float(value))
+            except ValueError:
+                return int(parse_size_string(value))
+
+        return cls(
+            max_age_days=read('DIFFMOVIE_REPORT_MAX_AGE_DAYS', DEFAULT_MAX_AGE_DAYS, float),
+            max_count=read('DIFFMOVIE_REPORT_MAX_COUNT', DEFAULT_MAX_COUNT, int),
+            max_total_bytes=read('DIFFMOVIE_REPORT_MAX_SIZE', DEFAULT_MAX_TOTAL_BYTES, parse_size),
+        )
+
+
+@dataclass
+class ReportEntry:
+    """保存したファイル1件"""
+    filename: str
+    kind: str            # "report" / "results_metadata" / "convert" など
+    key: str             # 内容のハッシュ（KEY_LENGTH 桁）
+    size: int = 0
+    created: float = 0.0
+    last_used: float = 0.0   # 最後に保存・再利用した時刻（保存期間の判定に使う）
+
+
+class ReportStore:
+    """reports ディレクトリの保存・重複排除・削除と index.json の管理"""
+
+    def __init__(self, directory: str = DEFAULT_REPORTS_DIR, policy: Optional[RetentionPolicy] = None):
+        self.directory = directory
+        self.policy = policy if policy is not None else RetentionPolicy.from_env()
+        self._lock = threading.Lock()
+        self._entries = None
+        self._index_mtime = None
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILENAME)
+
+    @contextmanager
+    def _locked(self):
+        """スレッド間とプロセス間（fcntl が使える環境）で索引の読み直しから書き込みまでを排他する"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, INDEX_LOCK_FILENAME), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _index_stat(self):
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self) -> dict:
+        """
+        index.json を読み込む（なければディレクトリ内のファイルから作り直す）
+
+        他のプロセスが index.json を書き換えていたら読み直し、そのプロセスが追加・削除したファイルを反映する
+        （このプロセスの変更はすぐ書き込んでいるため、読み直しても失われない）。
+        """
+        index_stat = self._index_stat()
+        if self._entries is not None and index_stat == self._index_mtime:
+            return self._entries
+        entries = {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = {e['filename']: ReportEntry(**e) for e in json.load(f)}
+        except (OSError, ValueError, TypeError, KeyError):
+            # 索引がない以前のファイルも管理対象にして、保存ポリシーで削除できるようにする
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name == INDEX_FILENAME or name.startswith('.') or not os.path.isfile(path):
+                    continue
+                stat = os.stat(path)
+                stem = os.path.splitext(name)[0]
+                kind, _, key = stem.rpartition('_')
+                entries[name] = ReportEntry(name, kind or stem, key, stat.st_size, stat.st_mtime, stat.st_mtime)
+            self._remove_stale_temp_files()
+        self._entries = entries
+        self._index_mtime = index_stat
+        return entries
+
+    def _save_index(self) -> None:
+        """索引を一時ファイルに書いてから置き換える（書き込み途中の索引を読まない）"""
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump([asdict(e) for e in self._entries.values()], f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.index_path)
+        self._index_mtime = self._index_stat()
+
+    def _remove_stale_temp_files(self) -> None:
+        """書き込み中に終了したプロセスが残した一時ファイルを削除する"""
+        cutoff = time.time() - TEMP_MAX_AGE
+        for name in os.listdir(self.directory):
+            if not name.startswith(TEMP_PREFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def temp_path(self, kind: str, key: str, extension: str = "") -> str:
+        """書き込み途中のファイルの名前（索引にも一覧にも含めず、失敗したら削除する）"""
+        return os.path.join(
+            self.directory,
+            f"{TEMP_PREFIX}{kind}_{key[:KEY_LENGTH]}.{os.getpid()}.{threading.get_ident()}{extension}")
+
+    def path_for(self, kind: str, key: str, extension: str) -> str:
+        """内容のハッシュから保存先のパスを求める"""
+        return os.path.join(self.directory, f"{kind}_{key[:KEY_LENGTH]}{extension}")
+
+    def lookup(self, kind: str, key: str, extension: str) -> Optional[str]:
+        """
+        同じ内容のファイルが保存済みならそのパスを返す（最後に使った時刻を更新する）
+
+        Returns:
+            str: 保存済みのパス。なければ None
+        """
+        path = self.path_for(kind, key, extension)
+        with self._locked():
+            entries = self._load()
+            entry = entries.get(os.path.basename(path))
+            if not os.path.exists(path):
+                if entry is not None:
+                    del entries[entry.filename]
+                    self._save_index()
+                return None
+            if entry is None:
+                stat = os.stat(path)
+                entry = ReportEntry(os.path.basename(path), kind, key[:KEY_LENGTH], stat.st_size, stat.st_mtime)
+                entries[entry.filename] = entry
+            entry.last_used = time.time()
+            self._save_index()
+        return path
+
+    def adopt(self, kind: str, key: str, extension: str, written_path: str) -> str:
+        """
+        書き出し済みのファイルを内容のハッシュの名前で保存先に移し、保存ポリシーを適用する
+
+        Returns:
+            str: 保存先のパス
+        """
+        return self.adopt_all([(kind, written_path)], key, extension)[0]
+
+    def adopt_all(self, files: list, key: str, extension: str) -> list:
+        """
+        一緒に使う複数のファイルをまとめて保存先に移し、保存ポリシーを適用する
+        （移したファイルはどれも削除の対象にしない）
+
+        Args:
+            files: (種類, 書き出し済みのパス) のリスト
+            key: 内容のハッシュ
+            extension: 拡張子（"." を含む）
+
+        Returns:
+            list: files の順の保存先のパス
+        """
+        paths = []
+        for kind, written_path in files:
+            path = self.path_for(kind, key, extension)
+            os.replace(written_path, path)
+            paths.append(path)
+        now = time.time()
+        with self._locked():
+            entries = self._load()
+            for (kind, _), path in zip(files, paths):
+                entries[os.path.basename(path)] = ReportEntry(
+                    os.path.basename(path), kind, key[:KEY_LENGTH], os.path.getsize(path), now, now)
+            self._prune(keep={os.path.basename(path) for path in paths})
+            self._save_index()
+        return paths
+
+    def save(self, kind: str, key: str, extension: str, write: Callable[[str], None]) -> tuple:
+        """
+        内容のハッシュで保存する（同じ内容が保存済みなら書き込まずに再利用する）
+
+        Args:
+            kind: ファイルの種類（ファイル名の先頭に付ける）
+            key: 内容のハッシュ（同じ結果なら同じ値になるもの）
+            extension: 拡張子（"." を含む）
+            write: 渡したパスにファイルを書き込む関数（保存済みなら呼ばない）
+
+        Returns:
+            tuple: (保存先のパス, 再利用したか)
+        """
+        def write_one(prefix: str) -> list:
+            write(prefix + extension)
+            return [prefix + extension]
+
+        paths, reused = self.save_all([kind], key, extension, write_one)
+        return paths[0], reused
+
+    def save_all(self, kinds: list, key: str, extension: str, write: Callable[[str], list]) -> tuple:
+        """
+        一緒に書き出す複数のファイルを内容のハッシュで保存する（すべて保存済みなら書き込まずに再利用する）
+
+        Args:
+            kinds: ファイルの種類のリスト
+            key: 内容のハッシュ
+            extension: 拡張子（"." を含む）
+            write: 一時ファイルの名前の先頭を受け取り、書き出したパスを kinds の順に返す関数
+                   （書き出すファイルの名前はこの先頭で始める）
+
+        Returns:
+            tuple: (kinds の順の保存先のパス, 再利用したか)
+        """
+        existing = [self.lookup(kind, key, extension) for kind in kinds]
+        if all(existing):
+            return existing, True
+        # 書き込み途中のファイルを完成したレポートとして扱わないよう、一時的な名前で書いてから移す
+        prefix = self.temp_path("_".join(kinds), key)
+        try:
+            written = write(prefix)
+            return self.adopt_all(list(zip(kinds, written)), key, extension), False
+        except BaseException:
+            # 失敗・中断したときは書きかけの一時ファイルを削除する（例外の種類によらない）
+            directory, name = os.path.split(prefix)
+            for leftover in os.listdir(directory):
+                if leftover.startswith(name):
+                    try:
+                        os.remove(os.path.join(directory, leftover))
+                    except OSError:
+                        pass
+            raise
+
+    def entries(self) -> list:
+        """保存済みのファイルの一覧（最後に使った時刻の新しい順）"""
+        with self._locked():
+            return sorted(self._load().values(), key=lambda e: e.last_used, reverse=True)
+
+    def _prune(self, policy: Optional[RetentionPolicy] = None, keep: set = frozenset()) -> list:
+        """保存ポリシーを超えたファイルを、最後に使った時刻の古い順に削除する（ロックを取得して呼ぶ）"""
+        policy = policy or self.policy
+        entries = self._load()
+        ordered = sorted(entries.values(), key=lambda e: e.last_used, reverse=True)
+        removed = []
+        total = 0
+        cutoff = time.time() - policy.max_age_days * 86400 if policy.max_age_days else None
+
+        for count, entry in enumerate(ordered, 1):
+            total += entry.size
+            if entry.filename in keep:
+                continue
+            expired = cutoff is not None and entry.last_used < cutoff
+            over_count = policy.max_count is not None and count > policy.max_count
+            over_size = policy.max_total_bytes is not None and total > policy.max_total_bytes
+            if expired or over_count or over_size:
+                try:
+                    os.remove(os.path.join(self.directory, entry.filename))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue
+                del entries[entry.filename]
+                total -= entry.size
+                removed.append(entry)
+        return removed
+
+    def prune(self, policy: Optional[RetentionPolicy] = None) -> list:
+        """
+        保存ポリシーを超えたファイルを削除する
+
+        Returns:
+            list: 削除した ReportEntry のリスト
+        """
+        with self._locked():
+            removed = self._prune(policy)
+            self._save_index()
+            self._remove_stale_temp_files()
+        return removed
+
+
+def format_report_entries(entries: list, policy: Optional[RetentionPolicy] = None) -> str:
+    """保存済みのファイルの一覧をテキストに整形"""
+    lines = []
+    lines.append("=" * 50)
+    lines.append("【保存済みのレポート】")
+    lines.append("=" * 50)
+    if not entries:
+        lines.append("保存済みのファイルはありません")
+        return "\n".join(lines)
+
+    total = sum(e.size for e in entries)
+    lines.append(f"{len(entries)}件 / 合計 {format_file_size(total)}")
+    if policy is not None:
+        limits = [
+            f"{policy.max_age_days:g}日" if policy.max_age_days else "期間無制限",
+            f"{policy.max_count}件" if policy.max_count else "件数無制限",
+            format_file_size(policy.max_total_bytes) if policy.max_total_bytes else "サイズ無制限",
+        ]
+        lines.append(f"保存ポリシー: {' / '.join(limits)}")
+    lines.append("")
+    for e in entries:
+        used = time.strftime('%Y-%m-%d %H:%M', time.localtime(e.last_used))
+        lines.append(f"{e.filename}  {format_file_size(e.size)}  （最終使用 {used}）")
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
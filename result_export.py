@@ -0,0 +1,217 @@
+"""
+解析結果の書き出しモジュール
+型付きのメタデータ（1ファイル1行）と、基準ファイルとの比較（1ファイル×1項目で1行）を
+JSON Lines / CSV / Parquet / Arrow IPC に書き出す。
+行ごとにファイルへ書き込む（列形式は一定の行数ごとにまとめて書く）ため、
+数万ファイルの比較でも全体をメモリに持たない
+"""
+
+import csv
+import json
+import os
+from dataclasses import fields
+
+from video_analyzer import VideoMetadata, VideoStreamInfo, AudioStreamInfo, metadata_to_dict, calculate_diff
+from diff_engine import MISSING_VALUE
+
+
+EXPORT_JSONL = "jsonl"
+EXPORT_CSV = "csv"
+EXPORT_PARQUET = "parquet"
+EXPORT_ARROW = "arrow"
+EXPORT_FORMATS = (EXPORT_JSONL, EXPORT_CSV, EXPORT_PARQUET, EXPORT_ARROW)
+EXPORT_EXTENSIONS = {
+    EXPORT_JSONL: ".jsonl",
+    EXPORT_CSV: ".csv",
+    EXPORT_PARQUET: ".parquet",
+    EXPORT_ARROW: ".arrow",
+}
+# 列形式で1回に書き込む行数
+EXPORT_BATCH_ROWS = 8192
+
+# 比較の列（基準ファイルの値と、各ファイルの値・差分）
+COMPARISON_COLUMNS = [
+    ("path", str),
+    ("item", str),
+    ("base_value", str),
+    ("value", str),
+    ("differs", bool),
+    ("diff", str),
+]
+
+
+def _stream_columns(prefix: str, stream_type: type) -> list:
+    return [(f"{prefix}_{f.name}", f.type) for f in fields(stream_type)]
+
+
+def metadata_columns() -> list:
+    """
+    型付きメタデータの列 (列名, 型) のリスト
+
+    VideoMetadata のフィールドをそのまま列にし、映像・音声ストリームは video_ / audio_ を付けて展開する
+    （ストリームがないファイルではその列が空になる）。
+    """
+    columns = [("path", str)]
+    for f in fields(VideoMetadata):
+        if f.name == 'video':
+            columns += _stream_columns('video', VideoStreamInfo)
+        elif f.name == 'audio':
+            columns += _stream_columns('audio', AudioStreamInfo)
+        elif f.name == 'error':
+            columns.append(('error', str))
+        else:
+            columns.append((f.name, f.type))
+    return columns
+
+
+def metadata_row(meta: VideoMetadata, path: str) -> dict:
+    """1ファイルの型付きメタデータの行"""
+    row = {"path": path}
+    for f in fields(VideoMetadata):
+        value = getattr(meta, f.name)
+        if f.name in ('video', 'audio'):
+            stream_type = VideoStreamInfo if f.name == 'video' else AudioStreamInfo
+            for sf in fields(stream_type):
+                row[f"{f.name}_{sf.name}"] = getattr(value, sf.name) if value is not None else None
+        else:
+            row[f.name] = value
+    return row
+
+
+def comparison_rows(base_dict: dict, meta: VideoMetadata, path: str):
+    """
+    1ファイルを基準ファイルと比較した行（compare_metadata と同じ項目・差分の説明）を順に返す
+
+    Args:
+        base_dict: 基準ファイルの metadata_to_dict の結果
+        meta: 比較するファイルのメタデータ
+        path: 比較するファイルのパス
+    """
+    meta_dict = metadata_to_dict(meta)
+    # 基準ファイルの項目の順に、基準にない項目を後ろに続ける
+    for key in list(base_dict) + [k for k in meta_dict if k not in base_dict]:
+        base_value = str(base_dict.get(key, MISSING_VALUE))
+        value = str(meta_dict.get(key, MISSING_VALUE))
+        yield {
+            "path": path,
+            "item": key,
+            "base_value": base_value,
+            "value": value,
+            "differs": base_value != value,
+            "diff": calculate_diff(key, base_value, value),
+        }
+
+
+class _JsonlWriter:
+    """1行1オブジェクトのJSONを書き込む"""
+
+    def __init__(self, path: str, columns: list):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, row: dict) -> None:
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _CsvWriter:
+    """見出し行付きのCSVを書き込む（Excelで文字化けしないようBOMを付ける）"""
+
+    def __init__(self, path: str, columns: list):
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=[name for name, _ in columns])
+        self._writer.writeheader()
+
+    def write(self, row: dict) -> None:
+        self._writer.writerow(row)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ArrowWriter:
+    """EXPORT_BATCH_ROWS 行ごとにレコードバッチにして Parquet / Arrow IPC に書き込む"""
+
+    def __init__(self, path: str, columns: list, export_format: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet / Arrow の書き出しには pyarrow が必要です（pip install pyarrow）")
+
+        types = {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_()}
+        self._pa = pa
+        self._schema = pa.schema([(name, types[column_type]) for name, column_type in columns])
+        if export_format == EXPORT_PARQUET:
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self._schema)
+        self._rows = []
+
+    def write(self, row: dict) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= EXPORT_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._rows:
+            self._writer.write_batch(self._pa.RecordBatch.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+def open_writer(path: str, columns: list, export_format: str):
+    """書き出し形式に応じた行単位のライター（write(row) / close()）を開く"""
+    if export_format == EXPORT_JSONL:
+        return _JsonlWriter(path, columns)
+    if export_format == EXPORT_CSV:
+        return _CsvWriter(path, columns)
+    if export_format in (EXPORT_PARQUET, EXPORT_ARROW):
+        return _ArrowWriter(path, columns, export_format)
+    raise ValueError(f"未対応の形式です: {export_format}")
+
+
+def export_results(base_meta: VideoMetadata, files, path_prefix: str,
+                   export_format: str = EXPORT_JSONL) -> tuple:
+    """
+    基準ファイルと各ファイルの解析結果を、型付きメタデータと比較の2ファイルに書き出す
+
+    files は1件ずつ読み進めるだけなので、解析しながら結果を渡すジェネレーターでもよい。
+
+    Args:
+        base_meta: 基準ファイルのメタデータ
+        files: (VideoMetadata, パス) を順に返すイテラブル（基準ファイルを含めてよい）
+        path_prefix: 出力先（<prefix>_metadata.<拡張子> と <prefix>_comparison.<拡張子> に保存）
+        export_format: EXPORT_FORMATS のいずれか
+
+    Returns:
+        tuple: (メタデータのパス, 比較のパス, 書き出したファイル数)
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"未対応の形式です: {export_format}")
+    extension = EXPORT_EXTENSIONS[export_format]
+    metadata_path = f"{path_prefix}_metadata{extension}"
+    comparison_path = f"{path_prefix}_comparison{extension}"
+    os.makedirs(os.path.dirname(os.path.abspath(metadata_path)), exist_ok=True)
+
+    base_dict = metadata_to_dict(base_meta)
+    count = 0
+    metadata_writer = open_writer(metadata_path, metadata_columns(), export_format)
+    try:
+        comparison_writer = open_writer(comparison_path, COMPARISON_COLUMNS, export_format)
+        try:
+            for meta, path in files:
+                metadata_writer.write(metadata_row(meta, path))
+                for row in comparison_rows(base_dict, meta, path):
+                    comparison_writer.write(row)
+                count += 1
+        finally:
+            comparison_writer.close()
+    finally:
+        metadata_writer.close()
+
+    return metadata_path, comparison_path, count
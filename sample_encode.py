@@ -0,0 +1,145 @@
+"""
+試し変換モジュール
+ソースの尺全体に分散した短い区間を、生成したコマンドと同じ設定で並列にエンコードし、
+変換後のサイズと処理時間を推定する（CRFなどビットレートを指定しない変換でもサイズが分かる）
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from analysis_cache import cached_analysis, peek_cached
+from conversion_plan import ConversionPlan, EncoderTuning, build_ffmpeg_args, output_name_for, split_stream_args
+from segments import spread_windows
+from video_analyzer import format_duration, format_file_size
+
+
+# 区間数と1区間の長さ（秒）
+DEFAULT_SAMPLE_COUNT = 4
+DEFAULT_SAMPLE_LENGTH = 2.0
+# 1区間のエンコードのタイムアウト（秒）
+SAMPLE_TIMEOUT = 120
+
+
+@dataclass
+class SampleEncodeResult:
+    """試し変換による推定"""
+    size_bytes: float = 0.0       # 推定した出力サイズ
+    seconds: float = 0.0          # 推定した処理時間（このマシンで全コアを使った場合）
+    samples: int = 0              # エンコードした区間数
+    sampled_seconds: float = 0.0  # エンコードした尺の合計
+    error: Optional[str] = None
+
+
+def _stream_args(source_meta, target_meta, source_path: str, plan: ConversionPlan, speed: str,
+                 threads: int) -> list:
+    """生成するコマンドと同じ映像・音声のオプション（入力・出力のパスは含めない）"""
+    groups = build_ffmpeg_args(source_meta, target_meta, source_path, "out", plan, EncoderTuning(speed, threads))
+    video_args, audio_args = split_stream_args(groups)
+    return video_args + audio_args
+
+
+def _cache_kind(source_meta, target_meta, source_path: str, plan: ConversionPlan, speed: str,
+                sample_count: int, sample_length: float) -> str:
+    """キャッシュの種別（変換の設定と区間の取り方が変われば別の結果として扱う）"""
+    key = repr((_stream_args(source_meta, target_meta, source_path, plan, speed, 0), sample_count, sample_length))
+    return "sample-encode-v1-" + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def _run_sample_encode(source_meta, target_meta, source_path: str, plan: ConversionPlan, speed: str,
+                       sample_count: int, sample_length: float) -> SampleEncodeResult:
+    duration = source_meta.duration
+    windows = spread_windows(duration, sample_count, sample_length)
+    if not windows:
+        return SampleEncodeResult(error="尺を取得できませんでした")
+
+    # 区間を同時にエンコードし、全体でCPUコア数のスレッドを使う（本番の変換と同じ条件に近づける）
+    threads = max(1, (os.cpu_count() or 1) // len(windows))
+    options = _stream_args(source_meta, target_meta, source_path, plan, speed, threads)
+    # 出力と同じコンテナに書き出す（コンテナのオーバーヘッドも含めて見積もる）
+    ext = os.path.splitext(output_name_for(source_path, target_meta, source_path))[1] or '.mkv'
+    work_dir = tempfile.mkdtemp(prefix="diffmovie_sample_")
+
+    def encode(index_window):
+        index, (start, length) = index_window
+        output_path = os.path.join(work_dir, f"sample_{index}{ext}")
+        cmd = ['ffmpeg', '-v', 'error', '-nostdin', '-y', '-ss', f'{start:.3f}', '-i', source_path,
+               '-t', f'{length:.3f}'] + options + [output_path]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=SAMPLE_TIMEOUT)
+        except (subprocess.TimeoutExpired, FileNotFoundError):
+            return None
+        if result.returncode != 0 or not os.path.exists(output_path):
+            return None
+        return os.path.getsize(output_path)
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(windows)) as executor:
+            sizes = list(executor.map(encode, enumerate(windows)))
+        elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if any(size is None for size in sizes):
+        return SampleEncodeResult(error="試し変換に失敗しました")
+
+    sampled = sum(length for _, length in windows)
+    scale = duration / sampled
+    return SampleEncodeResult(
+        size_bytes=sum(sizes) * scale,
+        seconds=elapsed * scale,
+        samples=len(windows),
+        sampled_seconds=sampled,
+    )
+
+
+def sample_encode(source_meta, target_meta, source_path: str, plan: ConversionPlan, speed: str,
+                  sample_count: int = DEFAULT_SAMPLE_COUNT,
+                  sample_length: float = DEFAULT_SAMPLE_LENGTH) -> SampleEncodeResult:
+    """
+    分散した区間を試しに変換して、出力サイズと処理時間を推定する（ファイル・設定ごとにキャッシュ）
+
+    入力側シークで各区間の直前のキーフレームから読むため、長尺ファイルでも数秒で終わる。
+
+    Args:
+        source_meta: ソース動画のメタデータ
+        target_meta: ターゲット動画のメタデータ
+        source_path: ソース動画のパス
+        plan: plan_conversion の結果
+        speed: エンコード速度の目標（ENCODER_SPEEDS のいずれか）
+        sample_count: 区間数
+        sample_length: 1区間の長さ（秒）
+
+    Returns:
+        SampleEncodeResult: 推定結果
+    """
+    kind = _cache_kind(source_meta, target_meta, source_path, plan, speed, sample_count, sample_length)
+    return cached_analysis(
+        kind, source_path,
+        lambda path: _run_sample_encode(source_meta, target_meta, path, plan, speed, sample_count, sample_length),
+        SampleEncodeResult,
+    )
+
+
+def peek_sample_encode(source_meta, target_meta, source_path: str, plan: ConversionPlan, speed: str,
+                       sample_count: int = DEFAULT_SAMPLE_COUNT,
+                       sample_length: float = DEFAULT_SAMPLE_LENGTH) -> Optional[SampleEncodeResult]:
+    """試し変換の結果がキャッシュにあれば返す（試し変換は実行しない）"""
+    kind = _cache_kind(source_meta, target_meta, source_path, plan, speed, sample_count, sample_length)
+    return peek_cached(kind, source_path, SampleEncodeResult)
+
+
+def format_sample_estimate(result: SampleEncodeResult) -> str:
+    """試し変換の推定の表示（コマンドのコメント行に使う）"""
+    if result.error:
+        return result.error
+    return (f"出力サイズ 約{format_file_size(int(result.size_bytes))} / "
+            f"処理時間 約{format_duration(max(result.seconds, 0.001))}"
+            f"（{result.samples}区間・計{result.sampled_seconds:.0f}秒から推定）")
@@ -0,0 +1,287 @@
+"""
+シーン解析モジュール
+縮小・低フレームレートでデコードしたフレームの差分からシーンカットを検出し、代表フレームを選ぶ
+"""
+
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analysis_cache import cached_analysis, peek_cached
+from segments import keyframe_segments
+from video_analyzer import analyze_video, format_duration
+
+
+# 解析用のフレームレートと縮小サイズ（カット位置の精度は 1/SCENE_FPS 秒）
+SCENE_FPS = 5
+SCENE_WIDTH = 64
+SCENE_HEIGHT = 36
+# カット判定: 平均絶対差（0-1）がしきい値以上で、かつ前後の中央値の SCENE_RATIO 倍以上
+SCENE_THRESHOLD = 0.08
+SCENE_RATIO = 3.0
+# 中央値を取る前後の範囲（秒）
+MEDIAN_WINDOW = 2.0
+# これより短いショットはフラッシュ等とみなしてカットにしない（秒）
+MIN_SHOT_LENGTH = 0.5
+# 黒味・単色とみなす輝度の標準偏差（代表フレームから除外）
+FLAT_DETAIL = 4.0
+# 代表フレームの数
+DEFAULT_KEYFRAME_COUNT = 4
+# 比較テーブルに表示するカット数の上限
+MAX_LISTED_CUTS = 10
+
+_SCENE_KIND = "scene-v1"
+
+
+@dataclass
+class SceneResult:
+    """シーン解析の結果"""
+    cuts: list = field(default_factory=list)       # カット時刻（秒）
+    shot_count: int = 0
+    shots_per_minute: float = 0.0
+    keyframes: list = field(default_factory=list)  # 代表フレームの時刻（評価の高い順）
+    error: Optional[str] = None
+
+
+@dataclass
+class _SegmentFrames:
+    """1区間のデコード結果（区間境界の差分を計算するため先頭・末尾のフレームを保持）"""
+    start: float
+    scores: np.ndarray   # 直前フレームとの平均絶対差（先頭は 0）
+    detail: np.ndarray   # 各フレームの輝度の標準偏差
+    first: np.ndarray
+    last: np.ndarray
+
+
+def _decode_segment(file_path: str, start: float, length: Optional[float]) -> Optional[_SegmentFrames]:
+    """
+    1区間を縮小グレースケール・低フレームレートでデコードし、差分スコアを計算する
+
+    非参照フレームとループフィルターのデコードを省略して高速化する
+    （解析用の縮小画像には影響しない）。
+    """
+    cmd = ['ffmpeg', '-v', 'error', '-nostdin', '-skip_frame', 'noref', '-skip_loop_filter', 'all']
+    if start > 0:
+        cmd += ['-ss', f'{start:.3f}']
+    if length is not None:
+        cmd += ['-t', f'{length:.3f}']
+    cmd += [
+        '-an', '-sn', '-dn',
+        '-i', file_path,
+        '-map', '0:v:0',
+        '-vf', f'fps={SCENE_FPS},scale={SCENE_WIDTH}:{SCENE_HEIGHT}:flags=area',
+        '-pix_fmt', 'gray',
+        '-f', 'rawvideo',
+        '-'
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=3600)
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+
+    frame_size = SCENE_WIDTH * SCENE_HEIGHT
+    count = len(result.stdout) // frame_size
+    if result.returncode != 0 or count == 0:
+        return None
+
+    frames = np.frombuffer(result.stdout[:count * frame_size], dtype=np.uint8)
+    frames = frames.reshape(count, frame_size).astype(np.int16)
+
+    scores = np.zeros(count, dtype=np.float32)
+    if count > 1:
+        scores[1:] = np.abs(np.diff(frames, axis=0)).mean(axis=1) / 255.0
+
+    return _SegmentFrames(
+        start=start,
+        scores=scores,
+        detail=frames.std(axis=1).astype(np.float32),
+        first=frames[0],
+        last=frames[-1],
+    )
+
+
+def _detect_cuts(scores: np.ndarray) -> np.ndarray:
+    """
+    差分スコアからカットのフレーム番号を求める
+
+    動きの多い場面で誤検出しないよう、前後の中央値に対する比でも判定する。
+    """
+    if len(scores) < 2:
+        return np.array([], dtype=int)
+
+    half = max(1, int(MEDIAN_WINDOW * SCENE_FPS))
+    padded = np.pad(scores, half, mode='edge')
+    local_median = np.median(sliding_window_view(padded, 2 * half + 1), axis=1)
+
+    candidates = np.flatnonzero((scores >= SCENE_THRESHOLD) & (scores >= SCENE_RATIO * local_median))
+
+    # 短すぎるショットを生むカットを除く
+    min_gap = max(1, int(round(MIN_SHOT_LENGTH * SCENE_FPS)))
+    cuts = []
+    for index in candidates:
+        if index < min_gap:
+            continue
+        if cuts and index - cuts[-1] < min_gap:
+            continue
+        cuts.append(index)
+    return np.array(cuts, dtype=int)
+
+
+def _select_keyframes(detail: np.ndarray, cuts: np.ndarray, count: int) -> list:
+    """
+    各ショットから最も情報量の多いフレームを選び、ショットの長さと合わせて評価の高い順に返す
+
+    Returns:
+        list: フレーム番号のリスト
+    """
+    bounds = np.concatenate(([0], cuts, [len(detail)]))
+    candidates = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        # ショットの前後端はフェードやトランジションを含みやすいので中央部から選ぶ
+        margin = (end - start) // 5
+        inner = detail[start + margin:end - margin] if end - start > 2 * margin else detail[start:end]
+        if len(inner) == 0:
+            continue
+        best = int(np.argmax(inner))
+        if inner[best] < FLAT_DETAIL:
+            continue
+        length = min((end - start) / SCENE_FPS, 10.0)
+        candidates.append((float(inner[best]) * length, start + margin + best))
+
+    candidates.sort(reverse=True)
+    return [index for _, index in candidates[:count]]
+
+
+def _run_scene_analysis(file_path: str, keyframe_count: int = DEFAULT_KEYFRAME_COUNT,
+                        max_workers: Optional[int] = None) -> SceneResult:
+    """キーフレーム境界で分割した区間を並列にデコードし、シーンを解析する"""
+    if not file_path or not os.path.exists(file_path):
+        return SceneResult(error="ファイルが見つかりません")
+
+    meta = analyze_video(file_path)
+    if meta.error:
+        return SceneResult(error=meta.error)
+    if meta.video is None:
+        return SceneResult(error="映像ストリームがありません")
+
+    workers = max_workers or os.cpu_count() or 1
+    segments = keyframe_segments(file_path, meta.duration, workers, start_time=meta.video.start_time)
+    if not segments:
+        segments = [(0.0, None)]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(segments))) as executor:
+        parts = list(executor.map(lambda s: _decode_segment(file_path, s[0], s[1]), segments))
+    if all(p is None for p in parts):
+        return SceneResult(error="映像をデコードできませんでした")
+    # 一部の区間が欠けるとカットの一覧に報告されない空白ができるため、結果にせずエラーにする
+    # （エラーはキャッシュされないため、一時的な失敗なら次の解析でやり直される）
+    failed = [(start, length) for (start, length), part in zip(segments, parts) if part is None]
+    if failed:
+        ranges = ", ".join(
+            f"{_format_time(start)}-{_format_time(start + length) if length is not None else '終端'}"
+            for start, length in failed
+        )
+        return SceneResult(error=f"映像をデコードできなかった区間があります: {ranges}")
+
+    # 区間の先頭フレームのスコアを、直前の区間の末尾フレームとの差分で埋める
+    for previous, part in zip(parts, parts[1:]):
+        part.scores[0] = np.abs(part.first - previous.last).mean() / 255.0
+
+    scores = np.concatenate([p.scores for p in parts])
+    detail = np.concatenate([p.detail for p in parts])
+    times = np.concatenate([p.start + np.arange(len(p.scores)) / SCENE_FPS for p in parts])
+
+    cuts = _detect_cuts(scores)
+    keyframes = _select_keyframes(detail, cuts, keyframe_count)
+
+    duration = meta.duration if meta.duration > 0 else len(scores) / SCENE_FPS
+    shot_count = len(cuts) + 1
+    return SceneResult(
+        cuts=[round(float(times[i]), 3) for i in cuts],
+        shot_count=shot_count,
+        shots_per_minute=round(shot_count / (duration / 60), 2) if duration > 0 else 0.0,
+        keyframes=[round(float(times[i]), 3) for i in keyframes],
+    )
+
+
+def analyze_scenes(file_path: str) -> SceneResult:
+    """
+    シーンカットと代表フレームを解析する（ファイル同一性ごとにキャッシュ）
+
+    Args:
+        file_path: 動画ファイルのパス
+
+    Returns:
+        SceneResult: 解析結果
+    """
+    return cached_analysis(_SCENE_KIND, file_path, _run_scene_analysis, SceneResult)
+
+
+def representative_timestamp(file_path: str) -> Optional[float]:
+    """
+    解析済みであれば最も評価の高い代表フレームの時刻を返す（未解析なら None）
+
+    サムネイル生成のたびに全体をデコードしないよう、キャッシュだけを参照する。
+    """
+    result = peek_cached(_SCENE_KIND, file_path, SceneResult)
+    if result is None or not result.keyframes:
+        return None
+    return result.keyframes[0]
+
+
+def _format_time(seconds: float) -> str:
+    """カット時刻の表示（先頭は N/A ではなく 00:00.000 とする）"""
+    return format_duration(seconds) if seconds > 0 else "00:00.000"
+
+
+def scene_to_dict(result: SceneResult) -> dict:
+    """
+    SceneResultを比較テーブル用の辞書に変換
+
+    Returns:
+        dict: キーが項目名、値が表示文字列の辞書
+    """
+    if result.error:
+        return {
+            "シーンカット数": "N/A",
+            "ショット数/分": "N/A",
+            "シーンカット（詳細）": "N/A",
+            "代表フレーム": "N/A",
+        }
+
+    cuts = [_format_time(t) for t in result.cuts[:MAX_LISTED_CUTS]]
+    if len(result.cuts) > MAX_LISTED_CUTS:
+        cuts.append(f"他{len(result.cuts) - MAX_LISTED_CUTS}件")
+
+    return {
+        "シーンカット数": str(len(result.cuts)),
+        "ショット数/分": f"{result.shots_per_minute:.1f}",
+        "シーンカット（詳細）": ", ".join(cuts) if cuts else "なし",
+        "代表フレーム": ", ".join(_format_time(t) for t in result.keyframes) or "なし",
+    }
+
+
+def format_scene_report(result: SceneResult, file_name: str) -> str:
+    """シーン解析の結果をテキストに整形（カットは全件）"""
+    lines = []
+    lines.append("=" * 50)
+    lines.append(f"【シーン解析】{file_name}")
+    lines.append("=" * 50)
+
+    if result.error:
+        lines.append(f"エラー: {result.error}")
+    else:
+        lines.append(f"[カット数] {len(result.cuts)}（{result.shot_count}ショット, {result.shots_per_minute:.1f}ショット/分）")
+        lines.append(f"[代表フレーム] {', '.join(_format_time(t) for t in result.keyframes) or 'なし'}")
+        for t in result.cuts:
+            lines.append(f"  {_format_time(t)}")
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
@@ -0,0 +1,146 @@
+"""
+分割エンコードモジュール
+長尺ファイルの映像をキーフレーム境界で区間に分け、区間ごとのコマンド・音声の一括処理・
+ロスレスな連結（concat demuxer + ストリームコピー）のコマンドを組み立てる。
+連結後はフレーム数と尺をソースと照合する
+"""
+
+import json
+import os
+import subprocess
+from dataclasses import dataclass, field
+from typing import Optional
+
+from conversion_plan import split_stream_args
+from segments import keyframe_segments
+
+
+# 1区間の最小の長さ（秒）。これより短いファイルは分割しない
+SEGMENT_MIN_LENGTH = 30.0
+# 区間の境界ごとに許すフレーム数の差（fps変換の丸めで境界に1フレーム増減しうる）
+FRAME_TOLERANCE = 1
+# 連結後の尺として許す差（秒）
+DURATION_TOLERANCE = 0.1
+
+
+@dataclass
+class SegmentPlan:
+    """分割エンコードの実行計画"""
+    segments: list = field(default_factory=list)          # (開始秒, 長さ) のリスト
+    work_dir: str = ""                                    # 区間ファイルの置き場所（完了後に削除）
+    segment_commands: list = field(default_factory=list)  # 区間ごとの映像エンコードのコマンド
+    audio_command: Optional[list] = None                  # 音声を1回で処理するコマンド（音声がなければ None）
+    concat_command: list = field(default_factory=list)    # 区間と音声を連結するコマンド
+    list_path: str = ""                                   # concat demuxer 用のリスト
+    target_fps: Optional[float] = None                    # fpsを変換する場合の出力fps（フレーム数の照合に使う）
+
+
+def plan_segments(groups: list, source_path: str, output_path: str, duration: float, count: int,
+                  min_length: float = SEGMENT_MIN_LENGTH, start_time: float = 0.0) -> Optional[SegmentPlan]:
+    """
+    変換コマンドを、区間ごとの映像エンコード・音声の一括処理・連結に組み替える
+
+    各区間は入力側シーク（-ss を -i の前）でキーフレームから読み、映像だけをエンコードする。
+    音声は区間に分けると境界にギャップやプライミングの重複が出るため、全体を1回で処理する。
+
+    Args:
+        groups: build_ffmpeg_args の結果
+        source_path: ソースのパス
+        output_path: 出力のパス
+        duration: ソースの尺（秒）
+        count: 分割数の上限
+        min_length: 1区間の最小の長さ（秒）
+        start_time: ソースの映像ストリームの開始時刻（秒。キーフレーム時刻を -ss の基準にそろえる）
+
+    Returns:
+        SegmentPlan: 実行計画。映像を再エンコードしない場合や分割するほど長くない場合は None
+    """
+    video_args, audio_args = split_stream_args(groups)
+    if not video_args or video_args[:2] == ['-c:v', 'copy'] or count < 2:
+        return None
+
+    segments = keyframe_segments(source_path, duration, count, min_length, start_time)
+    if len(segments) < 2:
+        return None
+
+    ext = os.path.splitext(output_path)[1] or '.mkv'
+    work_dir = output_path + '.parts'
+    plan = SegmentPlan(segments=segments, work_dir=work_dir, list_path=os.path.join(work_dir, 'segments.txt'))
+
+    if '-r' in video_args:
+        plan.target_fps = float(video_args[video_args.index('-r') + 1])
+
+    for i, (start, length) in enumerate(segments):
+        command = ['ffmpeg', '-ss', f'{start:.6f}', '-i', source_path]
+        # 最後の区間は尺の終わりまで（尺の誤差で末尾を取りこぼさない）
+        if i < len(segments) - 1:
+            command += ['-t', f'{length:.6f}']
+        command += ['-map', '0:v:0', '-an', '-sn', '-dn'] + video_args
+        command.append(os.path.join(work_dir, f'segment_{i:04d}{ext}'))
+        plan.segment_commands.append(command)
+
+    inputs = ['-f', 'concat', '-safe', '0', '-i', plan.list_path]
+    maps = ['-map', '0:v:0']
+    if audio_args:
+        audio_path = os.path.join(work_dir, f'audio{ext}')
+        plan.audio_command = ['ffmpeg', '-i', source_path, '-map', '0:a:0', '-vn', '-sn', '-dn'] + audio_args + [audio_path]
+        inputs += ['-i', audio_path]
+        maps += ['-map', '1:a:0']
+    plan.concat_command = ['ffmpeg'] + inputs + maps + ['-c', 'copy', output_path]
+    return plan
+
+
+def write_segment_list(plan: SegmentPlan) -> None:
+    """concat demuxer 用のリストを書き出す"""
+    with open(plan.list_path, 'w', encoding='utf-8') as f:
+        for command in plan.segment_commands:
+            path = os.path.abspath(command[-1]).replace("'", "'\\''")
+            f.write(f"file '{path}'\n")
+
+
+def probe_frames(file_path: str, timeout: int = 300) -> tuple:
+    """
+    映像のフレーム数（パケット数）と尺を取得する（デコードせずに数えるため高速）
+
+    Returns:
+        tuple: (フレーム数, 尺（秒）)。取得できなければ (None, None)
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-count_packets',
+        '-show_entries', 'stream=nb_read_packets:format=duration',
+        '-of', 'json',
+        file_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        data = json.loads(result.stdout)
+        return int(data['streams'][0]['nb_read_packets']), float(data['format']['duration'])
+    except (subprocess.TimeoutExpired, FileNotFoundError, ValueError, KeyError, IndexError):
+        return None, None
+
+
+def verify_segmented(source_path: str, output_path: str, plan: SegmentPlan) -> list:
+    """
+    連結した出力のフレーム数と尺をソースと照合する
+
+    Returns:
+        list: 不一致の説明のリスト（一致していれば空）
+    """
+    source_frames, source_duration = probe_frames(source_path)
+    output_frames, output_duration = probe_frames(output_path)
+    if source_frames is None or output_frames is None:
+        return ["フレーム数を取得できませんでした"]
+
+    expected = source_frames
+    if plan.target_fps:
+        expected = round(source_duration * plan.target_fps)
+
+    mismatches = []
+    if abs(output_frames - expected) > FRAME_TOLERANCE * len(plan.segments):
+        mismatches.append(f"フレーム数: {output_frames}（期待: {expected}）")
+    if abs(output_duration - source_duration) > DURATION_TOLERANCE:
+        mismatches.append(f"尺: {output_duration:.3f}秒（期待: {source_duration:.3f}秒）")
+    return mismatches
@@ -0,0 +1,113 @@
+"""
+区間分割モジュール
+長尺ファイルを部分的・並列に解析するための区間（開始秒, 長さ）を計算する
+"""
+
+import subprocess
+
+
+def spread_windows(duration: float, count: int, length: float) -> list:
+    """
+    尺全体に均等に分散した解析区間を返す
+
+    区間同士が重ならないように配置し、尺が足りない場合は全体を1区間とする。
+
+    Args:
+        duration: 動画の尺（秒）
+        count: 区間数
+        length: 1区間の長さ（秒）
+
+    Returns:
+        list: (開始秒, 長さ) のリスト
+    """
+    if duration <= 0 or count <= 0:
+        return []
+    if duration <= count * length:
+        return [(0.0, duration)]
+
+    # 区間の中心を (i + 0.5) / count の位置に置く
+    step = duration / count
+    return [(step * (i + 0.5) - length / 2, length) for i in range(count)]
+
+
+def probe_keyframes_near(file_path: str, targets: list, timeout: int = 30, start_time: float = 0.0) -> list:
+    """
+    各目標時刻の直前にある映像キーフレームの時刻を取得する
+
+    ffprobeの -read_intervals で目標時刻へシークし、最初の1パケットだけを読むため、
+    ファイル全体のパケットを走査せずに済む。
+
+    Args:
+        file_path: 動画ファイルのパス
+        targets: 目標時刻（秒）のリスト
+        timeout: ffprobeのタイムアウト（秒）
+        start_time: 映像ストリームの開始時刻（秒）。-read_intervals と pts_time はコンテナの
+            タイムスタンプのため、目標時刻に足して渡し、結果からは差し引く
+
+    Returns:
+        list: 見つかったキーフレーム時刻（先頭からの秒。昇順・重複なし）。取得できなければ空リスト
+    """
+    if not targets:
+        return []
+
+    intervals = ",".join(f"{t + start_time:.3f}%+#1" for t in targets)
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-read_intervals', intervals,
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        file_path
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return []
+    if result.returncode != 0:
+        return []
+
+    keyframes = set()
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or not parts[1].startswith('K'):
+            continue
+        try:
+            keyframes.add(float(parts[0]) - start_time)
+        except ValueError:
+            continue
+    return sorted(keyframes)
+
+
+def keyframe_segments(file_path: str, duration: float, count: int,
+                      min_length: float = 30.0, start_time: float = 0.0) -> list:
+    """
+    ファイルをキーフレーム境界で分割した区間を返す
+
+    各区間はキーフレームから始まるため、入力シーク後に捨てるフレームのデコードが発生しない。
+    キーフレームを取得できない場合は等間隔で分割する（ffmpegの正確なシークで処理は可能）。
+
+    Args:
+        file_path: 動画ファイルのパス
+        duration: 動画の尺（秒）
+        count: 分割数の上限（通常は並列数）
+        min_length: 1区間の最小の長さ（秒）。短いファイルは分割しない
+        start_time: 映像ストリームの開始時刻（秒）。TS/MTSなど先頭が0でないファイルで、
+            区間を入力側 -ss と同じ「先頭からの秒」にそろえるために使う
+
+    Returns:
+        list: (開始秒, 長さ) のリスト（先頭からの秒）。最後の区間は尺の終わりまで
+    """
+    if duration <= 0:
+        return []
+
+    count = max(1, min(count, int(duration // min_length)))
+    if count == 1:
+        return [(0.0, duration)]
+
+    targets = [duration * i / count for i in range(1, count)]
+    boundaries = probe_keyframes_near(file_path, targets, start_time=start_time) or targets
+    boundaries = [0.0] + [b for b in boundaries if min_length / 2 < b < duration - min_length / 2] + [duration]
+
+    return [(start, end - start) for start, end in zip(boundaries, boundaries[1:]) if end > start]
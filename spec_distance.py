@@ -0,0 +1,206 @@
+"""
+仕様距離モジュール
+正規化した仕様項目の重み付き距離を全ファイルの組み合わせ（N×N）でまとめて計算し、
+各ファイルに最も近い参照ファイルと、全体の変換コストが最小になる基準ファイルを求める
+"""
+
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from spec_groups import normalize_value
+from video_analyzer import parse_bitrate_string
+
+
+# カテゴリ項目と重み（値が異なれば重みぶんの距離。再エンコードが必要な項目ほど重い）
+CATEGORICAL_WEIGHTS = {
+    "映像コーデック": 3.0,
+    "ピクセルフォーマット": 1.5,
+    "HDR形式": 2.0,
+    "ガンマ/転送特性": 1.0,
+    "色域（Primaries）": 1.0,
+    "カラーレンジ": 1.0,
+    "音声コーデック": 1.5,
+    "コンテナフォーマット": 0.5,  # リマックスで済む
+}
+
+# 数値項目と重み（対数の差を NUMERIC_SATURATION で割って 0-1 に飽和させ、重みを掛ける）
+NUMERIC_WEIGHTS = {
+    "解像度（幅）": 1.5,
+    "解像度（高さ）": 1.5,
+    "フレームレート（fps）": 2.0,
+    "映像ビットレート": 1.0,
+    "サンプルレート": 0.5,
+    "チャンネル数": 0.5,
+}
+# 対数の差がこれ以上（2倍の差）なら最大距離とみなす
+NUMERIC_SATURATION = np.log(2.0)
+# 値がない数値項目の代わりの値（値のある項目との差は必ず飽和し、値なし同士は一致する）
+MISSING_NUMBER = -1e6
+
+
+@dataclass
+class SpecFeatures:
+    """距離計算用に数値化した仕様"""
+    onehot: np.ndarray = None    # (ファイル数, 全カテゴリ値の数) のワンホット（重み付き）
+    logs: np.ndarray = None      # (ファイル数, 数値項目数) の対数値を飽和幅で割ったもの
+    categorical_weight: float = 0.0
+    numeric_weights: np.ndarray = None
+
+
+@dataclass
+class SpecDistanceResult:
+    """仕様距離の解析結果"""
+    matrix: np.ndarray = None                      # (N, N) の距離（0-1）
+    nearest: list = field(default_factory=list)    # 各ファイルに最も近い他ファイルのインデックス
+    nearest_distance: list = field(default_factory=list)
+    best_base: int = 0                             # 全ファイルへの距離の合計が最小のファイル
+    total_cost: float = 0.0                        # best_base を基準にした距離の合計
+
+
+def parse_spec_number(key: str, value) -> float:
+    """表示用の文字列から数値を取り出す（取り出せなければ NaN）"""
+    text = str(value).strip()
+    if not text or text == "N/A":
+        return np.nan
+    try:
+        if "ビットレート" in key:
+            number = parse_bitrate_string(text)
+        else:
+            number = float(text.split()[0])
+    except (ValueError, IndexError):
+        return np.nan
+    return number if number > 0 else np.nan
+
+
+def spec_features(all_metadata: list) -> SpecFeatures:
+    """
+    metadata_to_dict の結果（またはプリセットの辞書）のリストを数値化する
+
+    カテゴリ項目は値ごとの列に重みを立てたワンホットにし（値なしもひとつの値として扱う）、
+    数値項目は対数を飽和幅で割った値にする（値なしは MISSING_NUMBER）。
+    """
+    columns = []
+    for key, weight in CATEGORICAL_WEIGHTS.items():
+        vocabulary = {}
+        codes = [vocabulary.setdefault(normalize_value(meta_dict.get(key, "N/A")), len(vocabulary))
+                 for meta_dict in all_metadata]
+        block = np.zeros((len(all_metadata), len(vocabulary)), dtype=np.float32)
+        block[np.arange(len(codes)), codes] = np.sqrt(weight)
+        columns.append(block)
+    onehot = np.concatenate(columns, axis=1) if all_metadata else np.zeros((0, 0), dtype=np.float32)
+
+    numbers = np.array(
+        [[parse_spec_number(key, meta_dict.get(key, "")) for key in NUMERIC_WEIGHTS] for meta_dict in all_metadata],
+        dtype=np.float64,
+    ).reshape(len(all_metadata), len(NUMERIC_WEIGHTS))
+    logs = np.where(np.isnan(numbers), MISSING_NUMBER, np.log(numbers) / NUMERIC_SATURATION)
+
+    return SpecFeatures(
+        onehot=onehot,
+        logs=logs.astype(np.float32),
+        categorical_weight=float(sum(CATEGORICAL_WEIGHTS.values())),
+        numeric_weights=np.array(list(NUMERIC_WEIGHTS.values()), dtype=np.float32),
+    )
+
+
+def distance_matrix(features: SpecFeatures) -> np.ndarray:
+    """
+    全ファイルの組み合わせの重み付き距離（0-1）を計算する
+
+    カテゴリ項目は「一致した項目の重みの合計」を重み付きワンホットの行列積で一度に求め、
+    全体の重みから引く。数値項目は項目ごとに N×N の差をバッファ上で計算して足し込む。
+    片方だけ値がない項目は最大距離、両方ともない項目は距離0になる。
+
+    Returns:
+        np.ndarray: (N, N) の float32 配列
+    """
+    n = features.logs.shape[0]
+    total_weight = features.categorical_weight + float(features.numeric_weights.sum())
+
+    result = features.onehot @ features.onehot.T
+    np.subtract(features.categorical_weight, result, out=result)
+
+    buffer = np.empty((n, n), dtype=np.float32)
+    for column, weight in enumerate(features.numeric_weights):
+        col = features.logs[:, column]
+        np.subtract(col[:, None], col[None, :], out=buffer)
+        np.abs(buffer, out=buffer)
+        np.minimum(buffer, 1.0, out=buffer)
+        buffer *= weight
+        result += buffer
+
+    result /= total_weight
+    # 行列積の丸め誤差で対角がわずかにずれるのを防ぐ
+    np.fill_diagonal(result, 0.0)
+    return result
+
+
+def analyze_spec_distance(all_metadata: list) -> SpecDistanceResult:
+    """
+    仕様距離の行列と、最も近い参照ファイル・最適な基準ファイルを求める
+
+    Args:
+        all_metadata: metadata_to_dict の結果（またはプリセットの辞書）のリスト
+
+    Returns:
+        SpecDistanceResult: 解析結果
+    """
+    matrix = distance_matrix(spec_features(all_metadata))
+    n = matrix.shape[0]
+    if n == 0:
+        return SpecDistanceResult(matrix=matrix)
+
+    totals = matrix.sum(axis=1, dtype=np.float64)
+    best_base = int(np.argmin(totals))
+
+    if n < 2:
+        return SpecDistanceResult(matrix=matrix, nearest=[0], nearest_distance=[0.0], best_base=0)
+
+    # 自分自身を除いた最小距離
+    masked = matrix.copy()
+    np.fill_diagonal(masked, np.inf)
+    nearest = masked.argmin(axis=1)
+
+    return SpecDistanceResult(
+        matrix=matrix,
+        nearest=nearest.tolist(),
+        nearest_distance=masked[np.arange(n), nearest].tolist(),
+        best_base=best_base,
+        total_cost=float(totals[best_base]),
+    )
+
+
+def format_spec_distance_report(result: SpecDistanceResult, filenames: list, base_index: int = None) -> str:
+    """
+    仕様距離の解析結果をテキストに整形
+
+    Args:
+        result: 解析結果
+        filenames: ファイル名リスト（result と同じ順序）
+        base_index: 現在選択している基準ファイル（指定すると最適な基準との変換コストを比較する）
+    """
+    names = [os.path.basename(f) for f in filenames]
+    lines = []
+    lines.append("=" * 50)
+    lines.append("【仕様距離】")
+    lines.append("=" * 50)
+
+    if len(names) < 2:
+        lines.append("2つ以上のファイルが必要です")
+        return "\n".join(lines)
+
+    lines.append(f"変換コストが最小の基準: {names[result.best_base]}（距離の合計 {result.total_cost:.3f}）")
+    if base_index is not None and base_index != result.best_base:
+        current = float(result.matrix[base_index].sum(dtype=np.float64))
+        lines.append(f"現在の基準: {names[base_index]}（距離の合計 {current:.3f}）")
+
+    lines.append("")
+    lines.append("最も近い参照ファイル:")
+    for name, nearest, distance in zip(names, result.nearest, result.nearest_distance):
+        lines.append(f"  {name} -> {names[nearest]}（距離 {distance:.3f}）")
+
+    lines.append("")
+    lines.append("=" * 50)
+    return "\n".join(lines)
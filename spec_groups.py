@@ -0,0 +1,111 @@
+"""
+仕様グループモジュール
+正規化した仕様（コーデック・解像度・fps・ピクセルフォーマット・音声構成など）のハッシュでファイルをまとめる
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+
+
+# グループ分けに使う項目（metadata_to_dict のキー）
+SPEC_KEYS = [
+    "コンテナフォーマット",
+    "映像ストリーム",
+    "映像コーデック",
+    "映像プロファイル",
+    "解像度",
+    "アスペクト比（DAR）",
+    "フレームレート（fps）",
+    "ピクセルフォーマット",
+    "カラースペース",
+    "色域（Primaries）",
+    "ガンマ/転送特性",
+    "カラーレンジ",
+    "HDR形式",
+    "ビット深度（映像）",
+    "音声ストリーム",
+    "音声コーデック",
+    "サンプルレート",
+    "チャンネル数",
+    "チャンネルレイアウト",
+    "サンプルフォーマット",
+    "エラー",
+]
+
+# グループ内で値が異なる項目に表示する例の数
+MAX_EXAMPLES = 1
+
+
+@dataclass
+class SpecGroup:
+    """同じ仕様のファイルの集まり"""
+    digest: str                                   # 正規化した仕様のハッシュ（先頭8文字）
+    members: list = field(default_factory=list)   # all_metadata 内のインデックス
+    spec: dict = field(default_factory=dict)      # グループ共通の仕様（表示用の元の値）
+
+
+def normalize_value(value) -> str:
+    """比較用に値を正規化（前後の空白・大文字小文字の違いを無視）"""
+    return str(value).strip().lower()
+
+
+def spec_signature(meta_dict: dict) -> tuple:
+    """仕様項目の正規化した値のタプル（存在しない項目は空文字）"""
+    return tuple(normalize_value(meta_dict.get(key, "")) for key in SPEC_KEYS)
+
+
+def group_by_spec(all_metadata: list) -> list:
+    """
+    ファイルを仕様のハッシュでグループ化する
+
+    各ファイルの仕様を1回ずつハッシュして辞書に振り分けるため、計算量はファイル数に比例する。
+
+    Args:
+        all_metadata: metadata_to_dict の結果のリスト
+
+    Returns:
+        list: SpecGroupのリスト（ファイル数の多い順、同数なら最初に現れた順）
+    """
+    groups = {}
+    for index, meta_dict in enumerate(all_metadata):
+        signature = spec_signature(meta_dict)
+        group = groups.get(signature)
+        if group is None:
+            digest = hashlib.sha1("\x1f".join(signature).encode('utf-8')).hexdigest()[:8]
+            group = SpecGroup(
+                digest=digest,
+                spec={key: meta_dict[key] for key in SPEC_KEYS if key in meta_dict},
+            )
+            groups[signature] = group
+        group.members.append(index)
+
+    return sorted(groups.values(), key=lambda g: -len(g.members))
+
+
+def summarize_group(all_metadata: list, group: SpecGroup) -> dict:
+    """
+    グループを1列として表示するための辞書を作成
+
+    仕様項目はグループ共通の値、それ以外（ファイル名・サイズ・尺など）は
+    全員同じならその値、異なれば種類数と例を表示する。
+    """
+    summary = {}
+    for index in group.members:
+        for key, value in all_metadata[index].items():
+            summary.setdefault(key, {})[str(value)] = None
+
+    result = {}
+    for key, values in summary.items():
+        if key in group.spec:
+            result[key] = group.spec[key]
+        elif len(values) == 1:
+            result[key] = next(iter(values))
+        else:
+            examples = ", ".join(list(values)[:MAX_EXAMPLES])
+            result[key] = f"{len(values)}種類（例: {examples}）"
+    return result
+
+
+def group_label(position: int, group: SpecGroup) -> str:
+    """グループ列の見出し"""
+    return f"仕様{position + 1}（{len(group.members)}件）"
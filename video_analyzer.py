@@ -9,6 +9,8 @@ import os
 from typing import Optional
 from dataclasses import dataclass, field
 
+from diff_engine import build_diff_matrix
+
 
 @dataclass
 class VideoStreamInfo:
@@ -31,6 +33,7 @@ class VideoStreamInfo:
     color_range: str = "N/A"
     hdr_format: str = "N/A"
     bits_per_raw_sample: str = "N/A"
+    start_time: float = 0.0
 
 
 @dataclass
@@ -135,6 +138,17 @@ def calculate_fps(frame_rate_str: str) -> str:
         return frame_rate_str
 
 
+def file_identity(file_path: str) -> tuple:
+    """
+    ファイルの同一性を判定するキーを返す（キャッシュ用）
+
+    Returns:
+        tuple: (絶対パス, ファイルサイズ, 更新時刻ns)
+    """
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
 def analyze_video(file_path: str) -> VideoMetadata:
     """
     ffprobeを使用して動画ファイルを解析する
@@ -225,6 +239,10 @@ def analyze_video(file_path: str) -> VideoMetadata:
             video_info.color_transfer = stream.get('color_transfer', 'N/A')
             video_info.color_range = stream.get('color_range', 'N/A')
             video_info.bits_per_raw_sample = stream.get('bits_per_raw_sample', 'N/A')
+            try:
+                video_info.start_time = float(stream.get('start_time', 0))
+            except (ValueError, TypeError):
+                video_info.start_time = 0.0
             
             # HDR判定
             if video_info.color_transfer in ['smpte2084', 'arib-std-b67']:
@@ -333,21 +351,12 @@ def compare_metadata(meta_a: VideoMetadata, meta_b: VideoMetadata) -> list:
     Returns:
         list: [項目名, 値A, 値B, 差分/変化] のリスト
     """
-    dict_a = metadata_to_dict(meta_a)
-    dict_b = metadata_to_dict(meta_b)
-    
-    # すべてのキーを収集
-    all_keys = list(dict_a.keys())
-    for key in dict_b.keys():
-        if key not in all_keys:
-            all_keys.append(key)
+    # 差分行列ですべてのキーを出現順に収集
+    matrix = build_diff_matrix([metadata_to_dict(meta_a), metadata_to_dict(meta_b)])
     
     results = []
     
-    for key in all_keys:
-        val_a = dict_a.get(key, "N/A")
-        val_b = dict_b.get(key, "N/A")
-        
+    for key, (val_a, val_b) in zip(matrix.keys, matrix.values):
         # 差分を計算
         diff = calculate_diff(key, val_a, val_b)
         